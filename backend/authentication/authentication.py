@@ -1,5 +1,7 @@
+from asgiref.sync import sync_to_async
+from rest_framework import authentication
 from rest_framework.authentication import BaseAuthentication
-from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.exceptions import APIException, AuthenticationFailed
 from django.contrib.auth import get_user_model
 from .models import APIKey
 from rest_framework.authtoken.models import Token
@@ -12,7 +14,7 @@ class APIKeyAuthentication(BaseAuthentication):
     Custom authentication class for API keys
     """
     
-    def authenticate(self, request):
+    def get_key(self, request):
         # Get the Authorization header
         auth_header = request.META.get('HTTP_AUTHORIZATION', '')
         
@@ -25,8 +27,11 @@ class APIKeyAuthentication(BaseAuthentication):
             return None
             
         # Assume the entire header is the API key
-        api_key = auth_header
-            
+        return auth_header
+        
+    def authenticate(self, request):
+        api_key = self.get_key(request)
+        
         if not api_key:
             return None
             
@@ -46,6 +51,25 @@ class APIKeyAuthentication(BaseAuthentication):
             raise AuthenticationFailed('Invalid API key')
         except Exception as e:
             raise AuthenticationFailed(f'Authentication failed: {str(e)}')
+            
+    async def aauthenticate(self, request):
+        api_key = self.get_key(request)
+        
+        if not api_key:
+            return None
+            
+        try:
+            api_key_obj = await APIKey.objects.select_related('user').aget(
+                key=api_key,
+                is_active=True
+            )
+            await api_key_obj.aupdate_last_used()
+            return (api_key_obj.user, api_key_obj)
+            
+        except APIKey.DoesNotExist:
+            raise AuthenticationFailed('Invalid API key')
+        except Exception as e:
+            raise AuthenticationFailed(f'Authentication failed: {str(e)}')
 
 
 class APIKeyTokenAuthentication(BaseAuthentication):
@@ -53,7 +77,7 @@ class APIKeyTokenAuthentication(BaseAuthentication):
     Custom authentication class for API keys with 'Token ' prefix
     """
     
-    def authenticate(self, request):
+    def get_key(self, request):
         # Get the Authorization header
         auth_header = request.META.get('HTTP_AUTHORIZATION', '')
         
@@ -65,8 +89,11 @@ class APIKeyTokenAuthentication(BaseAuthentication):
             return None
             
         # Extract the key after 'Token '
-        api_key = auth_header[6:]  # Remove 'Token ' prefix
-            
+        return auth_header[6:]  # Remove 'Token ' prefix
+        
+    def authenticate(self, request):
+        api_key = self.get_key(request)
+        
         if not api_key:
             return None
             
@@ -87,6 +114,26 @@ class APIKeyTokenAuthentication(BaseAuthentication):
             return None
         except Exception as e:
             raise AuthenticationFailed(f'Authentication failed: {str(e)}')
+            
+    async def aauthenticate(self, request):
+        api_key = self.get_key(request)
+        
+        if not api_key:
+            return None
+            
+        try:
+            api_key_obj = await APIKey.objects.select_related('user').aget(
+                key=api_key,
+                is_active=True
+            )
+            await api_key_obj.aupdate_last_used()
+            return (api_key_obj.user, api_key_obj)
+            
+        except APIKey.DoesNotExist:
+            # If not found as API key, let other authentication classes handle it
+            return None
+        except Exception as e:
+            raise AuthenticationFailed(f'Authentication failed: {str(e)}')
 
 
 class TokenAuthentication(BaseAuthentication):
@@ -94,7 +141,7 @@ class TokenAuthentication(BaseAuthentication):
     Custom authentication class for DRF tokens
     """
     
-    def authenticate(self, request):
+    def get_key(self, request):
         # Get the Authorization header
         auth_header = request.META.get('HTTP_AUTHORIZATION', '')
         
@@ -103,10 +150,12 @@ class TokenAuthentication(BaseAuthentication):
             
         # Check if it's a Token format
         if auth_header.startswith('Token '):
-            token = auth_header[6:]  # Remove 'Token ' prefix
-        else:
-            return None
-            
+            return auth_header[6:]  # Remove 'Token ' prefix
+        return None
+        
+    def authenticate(self, request):
+        token = self.get_key(request)
+        
         if not token:
             return None
             
@@ -118,4 +167,62 @@ class TokenAuthentication(BaseAuthentication):
         except Token.DoesNotExist:
             raise AuthenticationFailed('Invalid token')
         except Exception as e:
-            raise AuthenticationFailed(f'Authentication failed: {str(e)}') 
\ No newline at end of file
+            raise AuthenticationFailed(f'Authentication failed: {str(e)}')
+            
+    async def aauthenticate(self, request):
+        token = self.get_key(request)
+        
+        if not token:
+            return None
+            
+        try:
+            token_obj = await Token.objects.select_related('user').aget(key=token)
+            return (token_obj.user, token_obj)
+            
+        except Token.DoesNotExist:
+            raise AuthenticationFailed('Invalid token')
+        except Exception as e:
+            raise AuthenticationFailed(f'Authentication failed: {str(e)}')
+
+
+class SessionAuthentication(authentication.SessionAuthentication):
+    """
+    DRF's session authentication, which can also load the session user
+    without blocking the event loop
+    """
+    
+    async def aauthenticate(self, request):
+        user = await request._request.auser()
+        
+        if not user or not user.is_active:
+            return None
+            
+        # The CSRF check only reads the request's cookies and headers
+        self.enforce_csrf(request)
+        return (user, None)
+
+
+async def aauthenticate(request):
+    """
+    Authenticate a DRF request from a coroutine, like Request.user does
+    synchronously.
+    
+    Authentication classes provide an ``aauthenticate`` coroutine to resolve
+    credentials with the async ORM; others are run in a worker thread.
+    """
+    for authenticator in request.authenticators:
+        try:
+            if hasattr(authenticator, 'aauthenticate'):
+                user_auth_tuple = await authenticator.aauthenticate(request)
+            else:
+                user_auth_tuple = await sync_to_async(authenticator.authenticate)(request)
+        except APIException:
+            request._not_authenticated()
+            raise
+            
+        if user_auth_tuple is not None:
+            request._authenticator = authenticator
+            request.user, request.auth = user_auth_tuple
+            return
+            
+    request._not_authenticated()
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0004_apikey_unique_active_api_key_name_per_user'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='apikey',
+            index=models.Index(fields=['user', 'is_active', '-created_at', '-id'], name='apikey_user_active_created_idx'),
+        ),
+    ]
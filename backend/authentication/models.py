@@ -69,6 +69,16 @@ class MagicLink(models.Model):
             self.user_agent = user_agent
         self.save()
     
+    async def amark_as_used(self, ip_address=None, user_agent=None):
+        """Mark the magic link as used, from a coroutine"""
+        self.is_used = True
+        self.used_at = timezone.now()
+        if ip_address:
+            self.ip_address = ip_address
+        if user_agent:
+            self.user_agent = user_agent
+        await self.asave()
+    
     def __str__(self):
         return f"Magic Link for {self.user.email} - {'Used' if self.is_used else 'Active'}"
 
@@ -89,6 +99,7 @@ class APIKey(models.Model):
         indexes = [
             models.Index(fields=['key', 'is_active']),
             models.Index(fields=['user', 'is_active']),
+            models.Index(fields=['user', 'is_active', '-created_at', '-id'], name='apikey_user_active_created_idx'),
         ]
     
     def save(self, *args, **kwargs):
@@ -107,5 +118,10 @@ class APIKey(models.Model):
         self.last_used_at = timezone.now()
         self.save(update_fields=['last_used_at'])
     
+    async def aupdate_last_used(self):
+        """Update the last used timestamp, from a coroutine"""
+        self.last_used_at = timezone.now()
+        await self.asave(update_fields=['last_used_at'])
+    
     def __str__(self):
         return f"API Key '{self.name}' for {self.user.email}"
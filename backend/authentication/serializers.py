@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.core.validators import validate_email
+from drawnzones.sparse import SparseFieldsetMixin
 from .models import MagicLink, APIKey
 import re
 
@@ -35,23 +36,29 @@ class VerifyMagicLinkSerializer(serializers.Serializer):
     """
     token = serializers.UUIDField()
     
+    invalid_token_message = "Invalid magic link token."
+    
+    @staticmethod
+    def check_magic_link(magic_link):
+        """Raise a ValidationError if the magic link can't be used anymore"""
+        if magic_link.is_used:
+            raise serializers.ValidationError("This magic link has already been used.")
+        
+        if magic_link.is_expired():
+            raise serializers.ValidationError("This magic link has expired. Please request a new one.")
+    
     def validate_token(self, value):
         """Validate that the token exists and is valid"""
         try:
             magic_link = MagicLink.objects.select_related('user').get(token=value)
-            
-            if magic_link.is_used:
-                raise serializers.ValidationError("This magic link has already been used.")
-            
-            if magic_link.is_expired():
-                raise serializers.ValidationError("This magic link has expired. Please request a new one.")
+            self.check_magic_link(magic_link)
             
             # Store the magic link in context for use in the view
             self.context['magic_link'] = magic_link
             return value
             
         except MagicLink.DoesNotExist:
-            raise serializers.ValidationError("Invalid magic link token.")
+            raise serializers.ValidationError(self.invalid_token_message)
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -98,7 +105,7 @@ class MagicLinkSerializer(serializers.ModelSerializer):
         read_only_fields = ['token', 'created_at', 'expires_at', 'is_used', 'used_at']
 
 
-class APIKeySerializer(serializers.ModelSerializer):
+class APIKeySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = APIKey
         fields = ['id', 'name', 'key', 'created_at', 'last_used_at', 'is_active']
@@ -3,14 +3,19 @@ from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.core import mail
 from django.utils import timezone
-from rest_framework.test import APITestCase
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 from unittest.mock import patch
 from datetime import timedelta
 import uuid
 
-from authentication.models import MagicLink
+from authentication.authentication import (
+    APIKeyAuthentication, APIKeyTokenAuthentication, TokenAuthentication, aauthenticate
+)
+from authentication.models import APIKey, MagicLink
 from authentication.services import MagicLinkEmailService
 
 User = get_user_model()
@@ -524,3 +529,105 @@ class MagicLinkSecurityTests(APITestCase):
         user = User.objects.get(email=email)
         active_links = MagicLink.objects.filter(user=user, is_used=False)
         self.assertEqual(active_links.count(), 1)  # Only the latest one should be active
+
+
+class UserProfileConditionalTests(APITestCase):
+    """Test cases for conditional requests to the profile endpoint"""
+    
+    def setUp(self):
+        self.profile_url = reverse('authentication:user_profile')
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser'
+        )
+        self.client.force_authenticate(user=self.user)
+    
+    def test_profile_not_modified(self):
+        """Test a matching If-None-Match gets a 304 without a body"""
+        response = self.client.get(self.profile_url)
+        etag = response['ETag']
+        
+        response = self.client.get(self.profile_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+    
+    def test_profile_modified_after_update(self):
+        """Test the ETag changes when the profile is updated"""
+        etag = self.client.get(self.profile_url)['ETag']
+        
+        self.user.first_name = 'Changed'
+        self.user.save()
+        
+        response = self.client.get(self.profile_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['first_name'], 'Changed')
+
+
+class AsyncAuthenticationTests(APITestCase):
+    """Test cases for authentication from async views"""
+    
+    def setUp(self):
+        self.profile_url = reverse('authentication:user_profile')
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.api_key = APIKey.objects.create(user=self.user, name='Test key')
+    
+    def request(self, authorization):
+        request = APIRequestFactory().get(self.profile_url, HTTP_AUTHORIZATION=authorization)
+        return Request(request, authenticators=[
+            APIKeyTokenAuthentication(), APIKeyAuthentication(), TokenAuthentication()
+        ])
+    
+    async def test_credentials_resolved_without_sync_queries(self):
+        """Test every credential type authenticates from the event loop"""
+        for authorization, auth in (
+            (f'Token {self.token.key}', self.token),
+            (f'Token {self.api_key.key}', self.api_key),
+            (self.api_key.key, self.api_key),
+        ):
+            request = self.request(authorization)
+            await aauthenticate(request)
+            self.assertEqual(request.user, self.user)
+            self.assertEqual(request.auth, auth)
+        
+        await self.api_key.arefresh_from_db()
+        self.assertIsNotNone(self.api_key.last_used_at)
+        
+        request = self.request('Token invalid')
+        with self.assertRaises(AuthenticationFailed):
+            await aauthenticate(request)
+        self.assertFalse(request.user.is_authenticated)
+    
+    def test_profile_with_each_credential(self):
+        """Test the async profile view accepts tokens, API keys and sessions"""
+        for authorization in (f'Token {self.token.key}', self.api_key.key):
+            response = self.client.get(self.profile_url, HTTP_AUTHORIZATION=authorization)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['email'], 'test@example.com')
+        
+        self.client.force_login(self.user)
+        response = self.client.get(self.profile_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        self.client.logout()
+        response = self.client.get(self.profile_url, HTTP_AUTHORIZATION='invalid')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+    
+    def test_verify_magic_link_errors(self):
+        """Test the async verify view reports token errors like the serializer"""
+        verify_url = reverse('authentication:verify_magic_link')
+        magic_link = MagicLink.objects.create(user=self.user)
+        magic_link.mark_as_used()
+        
+        for data, message in (
+            ({}, 'This field is required.'),
+            ({'token': 'not-a-uuid'}, 'Must be a valid UUID.'),
+            ({'token': str(uuid.uuid4())}, 'Invalid magic link token.'),
+            ({'token': str(magic_link.token)}, 'This magic link has already been used.'),
+        ):
+            response = self.client.post(verify_url, data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data, {'token': [message]})
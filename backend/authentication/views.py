@@ -4,11 +4,17 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import empty
 from django.contrib.auth import authenticate, login
 from django.utils import timezone
 from datetime import timedelta
 import logging
 
+from drawnzones.asyncviews import async_api_view
+from drawnzones.conditional import make_etag, not_modified, set_validators
+from drawnzones.sparse import SparseFieldsetViewMixin
+
 from .models import User, MagicLink, APIKey
 from .serializers import (
     UserSerializer, 
@@ -66,62 +72,62 @@ def send_magic_link(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-@api_view(['POST'])
+@async_api_view(['POST'])
 @permission_classes([AllowAny])
-def verify_magic_link(request):
+async def verify_magic_link(request):
     """
     Verify magic link token and authenticate user
     """
-    serializer = VerifyMagicLinkSerializer(data=request.data)
-    if serializer.is_valid():
-        token = serializer.validated_data['token']
-        
+    # The token is validated like VerifyMagicLinkSerializer does, with the
+    # magic link read through the async ORM
+    data = request.data if isinstance(request.data, dict) else {}
+    try:
+        token = VerifyMagicLinkSerializer().fields['token'].run_validation(data.get('token', empty))
         try:
-            magic_link = MagicLink.objects.get(token=token)
-            
-            if not magic_link.is_valid():
-                return Response(
-                    {'error': 'Invalid or expired magic link.'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Mark as used
-            magic_link.mark_as_used(
-                ip_address=request.META.get('REMOTE_ADDR'),
-                user_agent=request.META.get('HTTP_USER_AGENT', '')
-            )
-            
-            # Get or create token for API access
-            token_obj, created = Token.objects.get_or_create(user=magic_link.user)
-            
-            return Response({
-                'message': 'Successfully authenticated!',
-                'token': token_obj.key,
-                'user': UserSerializer(magic_link.user).data
-            })
-            
+            magic_link = await MagicLink.objects.select_related('user').aget(token=token)
         except MagicLink.DoesNotExist:
-            return Response(
-                {'error': 'Invalid magic link token.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        except Exception as e:
-            logger.error(f"Error in verify_magic_link: {str(e)}")
-            return Response(
-                {'error': 'Authentication failed. Please try again.'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+            raise ValidationError(VerifyMagicLinkSerializer.invalid_token_message)
+        VerifyMagicLinkSerializer.check_magic_link(magic_link)
+    except ValidationError as e:
+        return Response({'token': e.detail}, status=status.HTTP_400_BAD_REQUEST)
     
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        # Mark as used
+        await magic_link.amark_as_used(
+            ip_address=request.META.get('REMOTE_ADDR'),
+            user_agent=request.META.get('HTTP_USER_AGENT', '')
+        )
+        
+        # Get or create token for API access
+        token_obj, created = await Token.objects.aget_or_create(user=magic_link.user)
+        
+        return Response({
+            'message': 'Successfully authenticated!',
+            'token': token_obj.key,
+            'user': UserSerializer(magic_link.user).data
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in verify_magic_link: {str(e)}")
+        return Response(
+            {'error': 'Authentication failed. Please try again.'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
 
 
-@api_view(['GET'])
+@async_api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def user_profile(request):
+async def user_profile(request):
     """
     Get current user profile
     """
-    return Response(UserSerializer(request.user).data)
+    user = request.user
+    etag = make_etag(user.id, user.updated_at.isoformat())
+    response = not_modified(request, etag, user.updated_at)
+    if response is not None:
+        return response
+    
+    return set_validators(Response(UserSerializer(user).data), etag, user.updated_at)
 
 
 @api_view(['POST'])
@@ -137,9 +143,11 @@ def logout(request):
         return Response({'message': 'Successfully logged out.'})
 
 
-class APIKeyListCreateView(generics.ListCreateAPIView):
+class APIKeyListCreateView(SparseFieldsetViewMixin, generics.ListCreateAPIView):
     """
     List and create API keys for the authenticated user
+    
+    Listings support sparse fieldsets with ?fields= or ?omit=.
     """
     permission_classes = [IsAuthenticated]
     
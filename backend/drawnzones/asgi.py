@@ -3,6 +3,12 @@ ASGI config for drawnzones project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Long-lived responses such as the rectangle change events stream
+(/api/rectangles/events/) need to be served by an ASGI server from this
+application; the Docker image and docker-compose run
+``uvicorn drawnzones.asgi:application``. Under WSGI (runserver, gunicorn
+without an ASGI worker) the stream would be buffered and never sent.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -0,0 +1,111 @@
+"""
+Async-native API views
+
+DRF views are synchronous, so under ASGI each request to them runs in a
+worker thread. AsyncAPIView keeps DRF's request handling (parsers,
+content negotiation, permissions, exception handling and rendering) but
+awaits coroutine handlers, and authenticates with the authentication
+classes' ``aauthenticate`` coroutines, so a request waiting on the database
+holds no thread of its own.
+
+A view may serve only some methods of a URL asynchronously and hand the
+others to the synchronous DRF view of the same URL, given as ``sync_view``.
+"""
+import inspect
+import types
+
+from asgiref.sync import sync_to_async
+from rest_framework.views import APIView
+
+from authentication.authentication import aauthenticate
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView whose handlers are coroutines
+    """
+    # View function serving the methods this view has no handler for
+    sync_view = None
+
+    async def dispatch(self, request, *args, **kwargs):
+        method = request.method.lower()
+        sync_view = type(self).sync_view
+        if sync_view is not None and not hasattr(self, method):
+            return await sync_to_async(sync_view)(request, *args, **kwargs)
+
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.ainitial(request, *args, **kwargs)
+
+            if method in self.http_method_names:
+                handler = getattr(self, method, self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def ainitial(self, request, *args, **kwargs):
+        """
+        Like APIView.initial, authenticating the request without blocking
+        """
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+
+        neg = self.perform_content_negotiation(request)
+        request.accepted_renderer, request.accepted_media_type = neg
+
+        version, scheme = self.determine_version(request, *args, **kwargs)
+        request.version, request.versioning_scheme = version, scheme
+
+        await aauthenticate(request)
+        self.check_permissions(request)
+        self.check_throttles(request)
+
+
+def async_api_view(http_method_names=None):
+    """
+    Like DRF's api_view, for coroutine function views. Takes the list of
+    allowed methods, and reads the same decorators (permission_classes,
+    parser_classes, ...).
+    """
+    http_method_names = ['GET'] if (http_method_names is None) else http_method_names
+
+    def decorator(func):
+        assert not isinstance(http_method_names, types.FunctionType), \
+            '@async_api_view missing list of allowed HTTP methods'
+        assert inspect.iscoroutinefunction(func), \
+            '@async_api_view expects a coroutine function'
+
+        WrappedAPIView = type('WrappedAPIView', (AsyncAPIView,), {'__doc__': func.__doc__})
+
+        allowed_methods = set(http_method_names) | {'options'}
+        WrappedAPIView.http_method_names = [method.lower() for method in allowed_methods]
+
+        async def handler(self, *args, **kwargs):
+            return await func(*args, **kwargs)
+
+        for method in http_method_names:
+            setattr(WrappedAPIView, method.lower(), handler)
+
+        WrappedAPIView.__name__ = func.__name__
+        WrappedAPIView.__module__ = func.__module__
+
+        for attribute in ('renderer_classes', 'parser_classes', 'authentication_classes',
+                          'throttle_classes', 'permission_classes', 'schema'):
+            setattr(WrappedAPIView, attribute, getattr(func, attribute, getattr(APIView, attribute)))
+
+        return WrappedAPIView.as_view()
+
+    return decorator
@@ -0,0 +1,61 @@
+"""
+Conditional GET support for API views
+
+Views compute a validator (ETag and/or Last-Modified) from cheap per-user
+version data before touching any other rows. ``not_modified`` answers
+``If-None-Match``/``If-Modified-Since`` with a 304, and
+``set_validators`` adds the validators to a full response.
+
+Last-Modified only has a resolution of one second, so a change made in the
+same second as a client's last fetch wouldn't move it. When a view has an
+ETag, only ``If-None-Match`` can get a 304; without one, ``If-Modified-Since``
+is only answered, and Last-Modified only sent, once that second has passed.
+"""
+import hashlib
+from calendar import timegm
+from datetime import timedelta
+
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    """Build a quoted ETag from the parts that identify a representation"""
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8'))
+    return quote_etag(digest.hexdigest()[:32])
+
+
+def _timestamp(last_modified):
+    return timegm(last_modified.utctimetuple()) if last_modified else None
+
+
+def _settled(last_modified):
+    """Whether no later change can share last_modified's second any more"""
+    return last_modified is not None and last_modified <= timezone.now() - timedelta(seconds=1)
+
+
+def not_modified(request, etag=None, last_modified=None):
+    """
+    Return a 304 response if the request's validators match, otherwise None
+    """
+    # If-Modified-Since is only trusted when it can't miss a change
+    trusted = last_modified if not etag and _settled(last_modified) else None
+    response = get_conditional_response(
+        request, etag=etag, last_modified=_timestamp(trusted)
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag=None, last_modified=None):
+    """Add the validators and per-user caching headers to a response"""
+    if etag:
+        response['ETag'] = etag
+    if last_modified and (etag or _settled(last_modified)):
+        response['Last-Modified'] = http_date(_timestamp(last_modified))
+    # Responses are private to the user and must be revalidated on every use
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Authorization', 'Cookie'])
+    return response
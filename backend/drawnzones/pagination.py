@@ -0,0 +1,190 @@
+"""
+Pagination for the API list endpoints
+
+Lists are paginated by keyset on (created_at, id) by default: cursors hold
+the values of every ordering field of the last row of a page, and the next
+page is the rows after it, as ``(created_at, id) < (c, i)``. Each page is a
+single index range scan, so deep pages are as fast as the first one and no
+COUNT(*) query is run. DRF's CursorPagination keeps only the first ordering
+field and skips rows sharing it with an offset, which scans those rows
+again on every page.
+
+Any ordering chosen through an OrderingFilter is followed by the id, so
+every row has a unique position and rows with equal sort values still have
+a stable order across pages.
+
+Page-number pagination is still available as an opt-in by passing ``?page=``,
+for views such as the dashboard that show page numbers and a total count.
+"""
+from base64 import b64decode
+from urllib import parse
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from django.db.models.fields.tuple_lookups import Tuple, TupleGreaterThan, TupleLessThan
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, PageNumberPagination
+
+
+def _after(ordering, position, reverse=False):
+    """
+    Filter matching the rows after position in ordering, or before it when
+    reverse
+    """
+    fields = [field.lstrip('-') for field in ordering]
+    descending = [field.startswith('-') != reverse for field in ordering]
+    if all(descending) or not any(descending):
+        lookup = TupleLessThan if descending[0] else TupleGreaterThan
+        return lookup(Tuple(*(F(field) for field in fields)), list(position))
+
+    # Mixed directions: a < x OR (a = x AND (b > y OR ...))
+    condition = Q()
+    for index in reversed(range(len(fields))):
+        step = Q(**{f"{fields[index]}__{'lt' if descending[index] else 'gt'}": position[index]})
+        if condition:
+            step |= Q(**{fields[index]: position[index]}) & condition
+        condition = step
+    return condition
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset pagination ordered newest first, falling back to page numbers
+    when the request asks for a page
+    """
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    page_number_query_param = 'page'
+
+    def __init__(self):
+        self.page_number_pagination = None
+
+    def get_ordering(self, request, queryset, view):
+        ordering = tuple(super().get_ordering(request, queryset, view))
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            ordering += ('-id' if ordering[0].startswith('-') else 'id',)
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.page_number_query_param in request.query_params:
+            return self.paginate_page_number(queryset, request, view)
+        query = self.keyset_query(queryset, request, view)
+        if query is None:
+            return None
+        try:
+            results = list(query)
+        except (ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return self.keyset_page(results)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset for async views, reading the keyset page with the
+        async ORM. Page-number pages use Django's Paginator, which is
+        synchronous, so they are read in a worker thread.
+        """
+        if self.page_number_query_param in request.query_params:
+            return await sync_to_async(self.paginate_page_number)(queryset, request, view)
+        query = self.keyset_query(queryset, request, view)
+        if query is None:
+            return None
+        try:
+            results = [row async for row in query]
+        except (ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return self.keyset_page(results)
+
+    def paginate_page_number(self, queryset, request, view):
+        self.page_number_pagination = PageNumberPagination()
+        self.page_number_pagination.page_size_query_param = self.page_size_query_param
+        self.page_number_pagination.max_page_size = self.max_page_size
+        return self.page_number_pagination.paginate_queryset(
+            queryset.order_by(*self.get_ordering(request, queryset, view)),
+            request, view=view
+        )
+
+    def keyset_query(self, queryset, request, view):
+        """
+        The query for a keyset page, like CursorPagination.paginate_queryset
+        but filtering on the position of every ordering field. Positions are
+        unique, so cursors never need an offset.
+
+        Returns None when pagination is turned off. The query fetches one
+        extra row, used by keyset_page to know whether there is a following
+        page.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            self.reverse, self.current_position = False, None
+        else:
+            self.reverse, self.current_position = self.cursor.reverse, self.cursor.position
+
+        if self.reverse:
+            queryset = queryset.order_by(*(
+                field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering
+            ))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if self.current_position is not None:
+            if len(self.current_position) != len(self.ordering):
+                raise NotFound(self.invalid_cursor_message)
+            try:
+                queryset = queryset.filter(_after(self.ordering, self.current_position, self.reverse))
+            except (ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+        return queryset[:self.page_size + 1]
+
+    def keyset_page(self, results):
+        """Set the links of the page read with keyset_query and return its rows"""
+        current_position = self.current_position
+        self.page = results[:self.page_size]
+        has_following = len(results) > len(self.page)
+        following_position = (
+            self._get_position_from_instance(results[-1], self.ordering) if has_following else None
+        )
+
+        if self.reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None
+            self.has_previous = has_following
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = has_following
+            self.has_previous = current_position is not None
+            self.next_position = following_position
+            self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            tokens = parse.parse_qs(b64decode(encoded.encode('ascii')).decode('ascii'), keep_blank_values=True)
+            reverse = bool(int(tokens.get('r', ['0'])[0]))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return Cursor(offset=0, reverse=reverse, position=tokens.get('p'))
+
+    def _get_position_from_instance(self, instance, ordering):
+        if isinstance(instance, dict):
+            return tuple(str(instance[field.lstrip('-')]) for field in ordering)
+        return tuple(str(getattr(instance, field.lstrip('-'))) for field in ordering)
+
+    def get_paginated_response(self, data):
+        if self.page_number_pagination is not None:
+            return self.page_number_pagination.get_paginated_response(data)
+        return super().get_paginated_response(data)
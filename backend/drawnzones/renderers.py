@@ -0,0 +1,92 @@
+"""
+Fast JSON rendering
+
+FastJSONRenderer encodes responses with orjson when it is installed, which
+matters for listings and exports carrying thousands of coordinate pairs.
+Without orjson, and for the cases orjson can't handle (indented output,
+integers over 64 bits), it falls back to DRF's JSONRenderer. The output
+matches DRF's compact, unicode JSON.
+
+orjson renders non-finite floats as null where DRF fails the response.
+When the output holds a null, the floats of the data are checked with
+math.isfinite, raising ValueError for NaN and infinity as JSONRenderer
+would without orjson.
+"""
+import math
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Types orjson doesn't serialize natively (Decimal, lazy strings, timedelta,
+# querysets, ...) are converted the same way as DRF's encoder does
+_encoder = JSONEncoder()
+
+_LINE_SEPARATOR = '\u2028'.encode()
+_PARAGRAPH_SEPARATOR = '\u2029'.encode()
+
+
+def _check_finite(data):
+    """Raise ValueError if data holds a NaN or infinite float"""
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            finite = math.isfinite(value)
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+            continue
+        elif isinstance(value, (list, tuple)):
+            try:
+                # Lists of numbers, such as positions, are checked at once
+                finite = all(map(math.isfinite, value))
+            except TypeError:
+                stack.extend(value)
+                continue
+        elif getattr(value, 'dtype', None) is not None and value.dtype.kind == 'f':
+            # numpy arrays and scalars
+            finite = value.size == 0 or (math.isfinite(value.min()) and math.isfinite(value.max()))
+        else:
+            continue
+        if not finite:
+            raise ValueError("Out of range float values are not JSON compliant")
+
+
+def dumps(data):
+    """Encode data to JSON bytes with orjson, as DRF's encoder would"""
+    return orjson.dumps(
+        data,
+        default=_encoder.default,
+        option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+    )
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Renderer which serializes to JSON with orjson, falling back to
+    JSONRenderer
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = dumps(data)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if b'null' in ret:
+            # Possibly a NaN or infinity, which JSONRenderer rejects
+            _check_finite(data)
+
+        # Escape U+2028 and U+2029 like JSONRenderer, keeping the output a
+        # strict javascript subset
+        if _LINE_SEPARATOR in ret or _PARAGRAPH_SEPARATOR in ret:
+            ret = ret.replace(_LINE_SEPARATOR, b'\\u2028').replace(_PARAGRAPH_SEPARATOR, b'\\u2029')
+        return ret
@@ -0,0 +1,97 @@
+"""
+Sparse fieldsets for API listings
+
+``?fields=id,name`` returns only the listed fields and ``?omit=coordinates``
+returns all but the listed fields. The selection is applied to the query
+too, so columns that aren't needed are never loaded or decoded.
+"""
+from rest_framework.exceptions import ValidationError
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin that drops the fields not in the ``selected_fields``
+    serializer context entry.
+
+    Serializers whose fields read columns other than the model field of the
+    same name list them in ``field_columns``.
+    """
+    field_columns = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = self.context.get('selected_fields')
+        if selected is not None:
+            for name in list(self.fields):
+                if name not in selected:
+                    self.fields.pop(name)
+
+
+def selected_fields(request, serializer_class):
+    """
+    Return the field names selected by ``?fields=`` or ``?omit=``, or None
+    when the request doesn't restrict them.
+
+    Raises ValidationError for unknown field names.
+    """
+    available = list(serializer_class.Meta.fields)
+    selected = None
+    for param in ('fields', 'omit'):
+        value = request.query_params.get(param)
+        if not value:
+            continue
+        names = {name.strip() for name in value.split(',') if name.strip()}
+        unknown = names.difference(available)
+        if unknown:
+            raise ValidationError({
+                param: [f"Unknown fields: {', '.join(sorted(unknown))}"]
+            })
+        if param == 'fields':
+            selected = names
+        else:
+            selected = (selected if selected is not None else set(available)) - names
+    return selected
+
+
+def selected_columns(serializer_class, selected):
+    """Return the model columns needed to serialize the selected fields"""
+    model_fields = {field.name for field in serializer_class.Meta.model._meta.concrete_fields}
+    columns = set()
+    for name in selected:
+        if name in serializer_class.field_columns:
+            columns.update(serializer_class.field_columns[name])
+        elif name in model_fields:
+            columns.add(name)
+    return columns
+
+
+class SparseFieldsetViewMixin:
+    """
+    Generic view mixin applying ``?fields=``/``?omit=`` of read requests to
+    the serializer and, through ``.only()``, to the queryset
+    """
+
+    def get_selected_fields(self):
+        if self.request.method not in ('GET', 'HEAD'):
+            return None
+        return selected_fields(self.request, self.get_serializer_class())
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['selected_fields'] = self.get_selected_fields()
+        return context
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        selected = self.get_selected_fields()
+        if selected is None:
+            return queryset
+
+        # Columns used for ordering and pagination are always loaded
+        ordering = [
+            *(queryset.query.order_by or queryset.model._meta.ordering),
+            *getattr(self.paginator, 'ordering', ()),
+        ]
+        columns = selected_columns(self.get_serializer_class(), selected)
+        columns.update(field.lstrip('-') for field in ordering)
+        return queryset.only(*columns)
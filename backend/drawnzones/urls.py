@@ -39,7 +39,19 @@ def api_root(request):
             'rectangles': {
                 'list_create': '/api/rectangles/',
                 'detail': '/api/rectangles/{id}/',
+                'bulk': '/api/rectangles/bulk/',
+                'export': '/api/rectangles/export/?output={geojson|ndjson}',
+                'import': '/api/rectangles/import/',
+                'changes': '/api/rectangles/changes/?since={seq}',
+                'events': '/api/rectangles/events/',
                 'stats': '/api/rectangles/stats/',
+                'contains': '/api/rectangles/contains/?lng={lng}&lat={lat}',
+                'nearest': '/api/rectangles/nearest/?lng={lng}&lat={lat}&k={k}',
+                'classify': '/api/rectangles/classify/',
+                'geofence': '/api/rectangles/geofence/',
+                'overlaps': '/api/rectangles/overlaps/',
+                'tiles': '/api/rectangles/tiles/{z}/{x}/{y}.mvt',
+                'clusters': '/api/rectangles/clusters/?zoom={zoom}&bbox={bbox}',
             },
             'admin': '/admin/',
             'api_auth': '/api-auth/',
@@ -1,13 +1,36 @@
+from django import forms
 from django.contrib import admin
 from .models import Rectangle
 
 
+class RectangleAdminForm(forms.ModelForm):
+    """
+    Edit the packed geometry as GeoJSON through the coordinates property
+    """
+    coordinates = forms.JSONField(help_text="GeoJSON coordinates for the rectangle")
+    
+    class Meta:
+        model = Rectangle
+        fields = ['user', 'name']
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.initial['coordinates'] = self.instance.coordinates
+    
+    def save(self, commit=True):
+        self.instance.coordinates = self.cleaned_data['coordinates']
+        return super().save(commit=commit)
+
+
 @admin.register(Rectangle)
 class RectangleAdmin(admin.ModelAdmin):
+    form = RectangleAdminForm
     list_display = ['name', 'user', 'created_at', 'updated_at']
     list_filter = ['created_at', 'updated_at']
     search_fields = ['name', 'user__email']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['created_at', 'updated_at', 'min_lng', 'min_lat', 'max_lng', 'max_lat',
+                       'center_lng', 'center_lat', 'area']
     ordering = ['-created_at']
     
     fieldsets = (
@@ -15,7 +38,8 @@ class RectangleAdmin(admin.ModelAdmin):
             'fields': ('user', 'name')
         }),
         ('Geographic Data', {
-            'fields': ('coordinates',),
+            'fields': ('coordinates', ('min_lng', 'min_lat'), ('max_lng', 'max_lat'),
+                       ('center_lng', 'center_lat'), 'area'),
             'classes': ('collapse',)
         }),
         ('Timestamps', {
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class RectanglesConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'rectangles'
+    
+    def ready(self):
+        # Connect signal handlers that keep caches in sync with Rectangle changes
+        from . import signals  # noqa: F401
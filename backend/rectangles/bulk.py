@@ -0,0 +1,194 @@
+"""
+Bulk create, update and delete of rectangles
+
+The geometries of a batch are validated together, every other field of an
+item on its own, name conflicts for the whole batch are
+resolved with a single query, and the valid items are written with
+bulk_create/bulk_update in one transaction. If a concurrent write takes one
+of the names in between, the unique name constraint rejects the batch and
+it is resolved and written again. Invalid items are skipped and
+reported with their position in the batch.
+"""
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Rectangle, GEOMETRY_FIELDS, is_duplicate_name_error
+from .serializers import DUPLICATE_NAME_ERROR, RectangleBulkItemSerializer
+from .signals import batched_zone_changes, send_zones_changed
+from .validation import validate_polygons
+
+BATCH_SIZE = 1000
+
+
+def _error_list(errors, key):
+    return [{key: position, 'errors': errors[position]} for position in sorted(errors)]
+
+
+def _retry_name_conflicts(write):
+    """
+    Call write(), which resolves name conflicts and writes a batch, once
+    more if a concurrent writer took one of the names in between
+    """
+    try:
+        return write()
+    except IntegrityError as e:
+        if not is_duplicate_name_error(e):
+            raise
+    return write()
+
+
+def _geometry_contexts(items):
+    """
+    Validate the coordinates of a batch of items at once, and return the
+    serializer context of every item. Items with invalid coordinates are
+    left to report the error from their serializer.
+    """
+    geometry_errors = validate_polygons([
+        item.get('coordinates') if isinstance(item, dict) else None for item in items
+    ])
+    return [{'geometry_validated': error is None} for error in geometry_errors]
+
+
+def _conflicting_names(user, names, exclude_ids=()):
+    """Return the names already used by the user's other rectangles"""
+    return set(
+        Rectangle.objects
+        .filter(user=user, name__in=set(names))
+        .exclude(id__in=exclude_ids)
+        .values_list('name', flat=True)
+    )
+
+
+def bulk_create_rectangles(user, items):
+    """
+    Validate and create a batch of rectangles for a user.
+
+    Returns a (created rectangles, errors) tuple, where errors lists the
+    index and validation errors of every item that was not created.
+    """
+    errors = {}
+    valid = []
+    for index, (item, context) in enumerate(zip(items, _geometry_contexts(items))):
+        serializer = RectangleBulkItemSerializer(data=item, context=context)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            errors[index] = serializer.errors
+
+    def write():
+        conflicts = {}
+        existing_names = _conflicting_names(user, [data['name'] for _, data in valid])
+        batch_names = set()
+        rectangles = []
+        for index, data in valid:
+            if data['name'] in existing_names or data['name'] in batch_names:
+                conflicts[index] = {'name': [DUPLICATE_NAME_ERROR]}
+                continue
+            batch_names.add(data['name'])
+
+            rectangle = Rectangle(user=user, **data)
+            rectangle.update_geometry()
+            rectangles.append(rectangle)
+
+        if rectangles:
+            with transaction.atomic():
+                rectangles = Rectangle.objects.bulk_create(rectangles, batch_size=BATCH_SIZE)
+                send_zones_changed(user.id, created=rectangles)
+        return rectangles, conflicts
+
+    rectangles, conflicts = _retry_name_conflicts(write)
+    errors.update(conflicts)
+    return rectangles, _error_list(errors, 'index')
+
+
+def bulk_update_rectangles(user, items):
+    """
+    Validate and apply a batch of partial updates, each identified by 'id'.
+
+    Returns an (updated rectangles, errors) tuple, where errors lists the
+    index and validation errors of every item that was not applied.
+    """
+    errors = {}
+    requested_ids = [
+        item.get('id') for item in items
+        if isinstance(item, dict) and isinstance(item.get('id'), int)
+    ]
+    instances = Rectangle.objects.filter(user=user).in_bulk(requested_ids)
+
+    valid = []
+    seen_ids = set()
+    for index, (item, context) in enumerate(zip(items, _geometry_contexts(items))):
+        rectangle_id = item.get('id') if isinstance(item, dict) else None
+        if not isinstance(rectangle_id, int):
+            errors[index] = {'id': ["A rectangle id is required"]}
+            continue
+        if rectangle_id not in instances:
+            errors[index] = {'id': ["Rectangle not found"]}
+            continue
+        if rectangle_id in seen_ids:
+            errors[index] = {'id': ["Rectangle is updated more than once in this batch"]}
+            continue
+        seen_ids.add(rectangle_id)
+
+        instance = instances[rectangle_id]
+        serializer = RectangleBulkItemSerializer(instance, data=item, partial=True, context=context)
+        if serializer.is_valid():
+            valid.append((index, instance, serializer.validated_data))
+        else:
+            errors[index] = serializer.errors
+
+    final_names = [data.get('name', instance.name) for _, instance, data in valid]
+
+    def write():
+        conflicts = {}
+        existing_names = _conflicting_names(
+            user, final_names, exclude_ids=[instance.id for _, instance, _ in valid]
+        )
+        batch_names = set()
+        now = timezone.now()
+        rectangles = []
+        for (index, instance, data), name in zip(valid, final_names):
+            if name in existing_names or name in batch_names:
+                conflicts[index] = {'name': [DUPLICATE_NAME_ERROR]}
+                continue
+            batch_names.add(name)
+
+            for field, value in data.items():
+                setattr(instance, field, value)
+            instance.update_geometry()
+            instance.updated_at = now
+            rectangles.append(instance)
+
+        if rectangles:
+            with transaction.atomic():
+                Rectangle.objects.bulk_update(
+                    rectangles,
+                    ['name', 'updated_at', *GEOMETRY_FIELDS],
+                    batch_size=BATCH_SIZE
+                )
+                send_zones_changed(user.id, updated=rectangles)
+        return rectangles, conflicts
+
+    rectangles, conflicts = _retry_name_conflicts(write)
+    errors.update(conflicts)
+    return rectangles, _error_list(errors, 'index')
+
+
+def bulk_delete_rectangles(user, ids):
+    """
+    Delete a batch of the user's rectangles by id.
+
+    Returns a (deleted ids, errors) tuple, where errors lists every id that
+    does not belong to one of the user's rectangles.
+    """
+    rectangles = list(Rectangle.objects.filter(user=user, id__in=ids))
+    found_ids = [rectangle.id for rectangle in rectangles]
+    missing_ids = set(ids) - set(found_ids)
+    errors = {rectangle_id: ["Rectangle not found"] for rectangle_id in missing_ids}
+
+    if rectangles:
+        with transaction.atomic(), batched_zone_changes():
+            Rectangle.objects.filter(id__in=found_ids).delete()
+            send_zones_changed(user.id, deleted=rectangles)
+
+    return found_ids, _error_list(errors, 'id')
@@ -0,0 +1,52 @@
+"""
+Per-user cache generations for derived rectangle data
+
+Every change to a user's rectangles bumps that user's generation in the
+configured Django cache. Anything derived from the rectangles (spatial
+indexes, encoded tiles, ...) is keyed by the generation it was built from,
+so it is invalidated in every process that reads the same cache.
+
+That only spans processes when the cache is shared between them, as with
+the Redis cache configured by REDIS_URL. Django's default local-memory
+cache is private to each process, so a bump made in one process is never
+seen by another and their derived data would go stale.
+"""
+import time
+
+from django.core.cache import cache
+
+
+def _generation_key(user_id):
+    return f"rectangles:generation:{user_id}"
+
+
+def get_generation(user_id):
+    """Return the current cache generation for a user's rectangles"""
+    key = _generation_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        # Seed with a timestamp so an evicted key never reuses an old value
+        cache.add(key, time.time_ns(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+async def aget_generation(user_id):
+    """Return the current cache generation for a user's rectangles, from a coroutine"""
+    key = _generation_key(user_id)
+    generation = await cache.aget(key)
+    if generation is None:
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        generation = await cache.aget(key)
+    return generation
+
+
+def bump_generation(user_id):
+    """Invalidate everything cached for a user's rectangles"""
+    key = _generation_key(user_id)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Key is missing, so nothing built from an older generation can match
+        cache.set(key, time.time_ns(), timeout=None)
+        return cache.get(key)
@@ -0,0 +1,81 @@
+"""
+Delta sync from the rectangle change log
+
+Clients remember the sequence number of their last sync and ask for the
+changes since then. Entries are compacted per rectangle, so a rectangle
+changed many times is sent once, and rectangles created and deleted since
+the last sync aren't sent at all. When the log no longer reaches back to
+the client's sequence number (it was pruned, or predates the log), the
+client is told to resync: reload the full list and continue from the
+returned sequence number.
+"""
+from collections import namedtuple
+
+from django.conf import settings
+
+from .fastpath import rectangle_values, serialize_rectangles
+from .models import Rectangle, ZoneChange, ZoneVersion
+
+# changed and deleted are lists of rectangle ids. has_more is set when the
+# changes up to seq are only part of the pending ones.
+ChangeSet = namedtuple('ChangeSet', ['seq', 'resync', 'has_more', 'changed', 'deleted'])
+
+
+def changes_since(user_id, since):
+    """
+    Return the ChangeSet of a user's rectangles after sequence number since.
+
+    Raises ValueError if since is ahead of the user's current sequence.
+    """
+    version, _ = ZoneVersion.current(user_id)
+    if since > version:
+        raise ValueError("since is ahead of the current sequence number")
+    if since == version:
+        return ChangeSet(version, False, False, [], [])
+
+    limit = getattr(settings, 'RECTANGLES_CHANGES_PAGE_SIZE', 1000)
+    entries = ZoneChange.objects.filter(user_id=user_id).order_by('seq', 'id')
+    rows = list(entries.filter(seq__gt=since).values_list('seq', 'rectangle_id', 'action')[:limit + 1])
+    if not rows or rows[0][0] != since + 1:
+        return ChangeSet(version, True, False, [], [])
+
+    has_more = len(rows) > limit
+    if has_more:
+        # Only send whole batches; a single batch larger than a page is sent whole
+        cut = rows[limit][0]
+        rows = [row for row in rows[:limit] if row[0] < cut]
+        if not rows:
+            rows = list(entries.filter(seq=cut).values_list('seq', 'rectangle_id', 'action'))
+
+    first_actions = {}
+    last_actions = {}
+    for _, rectangle_id, action in rows:
+        first_actions.setdefault(rectangle_id, action)
+        last_actions[rectangle_id] = action
+
+    changed = []
+    deleted = []
+    for rectangle_id, action in last_actions.items():
+        if action != ZoneChange.DELETED:
+            changed.append(rectangle_id)
+        elif first_actions[rectangle_id] != ZoneChange.CREATED:
+            deleted.append(rectangle_id)
+    return ChangeSet(rows[-1][0], False, has_more, changed, deleted)
+
+
+def change_set_data(user_id, change_set):
+    """
+    Build the response data of a ChangeSet, with the current state of the
+    changed rectangles
+    """
+    changed = []
+    if change_set.changed:
+        rectangles = Rectangle.objects.filter(user_id=user_id, id__in=change_set.changed)
+        changed = serialize_rectangles(rectangle_values(rectangles.order_by('id')))
+    return {
+        'seq': change_set.seq,
+        'resync': change_set.resync,
+        'has_more': change_set.has_more,
+        'changed': changed,
+        'deleted': change_set.deleted,
+    }
@@ -0,0 +1,244 @@
+"""
+Vectorized batch point-in-zone classification
+
+Zones are bucketed into a uniform grid over their bounding boxes. Each point
+is mapped to a single grid cell, expanded into (point, candidate zone) pairs
+for that cell and tested against the candidate bounds, all with NumPy array
+operations. Very large batches are split into chunks and classified across a
+process pool.
+
+This module only imports Django lazily so that pool workers can import the
+classification kernel without a configured Django environment.
+"""
+import math
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Points classified per vectorized step; bounds the size of the pair arrays
+STEP_SIZE = 65536
+
+# Upper limit on grid cells per axis
+MAX_GRID_SIZE = 1024
+
+# Average number of grid cells a zone may be expanded into
+MAX_CELLS_PER_ZONE = 16
+
+
+class ZoneGrid:
+    """
+    Uniform grid over zone bounding boxes for vectorized point lookups
+    """
+
+    def __init__(self, zone_ids, bounds):
+        """
+        zone_ids is a sequence of n ids and bounds an (n, 4) array of
+        (min_lng, min_lat, max_lng, max_lat) rows.
+        """
+        self.zone_ids = np.asarray(zone_ids, dtype=np.int64)
+        self.bounds = np.asarray(bounds, dtype=np.float64).reshape(-1, 4)
+        self.size = len(self.bounds)
+
+        if self.size == 0:
+            return
+
+        self.min_x, self.min_y = self.bounds[:, 0].min(), self.bounds[:, 1].min()
+        self.max_x, self.max_y = self.bounds[:, 2].max(), self.bounds[:, 3].max()
+
+        # Start from roughly one zone per cell and coarsen the grid while
+        # large zones would be expanded into too many cells
+        self.grid_size = min(MAX_GRID_SIZE, max(1, int(math.sqrt(self.size))))
+        while True:
+            self.cell_width = max(self.max_x - self.min_x, 1e-9) / self.grid_size
+            self.cell_height = max(self.max_y - self.min_y, 1e-9) / self.grid_size
+
+            ix0 = self._column(self.bounds[:, 0])
+            ix1 = self._column(self.bounds[:, 2])
+            iy0 = self._row(self.bounds[:, 1])
+            iy1 = self._row(self.bounds[:, 3])
+
+            widths = ix1 - ix0 + 1
+            counts = widths * (iy1 - iy0 + 1)
+            if self.grid_size == 1 or counts.sum() <= MAX_CELLS_PER_ZONE * self.size:
+                break
+            self.grid_size //= 2
+
+        # Expand every zone into the grid cells its bounds overlap
+        zone_index = np.repeat(np.arange(self.size), counts)
+        offsets = _range_offsets(counts)
+        cells = (
+            (iy0[zone_index] + offsets // widths[zone_index]) * self.grid_size
+            + ix0[zone_index] + offsets % widths[zone_index]
+        )
+
+        order = np.argsort(cells, kind='stable')
+        self.cell_zones = zone_index[order]
+        self.cell_starts = np.zeros(self.grid_size * self.grid_size + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(cells, minlength=self.grid_size * self.grid_size),
+            out=self.cell_starts[1:]
+        )
+
+    def __len__(self):
+        return self.size
+
+    def _column(self, x):
+        return np.clip(
+            ((x - self.min_x) / self.cell_width).astype(np.int64), 0, self.grid_size - 1
+        )
+
+    def _row(self, y):
+        return np.clip(
+            ((y - self.min_y) / self.cell_height).astype(np.int64), 0, self.grid_size - 1
+        )
+
+    def classify(self, points):
+        """
+        Classify an (n, 2) array of (lng, lat) points.
+
+        Returns a (point_index, zone_id) pair of arrays listing every match,
+        ordered by point index.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if self.size == 0 or len(points) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        point_indexes = []
+        zone_ids = []
+        for start in range(0, len(points), STEP_SIZE):
+            point_index, zone_index = self._classify_step(points[start:start + STEP_SIZE])
+            point_indexes.append(point_index + start)
+            zone_ids.append(self.zone_ids[zone_index])
+
+        return np.concatenate(point_indexes), np.concatenate(zone_ids)
+
+    def _classify_step(self, points):
+        x, y = points[:, 0], points[:, 1]
+        inside = (x >= self.min_x) & (x <= self.max_x) & (y >= self.min_y) & (y <= self.max_y)
+        point_index = np.flatnonzero(inside)
+
+        cells = self._row(y[point_index]) * self.grid_size + self._column(x[point_index])
+        starts = self.cell_starts[cells]
+        counts = self.cell_starts[cells + 1] - starts
+
+        # Expand each point into (point, candidate zone) pairs for its cell
+        pair_point = np.repeat(point_index, counts)
+        pair_zone = self.cell_zones[np.repeat(starts, counts) + _range_offsets(counts)]
+
+        candidate = self.bounds[pair_zone]
+        px, py = x[pair_point], y[pair_point]
+        hit = (
+            (candidate[:, 0] <= px) & (px <= candidate[:, 2])
+            & (candidate[:, 1] <= py) & (py <= candidate[:, 3])
+        )
+        return pair_point[hit], pair_zone[hit]
+
+
+def _range_offsets(counts):
+    """Return concatenated aranges: [0..counts[0]), [0..counts[1]), ..."""
+    total = int(counts.sum())
+    starts = np.cumsum(counts) - counts
+    return np.arange(total, dtype=np.int64) - np.repeat(starts, counts)
+
+
+def group_by_point(point_count, point_index, zone_ids):
+    """Turn ordered match arrays into one list of zone ids per point"""
+    groups = [[] for _ in range(point_count)]
+    matched, starts = np.unique(point_index, return_index=True)
+    ends = np.append(starts[1:], len(point_index))
+    ids = zone_ids.tolist()
+    for point, start, end in zip(matched.tolist(), starts.tolist(), ends.tolist()):
+        groups[point] = ids[start:end]
+    return groups
+
+
+def _classify_chunk(grid, points):
+    return grid.classify(points)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    from django.conf import settings
+
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = getattr(settings, 'RECTANGLES_CLASSIFY_WORKERS', None) or os.cpu_count()
+            _executor = ProcessPoolExecutor(max_workers=workers)
+        return _executor
+
+
+def classify_points(grid, points):
+    """
+    Classify points against a ZoneGrid, spreading very large batches across
+    a process pool.
+
+    Returns a (point_index, zone_id) pair of arrays ordered by point index.
+    """
+    from django.conf import settings
+
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    chunk_size = getattr(settings, 'RECTANGLES_CLASSIFY_CHUNK_SIZE', 250000)
+
+    if len(points) <= chunk_size or len(grid) == 0:
+        return grid.classify(points)
+
+    starts = range(0, len(points), chunk_size)
+    chunks = [points[start:start + chunk_size] for start in starts]
+    results = _get_executor().map(_classify_chunk, [grid] * len(chunks), chunks)
+
+    point_indexes = []
+    zone_ids = []
+    for start, (point_index, chunk_zone_ids) in zip(starts, results):
+        point_indexes.append(point_index + start)
+        zone_ids.append(chunk_zone_ids)
+    return np.concatenate(point_indexes), np.concatenate(zone_ids)
+
+
+_grid_cache = None
+
+
+def get_user_grid(user_id):
+    """Return the (lazily built) ZoneGrid for a user's rectangles"""
+    from .caching import get_generation
+    from .models import Rectangle
+    from .spatial import UserIndexCache
+
+    global _grid_cache
+    if _grid_cache is None:
+        _grid_cache = UserIndexCache()
+
+    generation = get_generation(user_id)
+    grid = _grid_cache.get(user_id, generation)
+    if grid is None:
+        rows = list(
+            Rectangle.objects
+            .filter(user_id=user_id, min_lng__isnull=False)
+            .values_list('id', 'min_lng', 'min_lat', 'max_lng', 'max_lat')
+        )
+        data = np.array(rows, dtype=np.float64).reshape(-1, 5)
+        grid = ZoneGrid(data[:, 0].astype(np.int64), data[:, 1:])
+        _grid_cache.set(user_id, generation, grid)
+    return grid
+
+
+def invalidate_user_grid(user_id):
+    """Drop the cached ZoneGrid for a user in this process"""
+    if _grid_cache is not None:
+        _grid_cache.discard(user_id)
+
+
+def classify_user_points(user_id, points):
+    """
+    Classify (lng, lat) points against a user's rectangles.
+
+    Returns a list with one list of containing rectangle ids per point.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    point_index, zone_ids = classify_points(get_user_grid(user_id), points)
+    return group_by_point(len(points), point_index, zone_ids)
@@ -0,0 +1,288 @@
+"""
+Hierarchical clustering of zone centers for low zoom map views
+
+Zone centers are aggregated into a pyramid of Web Mercator grids, one per
+zoom level. Every level has CELLS_PER_TILE cells per tile axis, so a cell
+is about CLUSTER_RADIUS pixels wide on screen, and each cell is the union of
+four cells of the next level. Clusters carry their zone count, the centroid
+of the zone centers and the bounds of the zones' boxes.
+
+The pyramid is cached per user and process like the spatial index. When
+the user's rectangles change in this process it is updated in place instead
+of being rebuilt: adding a zone touches one cell per level, and removing
+one recalculates one cell per level from its members or four children.
+Changes are applied once they are committed, so a rolled back write never
+reaches the pyramid.
+"""
+import math
+import threading
+
+import numpy as np
+
+from .caching import get_generation
+from .models import Rectangle
+from .spatial import UserIndexCache
+
+# Highest zoom level with clusters; deeper zooms use its cells
+MAX_CLUSTER_ZOOM = 16
+
+TILE_SIZE = 256
+CLUSTER_RADIUS = 64
+CELLS_PER_TILE = TILE_SIZE // CLUSTER_RADIUS
+
+MAX_LAT = 85.0511287798
+
+# Cell aggregate layout
+COUNT, SUM_LNG, SUM_LAT, MIN_LNG, MIN_LAT, MAX_LNG, MAX_LAT = range(7)
+
+
+def _cells_per_axis(zoom):
+    return CELLS_PER_TILE << zoom
+
+
+def _column(lng, cells):
+    return min(max(int((lng + 180) / 360 * cells), 0), cells - 1)
+
+
+def _row(lat, cells):
+    lat = max(min(lat, MAX_LAT), -MAX_LAT)
+    sin_lat = math.sin(math.radians(lat))
+    y = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return min(max(int(y * cells), 0), cells - 1)
+
+
+def _merge(cells):
+    """Aggregate of a non-empty list of cell aggregates"""
+    return [
+        sum(cell[COUNT] for cell in cells),
+        sum(cell[SUM_LNG] for cell in cells),
+        sum(cell[SUM_LAT] for cell in cells),
+        min(cell[MIN_LNG] for cell in cells),
+        min(cell[MIN_LAT] for cell in cells),
+        max(cell[MAX_LNG] for cell in cells),
+        max(cell[MAX_LAT] for cell in cells),
+    ]
+
+
+def _zone_cell(zone):
+    """Aggregate of a single (id, center_lng, center_lat, *bounds) zone"""
+    _, center_lng, center_lat, min_lng, min_lat, max_lng, max_lat = zone
+    return [1, center_lng, center_lat, min_lng, min_lat, max_lng, max_lat]
+
+
+class ClusterIndex:
+    """
+    Pyramid of grid clusters over zones given as (id, center_lng,
+    center_lat, min_lng, min_lat, max_lng, max_lat) tuples
+    """
+
+    def __init__(self, zones=()):
+        self._lock = threading.Lock()
+        # Zones of every cell of the deepest level, and the cell of each zone
+        self.members = {}
+        self.zone_cells = {}
+        self.levels = [{} for _ in range(MAX_CLUSTER_ZOOM + 1)]
+
+        zones = list(zones)
+        if not zones:
+            return
+        data = np.array(zones, dtype=np.float64).reshape(-1, 7)
+        cells = _cells_per_axis(MAX_CLUSTER_ZOOM)
+        lat = np.radians(np.clip(data[:, 2], -MAX_LAT, MAX_LAT))
+        y = 0.5 - np.log((1 + np.sin(lat)) / (1 - np.sin(lat))) / (4 * math.pi)
+        columns = np.clip(((data[:, 1] + 180) / 360 * cells).astype(np.int64), 0, cells - 1)
+        rows = np.clip((y * cells).astype(np.int64), 0, cells - 1)
+
+        for zone, column, row in zip(zones, columns.tolist(), rows.tolist()):
+            self.members.setdefault((column, row), {})[zone[0]] = zone
+            self.zone_cells[zone[0]] = (column, row)
+
+        # Aggregate every level at once from the zones sorted by cell
+        for zoom in range(MAX_CLUSTER_ZOOM, -1, -1):
+            keys = columns * cells + rows
+            order = np.argsort(keys, kind='stable')
+            starts = np.flatnonzero(np.diff(keys[order], prepend=-1))
+            ordered = data[order]
+            aggregates = np.column_stack([
+                np.diff(starts, append=len(order)),
+                np.add.reduceat(ordered[:, 1], starts),
+                np.add.reduceat(ordered[:, 2], starts),
+                np.minimum.reduceat(ordered[:, 3], starts),
+                np.minimum.reduceat(ordered[:, 4], starts),
+                np.maximum.reduceat(ordered[:, 5], starts),
+                np.maximum.reduceat(ordered[:, 6], starts),
+            ]).tolist()
+            first = order[starts]
+            self.levels[zoom] = {
+                key: [int(cell[COUNT]), *cell[1:]]
+                for key, cell in zip(
+                    zip(columns[first].tolist(), rows[first].tolist()), aggregates
+                )
+            }
+            columns, rows, cells = columns >> 1, rows >> 1, cells >> 1
+
+    def __len__(self):
+        return len(self.zone_cells)
+
+    def add(self, zone):
+        """Add a zone, or replace the zone with the same id"""
+        with self._lock:
+            self._remove(zone[0])
+            cells = _cells_per_axis(MAX_CLUSTER_ZOOM)
+            column, row = _column(zone[1], cells), _row(zone[2], cells)
+            self.members.setdefault((column, row), {})[zone[0]] = zone
+            self.zone_cells[zone[0]] = (column, row)
+
+            added = _zone_cell(zone)
+            for zoom in range(MAX_CLUSTER_ZOOM, -1, -1):
+                level = self.levels[zoom]
+                cell = level.get((column, row))
+                level[(column, row)] = added if cell is None else _merge([cell, added])
+                column, row = column >> 1, row >> 1
+
+    def remove(self, zone_id):
+        """Remove a zone if it is in the index"""
+        with self._lock:
+            self._remove(zone_id)
+
+    def _remove(self, zone_id):
+        key = self.zone_cells.pop(zone_id, None)
+        if key is None:
+            return
+        zones = self.members[key]
+        del zones[zone_id]
+        if zones:
+            self.levels[MAX_CLUSTER_ZOOM][key] = _merge([_zone_cell(zone) for zone in zones.values()])
+        else:
+            del self.members[key]
+            del self.levels[MAX_CLUSTER_ZOOM][key]
+
+        column, row = key
+        for zoom in range(MAX_CLUSTER_ZOOM - 1, -1, -1):
+            column, row = column >> 1, row >> 1
+            children = self.levels[zoom + 1]
+            cells = [
+                children[child]
+                for child in (
+                    (column * 2, row * 2), (column * 2 + 1, row * 2),
+                    (column * 2, row * 2 + 1), (column * 2 + 1, row * 2 + 1),
+                )
+                if child in children
+            ]
+            if cells:
+                self.levels[zoom][(column, row)] = _merge(cells)
+            else:
+                self.levels[zoom].pop((column, row), None)
+
+    def clusters(self, zoom, min_lng, min_lat, max_lng, max_lat):
+        """
+        Return the clusters at a zoom level whose cells overlap the bbox, as
+        dicts with count, center and bounds, and zone_id for single zones
+        """
+        zoom = min(max(int(zoom), 0), MAX_CLUSTER_ZOOM)
+        cells = _cells_per_axis(zoom)
+        if min_lng <= max_lng:
+            columns = [(_column(min_lng, cells), _column(max_lng, cells))]
+        else:
+            # The bbox crosses the antimeridian
+            columns = [(_column(min_lng, cells), cells - 1), (0, _column(max_lng, cells))]
+        first_row, last_row = _row(max_lat, cells), _row(min_lat, cells)
+
+        with self._lock:
+            level = self.levels[zoom]
+            area = sum(last - first + 1 for first, last in columns) * (last_row - first_row + 1)
+            if area <= len(level):
+                keys = (
+                    (column, row)
+                    for first, last in columns
+                    for column in range(first, last + 1)
+                    for row in range(first_row, last_row + 1)
+                )
+                found = [(key, level[key]) for key in keys if key in level]
+            else:
+                found = [
+                    (key, cell) for key, cell in level.items()
+                    if first_row <= key[1] <= last_row
+                    and any(first <= key[0] <= last for first, last in columns)
+                ]
+
+            results = []
+            for key, cell in found:
+                count = cell[COUNT]
+                cluster = {
+                    'count': count,
+                    'center': [cell[SUM_LNG] / count, cell[SUM_LAT] / count],
+                    'bounds': cell[MIN_LNG:MAX_LAT + 1],
+                }
+                if count == 1 and zoom == MAX_CLUSTER_ZOOM:
+                    cluster['zone_id'] = next(iter(self.members[key]))
+                elif count == 1:
+                    cluster['zone_id'] = self._single_zone(zoom, key)
+                results.append(cluster)
+        results.sort(key=lambda cluster: -cluster['count'])
+        return results
+
+    def _single_zone(self, zoom, key):
+        """Id of the only zone in a cell, found by descending to the deepest level"""
+        column, row = key
+        for level in self.levels[zoom + 1:]:
+            column, row = next(
+                child for child in (
+                    (column * 2, row * 2), (column * 2 + 1, row * 2),
+                    (column * 2, row * 2 + 1), (column * 2 + 1, row * 2 + 1),
+                )
+                if child in level
+            )
+        return next(iter(self.members[(column, row)]))
+
+
+def zone_rows(queryset):
+    """Read the (id, center, bounds) tuples of rectangles with geometry"""
+    return queryset.filter(center_lng__isnull=False).values_list(
+        'id', 'center_lng', 'center_lat', 'min_lng', 'min_lat', 'max_lng', 'max_lat'
+    )
+
+
+_cluster_cache = UserIndexCache()
+
+
+def get_user_clusters(user_id):
+    """Return the (lazily built) ClusterIndex of a user's rectangles"""
+    generation = get_generation(user_id)
+    index = _cluster_cache.get(user_id, generation)
+    if index is None:
+        index = ClusterIndex(
+            zone_rows(Rectangle.objects.filter(user_id=user_id)).iterator(chunk_size=2000)
+        )
+        _cluster_cache.set(user_id, generation, index)
+    return index
+
+
+def zone_row(rectangle):
+    """The (id, center, bounds) tuple of a rectangle, or None without geometry"""
+    if rectangle.center_lng is None:
+        return None
+    return (
+        rectangle.id, rectangle.center_lng, rectangle.center_lat,
+        rectangle.min_lng, rectangle.min_lat, rectangle.max_lng, rectangle.max_lat,
+    )
+
+
+def update_user_clusters(user_id, generation, added=(), removed=()):
+    """
+    Apply rectangle changes, given as the zone tuples of created and updated
+    rectangles and the ids of updated and deleted ones, to the user's cached
+    ClusterIndex, if it was built from the generation just before this
+    change, and keep it under the new generation. Otherwise it is dropped and
+    rebuilt on next use.
+    """
+    index = _cluster_cache.get(user_id, generation - 1)
+    if index is None:
+        _cluster_cache.discard(user_id)
+        return
+
+    for zone_id in removed:
+        index.remove(zone_id)
+    for zone in added:
+        index.add(zone)
+    _cluster_cache.set(user_id, generation, index)
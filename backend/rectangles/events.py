@@ -0,0 +1,227 @@
+"""
+Server-sent events of rectangle changes
+
+Clients keep GET /api/rectangles/events/ open instead of polling the
+changes endpoint, and receive a ``changes`` event with the same data as the
+changes endpoint whenever their rectangles change. Event ids are change log
+sequence numbers, so a reconnecting EventSource resumes from its
+Last-Event-ID header; a ``resync`` event tells the client to reload the
+full list and continue from its seq.
+
+Every event loop has one ZoneEventBroker. Connections are plain asyncio
+queues, so an idle connection costs a coroutine and no thread. A single
+poller task per broker reads the versions of all users with connections in
+one query, and reads, serializes and renders the changes of a user once
+for all of the user's connections. Writes in this process wake the poller
+as soon as they commit; writes in other processes are picked up by the
+next poll. Serving the stream needs an ASGI server.
+"""
+import asyncio
+import logging
+import threading
+import weakref
+from collections import namedtuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from drawnzones.renderers import FastJSONRenderer
+
+from .changes import change_set_data, changes_since
+from .models import ZoneVersion
+
+logger = logging.getLogger(__name__)
+
+# An event moving clients at sequence number from_seq to seq. Resync events
+# have no from_seq and apply to clients at any earlier seq.
+Frame = namedtuple('Frame', ['from_seq', 'seq', 'data'])
+
+KEEPALIVE = b': keepalive\n\n'
+
+
+def _event(name, seq, data):
+    """Render a server-sent event with seq as its id"""
+    return b'id: %d\nevent: %s\ndata: %s\n\n' % (seq, name.encode(), FastJSONRenderer().render(data))
+
+
+def change_frames(user_id, since):
+    """
+    Read the changes of a user's rectangles after sequence number since as
+    a list of Frames, or a single resync Frame
+    """
+    frames = []
+    while True:
+        change_set = changes_since(user_id, since)
+        if change_set.resync:
+            return [Frame(None, change_set.seq, _event('resync', change_set.seq, {'seq': change_set.seq}))]
+        if change_set.seq == since:
+            return frames
+        data = change_set_data(user_id, change_set)
+        frames.append(Frame(since, change_set.seq, _event('changes', change_set.seq, data)))
+        since = change_set.seq
+        if not change_set.has_more:
+            return frames
+
+
+def current_versions(user_ids):
+    """Map user ids to the current sequence number of their rectangles"""
+    versions = dict.fromkeys(user_ids, 0)
+    versions.update(
+        ZoneVersion.objects.filter(user_id__in=user_ids).values_list('user_id', 'version')
+    )
+    return versions
+
+
+class Subscriber:
+    """A connection's queue of frames"""
+
+    def __init__(self, user_id, seq, max_pending):
+        self.user_id = user_id
+        # The user's sequence number when the connection subscribed
+        self.seq = seq
+        self.queue = asyncio.Queue(max_pending)
+        # Set when frames were dropped because the client didn't keep up
+        self.overflowed = False
+
+    def put(self, frame):
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class ZoneEventBroker:
+    """
+    Fans out the rectangle changes of users to their connections in one
+    event loop
+    """
+
+    def __init__(self, loop, poll_interval=None, max_pending=None):
+        self.loop = loop
+        self.poll_interval = poll_interval or getattr(settings, 'RECTANGLES_EVENTS_POLL_INTERVAL', 2)
+        self.max_pending = max_pending or getattr(settings, 'RECTANGLES_EVENTS_MAX_PENDING', 100)
+        self.subscribers = {}
+        # The sequence number each subscribed user's frames were sent up to
+        self.versions = {}
+        self._wake = asyncio.Event()
+        self._task = None
+
+    async def subscribe(self, user_id):
+        """Register a connection of a user and return its Subscriber"""
+        if user_id not in self.versions:
+            version = (await sync_to_async(current_versions)([user_id]))[user_id]
+            self.versions.setdefault(user_id, version)
+        subscriber = Subscriber(user_id, self.versions[user_id], self.max_pending)
+        self.subscribers.setdefault(user_id, set()).add(subscriber)
+        if self._task is None:
+            self._task = self.loop.create_task(self.run())
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """Unregister a connection"""
+        subscribers = self.subscribers.get(subscriber.user_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscriber)
+        if not subscribers:
+            del self.subscribers[subscriber.user_id]
+            del self.versions[subscriber.user_id]
+
+    def wake(self, user_id):
+        """Poll now if the user has connections; safe to call from any thread"""
+        if user_id in self.subscribers and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._wake.set)
+
+    async def run(self):
+        """Poll for changes while there are connections"""
+        try:
+            while self.subscribers:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                try:
+                    await self.poll()
+                except Exception as e:
+                    logger.error(f"Error polling rectangle changes: {str(e)}")
+        finally:
+            self._task = None
+
+    async def poll(self):
+        """Publish the changes of every subscribed user since the last poll"""
+        versions = await sync_to_async(current_versions)(list(self.subscribers))
+        for user_id, version in versions.items():
+            known = self.versions.get(user_id)
+            if known is None or version <= known:
+                continue
+            frames = await sync_to_async(change_frames)(user_id, known)
+            if user_id not in self.versions or not frames:
+                continue
+            self.versions[user_id] = max(self.versions[user_id], frames[-1].seq)
+            for subscriber in self.subscribers[user_id]:
+                for frame in frames:
+                    subscriber.put(frame)
+
+
+_brokers = weakref.WeakKeyDictionary()
+_brokers_lock = threading.Lock()
+
+
+def get_broker():
+    """Return the ZoneEventBroker of the running event loop"""
+    loop = asyncio.get_running_loop()
+    with _brokers_lock:
+        broker = _brokers.get(loop)
+        if broker is None:
+            broker = _brokers[loop] = ZoneEventBroker(loop)
+    return broker
+
+
+def notify_user(user_id):
+    """Wake the brokers with connections of a user after a change"""
+    with _brokers_lock:
+        brokers = list(_brokers.values())
+    for broker in brokers:
+        broker.wake(user_id)
+
+
+async def stream_events(user_id, since=None, broker=None, keepalive=None):
+    """
+    Yield the server-sent events of a user's rectangle changes, starting
+    after sequence number since, or from now
+    """
+    broker = broker or get_broker()
+    keepalive = keepalive or getattr(settings, 'RECTANGLES_EVENTS_KEEPALIVE', 15)
+    subscriber = await broker.subscribe(user_id)
+    try:
+        seq = subscriber.seq if since is None else since
+        yield b'retry: 3000\n\n'
+        yield _event('ready', seq, {'seq': seq})
+
+        catch_up = seq < subscriber.seq
+        while True:
+            if catch_up or subscriber.overflowed:
+                # Read what this connection missed directly, compacted
+                while not subscriber.queue.empty():
+                    subscriber.queue.get_nowait()
+                subscriber.overflowed = False
+                catch_up = False
+                for frame in await sync_to_async(change_frames)(user_id, seq):
+                    yield frame.data
+                    seq = frame.seq
+
+            try:
+                frame = await asyncio.wait_for(subscriber.queue.get(), keepalive)
+            except asyncio.TimeoutError:
+                yield KEEPALIVE
+                continue
+            if frame.seq <= seq:
+                continue
+            if frame.from_seq is not None and frame.from_seq > seq:
+                catch_up = True
+                continue
+            yield frame.data
+            seq = frame.seq
+    finally:
+        broker.unsubscribe(subscriber)
@@ -0,0 +1,176 @@
+"""
+Streaming export of a user's rectangles as GeoJSON or NDJSON
+
+Rows are read through a server-side cursor and encoded in small groups, so
+memory use stays constant no matter how many rectangles are exported.
+Geometry can be rounded and simplified with the same output options as the
+list endpoint.
+
+An ASGI server can only stream asynchronous iterators; it reads a
+synchronous one to the end before sending anything. aiter_export fetches
+and encodes each chunk in worker threads and yields it to the event loop,
+while iter_export is the synchronous version for WSGI.
+"""
+import itertools
+import json
+
+from asgiref.sync import sync_to_async
+
+from .fastpath import format_datetime
+from .models import Rectangle
+from .packing import unpack_polygon
+from .simplify import output_geometries
+
+CHUNK_SIZE = 2000
+
+# Number of features encoded into each chunk of the response
+FEATURES_PER_CHUNK = 500
+
+EXPORT_FORMATS = {
+    'geojson': 'application/geo+json',
+    'ndjson': 'application/x-ndjson',
+}
+
+_encoder = json.JSONEncoder(separators=(',', ':'))
+
+
+def export_rows(user_id):
+    """Iterate over the fields of a user's rectangles needed for export"""
+    return (
+        Rectangle.objects
+        .filter(user_id=user_id)
+        .order_by('id')
+        .values_list('id', 'name', 'geometry', 'created_at', 'updated_at')
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+
+def _next_chunk(rows):
+    return list(itertools.islice(rows, CHUNK_SIZE))
+
+
+async def aexport_rows(user_id):
+    """
+    Asynchronously iterate over the fields of a user's rectangles needed for
+    export, fetching each chunk of the server-side cursor in the thread that
+    holds the request's database connection
+    """
+    # QuerySet.aiterator() opens the cursor of values_list() querysets on
+    # the event loop, which Django refuses
+    rows = export_rows(user_id)
+    fetch = sync_to_async(_next_chunk)
+    try:
+        while True:
+            chunk = await fetch(rows)
+            for row in chunk:
+                yield row
+            if len(chunk) < CHUNK_SIZE:
+                break
+    finally:
+        await sync_to_async(rows.close)()
+
+
+def encode_feature(row, geojson=None):
+    """
+    Encode one exported row as a GeoJSON Feature, using geojson instead of
+    the packed geometry when it is given
+    """
+    rectangle_id, name, geometry, created_at, updated_at = row
+    return _encoder.encode({
+        'type': 'Feature',
+        'id': rectangle_id,
+        'geometry': geojson if geojson is not None else unpack_polygon(geometry),
+        'properties': {
+            'name': name,
+            'created_at': format_datetime(created_at),
+            'updated_at': format_datetime(updated_at),
+        },
+    })
+
+
+def _encode_group(group, options):
+    if options is None:
+        return [encode_feature(row) for row in group]
+    geometries = output_geometries(
+        [(row[0], row[4], row[2]) for row in group], options
+    )
+    return [encode_feature(row, geojson) for row, geojson in zip(group, geometries)]
+
+
+def _grouped(rows, separator, options=None):
+    group = []
+    for row in rows:
+        group.append(row)
+        if len(group) >= FEATURES_PER_CHUNK:
+            yield separator.join(_encode_group(group, options))
+            group = []
+    if group:
+        yield separator.join(_encode_group(group, options))
+
+
+async def _agrouped(rows, separator, options=None):
+    # Encoding and simplifying are CPU work, and simplified shapes come from
+    # the cache, so both happen off the event loop
+    encode_group = sync_to_async(_encode_group, thread_sensitive=False)
+    group = []
+    async for row in rows:
+        group.append(row)
+        if len(group) >= FEATURES_PER_CHUNK:
+            yield separator.join(await encode_group(group, options))
+            group = []
+    if group:
+        yield separator.join(await encode_group(group, options))
+
+
+def iter_geojson(rows, options=None):
+    """Yield a GeoJSON FeatureCollection in chunks"""
+    yield '{"type":"FeatureCollection","features":['
+    first = True
+    for chunk in _grouped(rows, ',', options):
+        yield chunk if first else ',' + chunk
+        first = False
+    yield ']}'
+
+
+def iter_ndjson(rows, options=None):
+    """Yield newline-delimited GeoJSON Features in chunks"""
+    for chunk in _grouped(rows, '\n', options):
+        yield chunk + '\n'
+
+
+def iter_export(user_id, export_format, options=None):
+    """
+    Yield the export of a user's rectangles in the given format, with
+    geometry transformed by the output options if they are given
+    """
+    rows = export_rows(user_id)
+    if export_format == 'ndjson':
+        return iter_ndjson(rows, options)
+    return iter_geojson(rows, options)
+
+
+async def aiter_geojson(rows, options=None):
+    """Yield a GeoJSON FeatureCollection in encoded chunks, from an async iterator of rows"""
+    yield b'{"type":"FeatureCollection","features":['
+    first = True
+    async for chunk in _agrouped(rows, ',', options):
+        yield (chunk if first else ',' + chunk).encode('utf-8')
+        first = False
+    yield b']}'
+
+
+async def aiter_ndjson(rows, options=None):
+    """Yield newline-delimited GeoJSON Features in encoded chunks, from an async iterator of rows"""
+    async for chunk in _agrouped(rows, '\n', options):
+        yield (chunk + '\n').encode('utf-8')
+
+
+def aiter_export(user_id, export_format, options=None):
+    """
+    Asynchronously yield the export of a user's rectangles in the given
+    format, with geometry transformed by the output options if they are given
+    """
+    rows = aexport_rows(user_id)
+    if export_format == 'ndjson':
+        return aiter_ndjson(rows, options)
+    return aiter_geojson(rows, options)
@@ -0,0 +1,202 @@
+"""
+Geofence enter/exit events for streams of device locations
+
+GeofenceEngine turns (device_id, lng, lat, timestamp) updates into enter and
+exit events against a ZoneGrid of zones. Containment for a whole batch is
+computed with the vectorized grid lookup, so the per-update Python work is
+only comparing a device's zones with the ones it was already inside, which
+is a no-op for the common case of a device staying where it was.
+
+Per-device state is a compact [last timestamp, {zone_id: entered at}] list.
+process_user_updates keeps it in the Django cache between batches, reading
+and writing the state of all devices of a batch in one round trip each.
+Updates older than a device's last update are skipped. If a device's state
+is evicted from the cache, its next update starts from outside all zones.
+
+Batches of the same device are serialized by cache locks held from reading
+its state until writing it back, so concurrent batches can't overwrite each
+other's transitions. Devices share one of LOCK_STRIPES locks per user, picked
+by the hash of their id, which also keys their state so client-chosen ids
+never end up in cache keys.
+"""
+import hashlib
+import math
+import time
+import uuid
+from collections import namedtuple
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .classify import get_user_grid, group_by_point
+
+ENTER = 'enter'
+EXIT = 'exit'
+
+# dwell is the number of seconds spent inside the zone, set on exit events
+GeofenceEvent = namedtuple('GeofenceEvent', ['device_id', 'zone_id', 'event', 'timestamp', 'dwell'])
+
+LAST_TIMESTAMP, INSIDE = range(2)
+
+# Number of locks the devices of a user are spread over
+LOCK_STRIPES = 64
+
+
+class GeofenceBusy(Exception):
+    """Raised when other batches hold the state of a batch's devices for too long"""
+
+
+class GeofenceEngine:
+    """
+    Tracks devices against a ZoneGrid and emits their zone transitions
+    """
+
+    def __init__(self, grid, states=None):
+        """
+        states maps device ids to the state left by earlier updates, and is
+        updated in place.
+        """
+        self.grid = grid
+        self.states = {} if states is None else states
+        self.skipped = 0
+
+    def process(self, updates):
+        """
+        Process an iterable of (device_id, lng, lat, timestamp) updates in
+        order and return the resulting GeofenceEvents.
+
+        Timestamps are seconds since the epoch.
+        """
+        updates = list(updates)
+        if not updates:
+            return []
+        device_ids, lngs, lats, timestamps = zip(*updates)
+        points = np.column_stack([
+            np.asarray(lngs, dtype=np.float64), np.asarray(lats, dtype=np.float64)
+        ])
+        containing = group_by_point(len(points), *self.grid.classify(points))
+
+        states = self.states
+        events = []
+        for device_id, timestamp, zones in zip(device_ids, timestamps, containing):
+            state = states.get(device_id)
+            if state is None:
+                state = states[device_id] = [timestamp, {}]
+            elif timestamp < state[LAST_TIMESTAMP]:
+                self.skipped += 1
+                continue
+            state[LAST_TIMESTAMP] = timestamp
+            inside = state[INSIDE]
+
+            if len(zones) == len(inside) and all(zone_id in inside for zone_id in zones):
+                continue
+            zones = set(zones)
+            for zone_id in sorted(inside.keys() - zones):
+                entered_at = inside.pop(zone_id)
+                events.append(GeofenceEvent(device_id, zone_id, EXIT, timestamp, timestamp - entered_at))
+            for zone_id in sorted(zones.difference(inside)):
+                inside[zone_id] = timestamp
+                events.append(GeofenceEvent(device_id, zone_id, ENTER, timestamp, None))
+        return events
+
+
+def parse_updates(raw_updates):
+    """
+    Validate updates given as [device_id, lng, lat, timestamp] arrays or
+    {"device_id", "lng", "lat", "timestamp"} objects.
+
+    Device ids are strings or integers and are returned as strings. Raises
+    ValueError describing the first invalid update.
+    """
+    if not isinstance(raw_updates, list):
+        raise ValueError("updates must be an array")
+    max_updates = getattr(settings, 'RECTANGLES_GEOFENCE_MAX_UPDATES', 100000)
+    if len(raw_updates) > max_updates:
+        raise ValueError(f"At most {max_updates} updates can be sent at once")
+
+    updates = []
+    for index, update in enumerate(raw_updates):
+        if isinstance(update, dict):
+            update = [update.get(key) for key in ('device_id', 'lng', 'lat', 'timestamp')]
+        if not isinstance(update, list) or len(update) != 4:
+            raise ValueError(f"Update {index} must be [device_id, lng, lat, timestamp]")
+        device_id, lng, lat, timestamp = update
+        if isinstance(device_id, bool) or not isinstance(device_id, (str, int)) or device_id == '':
+            raise ValueError(f"Update {index} needs a string or integer device_id")
+        values = (lng, lat, timestamp)
+        if not all(
+            isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+            for value in values
+        ):
+            raise ValueError(f"Update {index} needs numeric lng, lat and timestamp")
+        if not (-180 <= lng <= 180 and -90 <= lat <= 90):
+            raise ValueError(f"Update {index} has coordinates out of range")
+        updates.append((str(device_id), lng, lat, timestamp))
+    return updates
+
+
+def _device_hash(device_id):
+    return hashlib.sha256(device_id.encode('utf-8')).hexdigest()
+
+
+def _state_key(user_id, device_hash):
+    return f"rectangles:geofence:{user_id}:{device_hash}"
+
+
+def _lock_key(user_id, device_hash):
+    return f"rectangles:geofence-lock:{user_id}:{int(device_hash[:8], 16) % LOCK_STRIPES}"
+
+
+@contextmanager
+def _locked(keys):
+    """
+    Hold cache locks on keys, taken in sorted order so that batches waiting
+    for each other can't deadlock.
+
+    Raises GeofenceBusy if a lock isn't free within
+    RECTANGLES_GEOFENCE_LOCK_TIMEOUT seconds. Locks also expire after that
+    long, so a crashed process can't hold them forever.
+    """
+    timeout = getattr(settings, 'RECTANGLES_GEOFENCE_LOCK_TIMEOUT', 30)
+    deadline = time.monotonic() + timeout
+    token = uuid.uuid4().hex
+    held = []
+    try:
+        for key in sorted(keys):
+            while not cache.add(key, token, timeout):
+                if time.monotonic() >= deadline:
+                    raise GeofenceBusy("Device state is locked by another batch")
+                time.sleep(0.01)
+            held.append(key)
+        yield
+    finally:
+        if held:
+            # Don't release locks that expired and were taken by another batch
+            owners = cache.get_many(held)
+            cache.delete_many([key for key in held if owners.get(key) == token])
+
+
+def process_user_updates(user_id, updates):
+    """
+    Process updates of a user's devices against the user's rectangles,
+    keeping device state in the cache between calls.
+
+    Returns an (events, skipped updates count) tuple. Raises GeofenceBusy
+    if the devices' state stays locked by other batches.
+    """
+    hashes = {device_id: _device_hash(device_id) for device_id, _, _, _ in updates}
+    keys = {device_id: _state_key(user_id, device_hash) for device_id, device_hash in hashes.items()}
+    grid = get_user_grid(user_id)
+
+    with _locked({_lock_key(user_id, device_hash) for device_hash in hashes.values()}):
+        cached = cache.get_many(list(keys.values()))
+        states = {device_id: cached[key] for device_id, key in keys.items() if key in cached}
+
+        engine = GeofenceEngine(grid, states)
+        events = engine.process(updates)
+
+        timeout = getattr(settings, 'RECTANGLES_GEOFENCE_STATE_TIMEOUT', 7 * 86400)
+        cache.set_many({keys[device_id]: state for device_id, state in states.items()}, timeout)
+    return events, engine.skipped
@@ -0,0 +1,145 @@
+"""
+Geometry helpers for rectangle/zone GeoJSON
+"""
+import math
+
+
+def polygon_ring(geojson):
+    """Return the outer ring of a GeoJSON Polygon, or None if it is missing"""
+    if not isinstance(geojson, dict):
+        return None
+
+    rings = geojson.get('coordinates')
+    if not rings or not isinstance(rings, list) or not rings[0]:
+        return None
+
+    return rings[0]
+
+
+def polygon_bounds(geojson):
+    """
+    Calculate the bounding box of a GeoJSON Polygon.
+
+    Returns a (min_lng, min_lat, max_lng, max_lat) tuple, or None when the
+    geometry has no usable outer ring.
+    """
+    ring = polygon_ring(geojson)
+    if ring is None:
+        return None
+
+    try:
+        lngs = [float(point[0]) for point in ring]
+        lats = [float(point[1]) for point in ring]
+    except (TypeError, ValueError, IndexError):
+        return None
+
+    return min(lngs), min(lats), max(lngs), max(lats)
+
+
+def parse_bbox(value):
+    """
+    Parse a ``minLng,minLat,maxLng,maxLat`` string into a tuple of floats.
+
+    Raises ValueError if the string is malformed or out of range.
+    """
+    parts = [part.strip() for part in value.split(',')]
+    if len(parts) != 4:
+        raise ValueError("bbox must have four comma-separated values: minLng,minLat,maxLng,maxLat")
+
+    try:
+        min_lng, min_lat, max_lng, max_lat = (float(part) for part in parts)
+    except ValueError:
+        raise ValueError("bbox values must be numbers")
+
+    for lng in (min_lng, max_lng):
+        if not -180 <= lng <= 180:
+            raise ValueError("bbox longitudes must be between -180 and 180")
+    for lat in (min_lat, max_lat):
+        if not -90 <= lat <= 90:
+            raise ValueError("bbox latitudes must be between -90 and 90")
+    if min_lat > max_lat:
+        raise ValueError("bbox minLat must not be greater than maxLat")
+
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def parse_point(lng, lat):
+    """
+    Parse longitude/latitude query values into a (lng, lat) tuple of floats.
+
+    Raises ValueError if either value is missing, malformed or out of range.
+    """
+    if lng in (None, '') or lat in (None, ''):
+        raise ValueError("Both lng and lat are required")
+
+    try:
+        lng, lat = float(lng), float(lat)
+    except ValueError:
+        raise ValueError("lng and lat must be numbers")
+
+    if not -180 <= lng <= 180:
+        raise ValueError("lng must be between -180 and 180")
+    if not -90 <= lat <= 90:
+        raise ValueError("lat must be between -90 and 90")
+
+    return lng, lat
+
+
+def bbox_center(min_lng, min_lat, max_lng, max_lat):
+    """Center of a lng/lat box as a (lng, lat) tuple"""
+    return (min_lng + max_lng) / 2, (min_lat + max_lat) / 2
+
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def bbox_area(min_lng, min_lat, max_lng, max_lat):
+    """
+    Area of a lng/lat aligned box on the sphere, in square meters.
+
+    Exact for boxes bounded by meridians and parallels, which is what every
+    rectangle drawn on the map is.
+    """
+    width = math.radians(max_lng - min_lng)
+    height = math.sin(math.radians(max_lat)) - math.sin(math.radians(min_lat))
+    return abs(EARTH_RADIUS_M * EARTH_RADIUS_M * width * height)
+
+
+def haversine_distance(lng1, lat1, lng2, lat2):
+    """Great-circle distance between two lng/lat points, in meters"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (
+        math.sin((phi2 - phi1) / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _meridian_distance(lng, lat, edge_lng, min_lat, max_lat):
+    """Distance from a point to the meridian segment at edge_lng, in meters"""
+    candidates = [min_lat, max_lat]
+    delta = math.radians(lng - edge_lng)
+    if math.cos(delta) > 0:
+        # Latitude of the point on the meridian's great circle closest to lng/lat
+        closest = math.degrees(math.atan(math.tan(math.radians(lat)) / math.cos(delta)))
+        candidates.append(min(max(closest, min_lat), max_lat))
+    return min(haversine_distance(lng, lat, edge_lng, edge_lat) for edge_lat in candidates)
+
+
+def point_bbox_distance(lng, lat, min_lng, min_lat, max_lng, max_lat):
+    """
+    Geodesic distance from a point to a lng/lat aligned box, in meters.
+
+    Zero inside the box. Outside it, the closest point is either on the same
+    meridian, or on the box's western or eastern edge.
+    """
+    if min_lng <= lng <= max_lng:
+        if lat < min_lat:
+            return EARTH_RADIUS_M * math.radians(min_lat - lat)
+        if lat > max_lat:
+            return EARTH_RADIUS_M * math.radians(lat - max_lat)
+        return 0.0
+    return min(
+        _meridian_distance(lng, lat, min_lng, min_lat, max_lat),
+        _meridian_distance(lng, lat, max_lng, min_lat, max_lat),
+    )
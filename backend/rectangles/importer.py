@@ -0,0 +1,346 @@
+"""
+Streaming import of rectangles from GeoJSON or NDJSON
+
+Input is parsed incrementally: only the feature currently being decoded is
+held in memory, never the whole document. Features are validated with the
+same rules as the API and inserted in batches, each in its own transaction,
+so peak memory stays flat regardless of the size of the input.
+"""
+import codecs
+import json
+import re
+
+from .bulk import bulk_create_rectangles
+
+READ_SIZE = 65536
+
+BATCH_SIZE = 500
+
+# Only the first errors are kept in the report
+MAX_REPORTED_ERRORS = 1000
+
+# Largest single JSON value buffered while waiting for it to be complete
+MAX_VALUE_SIZE = 16 * 1024 * 1024
+
+WHITESPACE = ' \t\n\r'
+
+# Characters that open or close objects, arrays and strings
+STRUCTURE = re.compile(r'[\[\]{}"]')
+
+# Characters that end or escape within a string
+STRING_SPECIAL = re.compile(r'["\\]')
+
+
+class _StreamBuffer:
+    """
+    Incrementally decoded text buffer over a binary stream
+    """
+
+    def __init__(self, stream, read_size=READ_SIZE):
+        self.stream = stream
+        self.read_size = read_size
+        self.decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self.text = ''
+        self.pos = 0
+        self.eof = False
+        # Scan state of the value being read, see _scan
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+
+    def read(self):
+        """Read and decode the next part of the stream"""
+        data = self.stream.read(self.read_size)
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.eof = not data
+        return self.decoder.decode(data, final=self.eof)
+
+    def fill(self):
+        """Read more of the stream, returning False once it is exhausted"""
+        if self.eof:
+            return False
+        # Drop everything that has already been consumed
+        self.text = self.text[self.pos:] + self.read()
+        self.pos = 0
+        return not self.eof
+
+    def next_char(self):
+        """Return the next non-whitespace character without consuming it"""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, char):
+        if self.next_char() != char:
+            raise ValueError(f"Invalid GeoJSON: expected '{char}' at offset {self.pos}")
+        self.pos += 1
+
+    def _scan(self, text, index):
+        """
+        Continue looking for the end of the object, array or string being
+        read in text[index:], with the state left by the previous part.
+
+        Returns the offset just past its end, or None if text ends first.
+        """
+        depth, in_string, escaped = self.depth, self.in_string, self.escaped
+        if escaped and index < len(text):
+            index += 1
+            escaped = False
+        while index < len(text):
+            if in_string:
+                match = STRING_SPECIAL.search(text, index)
+                if match is None:
+                    break
+                index = match.end()
+                if match.group() == '\\':
+                    if index == len(text):
+                        escaped = True
+                        break
+                    index += 1
+                    continue
+                in_string = False
+                if depth == 0:
+                    return index
+            else:
+                match = STRUCTURE.search(text, index)
+                if match is None:
+                    break
+                index = match.end()
+                char = match.group()
+                if char == '"':
+                    in_string = True
+                elif char in '[{':
+                    depth += 1
+                else:
+                    depth -= 1
+                    if depth == 0:
+                        return index
+        self.depth, self.in_string, self.escaped = depth, in_string, escaped
+        return None
+
+    def _read_container(self):
+        """
+        Read until the object, array or string at pos is complete, scanning
+        every character once and joining the parts read only at the end
+        """
+        self.depth, self.in_string, self.escaped = 0, False, False
+        if self._scan(self.text, self.pos) is not None:
+            return
+        parts = [self.text[self.pos:]]
+        size = len(parts[0])
+        while True:
+            if size > MAX_VALUE_SIZE or self.eof:
+                raise ValueError("Invalid GeoJSON: malformed or oversized value")
+            part = self.read()
+            parts.append(part)
+            size += len(part)
+            if self._scan(part, 0) is not None:
+                break
+        self.text = ''.join(parts)
+        self.pos = 0
+
+    def decode_value(self, decoder=json.JSONDecoder()):
+        """Decode the next JSON value, reading more input as needed"""
+        char = self.next_char()
+        if char and char in '{["':
+            self._read_container()
+            try:
+                value, self.pos = decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                raise ValueError("Invalid GeoJSON: malformed or oversized value")
+            return value
+
+        # Numbers and literals are short, so they are simply retried
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if len(self.text) - self.pos <= MAX_VALUE_SIZE and self.fill():
+                    continue
+                raise ValueError("Invalid GeoJSON: malformed or oversized value")
+            # A number at the end of the buffer may continue in the next read
+            if end == len(self.text) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_geojson_features(stream, read_size=READ_SIZE):
+    """
+    Yield the features of a GeoJSON FeatureCollection read from a binary
+    stream, one at a time.
+    """
+    buffer = _StreamBuffer(stream, read_size)
+    buffer.expect('{')
+    if buffer.next_char() == '}':
+        return
+
+    while True:
+        key = buffer.decode_value()
+        buffer.expect(':')
+
+        if key == 'features':
+            buffer.expect('[')
+            if buffer.next_char() == ']':
+                buffer.pos += 1
+            else:
+                while True:
+                    yield buffer.decode_value()
+                    separator = buffer.next_char()
+                    buffer.pos += 1
+                    if separator == ']':
+                        break
+                    if separator != ',':
+                        raise ValueError("Invalid GeoJSON: expected ',' or ']' in features")
+        else:
+            buffer.decode_value()
+
+        separator = buffer.next_char()
+        buffer.pos += 1
+        if separator == '}':
+            return
+        if separator != ',':
+            raise ValueError("Invalid GeoJSON: expected ',' or '}'")
+
+
+def _decode_line(line):
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        return None
+
+
+def iter_ndjson_features(stream, read_size=READ_SIZE):
+    """
+    Yield features from newline-delimited GeoJSON, one per line.
+
+    Only newly read text is searched for line ends, and the parts of a line
+    are joined once it is complete. Raises ValueError for lines longer than
+    MAX_VALUE_SIZE.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    # Parts of the line being read
+    parts = []
+    size = 0
+    while True:
+        data = stream.read(read_size)
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        text = decoder.decode(data, final=not data)
+        start = 0
+        end = text.find('\n')
+        while end != -1:
+            parts.append(text[start:end])
+            line = ''.join(parts)
+            if line.strip():
+                yield _decode_line(line)
+            parts, size = [], 0
+            start = end + 1
+            end = text.find('\n', start)
+        parts.append(text[start:])
+        size += len(text) - start
+        if size > MAX_VALUE_SIZE:
+            raise ValueError("Invalid NDJSON: malformed or oversized line")
+        if not data:
+            line = ''.join(parts)
+            if line.strip():
+                yield _decode_line(line)
+            return
+
+
+def _feature_to_item(feature):
+    """Map a GeoJSON Feature onto the fields of a rectangle"""
+    if not isinstance(feature, dict) or feature.get('type') != 'Feature':
+        return None
+    properties = feature.get('properties') or {}
+    return {
+        'name': properties.get('name') if isinstance(properties, dict) else None,
+        'coordinates': feature.get('geometry'),
+    }
+
+
+class ImportResult:
+    """
+    Summary of an import: how many rectangles were created and which
+    features were rejected
+    """
+
+    def __init__(self):
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+        # Set when the input could not be parsed past some point
+        self.parse_error = None
+
+    def add_error(self, index, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'index': index, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'error_count': self.error_count,
+            'errors': sorted(self.errors, key=lambda error: error['index']),
+            'parse_error': self.parse_error,
+        }
+
+
+def import_features(user, features, batch_size=BATCH_SIZE):
+    """
+    Validate and insert an iterable of GeoJSON Features for a user.
+
+    Returns an ImportResult. Features are numbered from 0 in input order.
+    """
+    result = ImportResult()
+    batch = []
+    batch_indexes = []
+
+    def flush():
+        created, errors = bulk_create_rectangles(user, batch)
+        result.created += len(created)
+        for error in errors:
+            result.add_error(batch_indexes[error['index']], error['errors'])
+        batch.clear()
+        batch_indexes.clear()
+
+    features = iter(features)
+    index = -1
+    while True:
+        try:
+            feature = next(features)
+        except StopIteration:
+            break
+        except ValueError as e:
+            # Everything before the syntax error is still imported
+            result.parse_error = str(e)
+            break
+
+        index += 1
+        item = _feature_to_item(feature)
+        if item is None:
+            result.add_error(index, {'feature': ["Must be a GeoJSON Feature"]})
+            continue
+        batch.append(item)
+        batch_indexes.append(index)
+        if len(batch) >= batch_size:
+            flush()
+
+    if batch:
+        flush()
+
+    return result
+
+
+def import_stream(user, stream, import_format='geojson', batch_size=BATCH_SIZE):
+    """Import rectangles for a user from a binary GeoJSON or NDJSON stream"""
+    if import_format == 'ndjson':
+        features = iter_ndjson_features(stream)
+    else:
+        features = iter_geojson_features(stream)
+    return import_features(user, features, batch_size=batch_size)
@@ -0,0 +1,82 @@
+import io
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from drawnzones.parsers import FastJSONParser
+from drawnzones.renderers import FastJSONRenderer, orjson
+
+
+def zone_payload(rows, points):
+    """Build a listing page of rows zones with points positions per ring"""
+    results = []
+    for index in range(rows):
+        lng, lat = index % 360 - 180 + 0.123456789, index % 170 - 85 + 0.987654321
+        ring = [
+            [lng + 0.5 * (step % 2) + step * 1e-4, lat + 0.5 * (step // 2 % 2) + step * 1e-4]
+            for step in range(points - 1)
+        ]
+        ring.append(ring[0])
+        results.append({
+            'id': index + 1,
+            'name': f'Zone {index}',
+            'coordinates': {'type': 'Polygon', 'coordinates': [ring]},
+            'center_coordinates': [lng + 0.25, lat + 0.25],
+            'area': 1543210987.654321 + index,
+            'created_at': '2025-01-01T12:00:00.123456Z',
+            'updated_at': '2025-01-02T12:00:00.123456Z',
+        })
+    return {'next': None, 'previous': None, 'results': results}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare JSON encode and decode throughput of DRF's JSONRenderer and "
+        "JSONParser with the fast JSON renderer and parser on zone payloads"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--points', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING(
+                "orjson is not installed, the fast classes fall back to the standard library"
+            ))
+
+        data = zone_payload(options['rows'], options['points'])
+        body = JSONRenderer().render(data)
+        megabytes = len(body) / 1_000_000
+        self.stdout.write(
+            f"Payload: {options['rows']} zones of {options['points']} points, {megabytes:.1f} MB"
+        )
+
+        for operation, paths in (
+            ('encode', [
+                ('JSONRenderer', lambda: JSONRenderer().render(data)),
+                ('FastJSONRenderer', lambda: FastJSONRenderer().render(data)),
+            ]),
+            ('decode', [
+                ('JSONParser', lambda: JSONParser().parse(io.BytesIO(body))),
+                ('FastJSONParser', lambda: FastJSONParser().parse(io.BytesIO(body))),
+            ]),
+        ):
+            timings = []
+            for name, path in paths:
+                best = min(self._time(path) for _ in range(options['repeat']))
+                timings.append(best)
+                self.stdout.write(
+                    f"{operation} {name:>18}: {best * 1000:8.1f} ms, {megabytes / best:8.1f} MB/s"
+                )
+            self.stdout.write(self.style.SUCCESS(
+                f"{operation} speedup: {timings[0] / timings[1]:.1f}x"
+            ))
+
+    def _time(self, path):
+        start = time.perf_counter()
+        path()
+        return time.perf_counter() - start
@@ -0,0 +1,76 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from rectangles.fastpath import rectangle_values, serialize_rectangles
+from rectangles.models import Rectangle
+from rectangles.serializers import RectangleSerializer
+
+User = get_user_model()
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare listing rectangles through RectangleSerializer with the fast "
+        "path, on temporary rows that are rolled back afterwards"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options['rows'], options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, rows, repeat):
+        user = User.objects.create_user(
+            email='benchmark-list@example.com', username='benchmark-list'
+        )
+        rectangles = []
+        for index in range(rows):
+            lng, lat = index % 360 - 180, index % 170 - 85
+            rectangle = Rectangle(user=user, name=f'Zone {index}', coordinates={
+                'type': 'Polygon',
+                'coordinates': [[
+                    [lng, lat], [lng, lat + 0.5], [lng + 0.5, lat + 0.5],
+                    [lng + 0.5, lat], [lng, lat]
+                ]]
+            })
+            rectangle.update_geometry()
+            rectangles.append(rectangle)
+        Rectangle.objects.bulk_create(rectangles, batch_size=1000)
+        queryset = Rectangle.objects.filter(user=user)
+        renderer = JSONRenderer()
+
+        def serializer_path():
+            return renderer.render(RectangleSerializer(queryset.all(), many=True).data)
+
+        def fast_path():
+            return renderer.render(serialize_rectangles(rectangle_values(queryset.all())))
+
+        timings = {}
+        for name, path in (('RectangleSerializer', serializer_path), ('fast path', fast_path)):
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                path()
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            timings[name] = best
+            self.stdout.write(f"{name:>20}: {best * 1000:8.1f} ms for {rows} rows")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Speedup: {timings['RectangleSerializer'] / timings['fast path']:.1f}x"
+        ))
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+
+from rectangles.importer import BATCH_SIZE, import_stream
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Import rectangles for a user from a GeoJSON FeatureCollection or NDJSON file"
+    
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="GeoJSON or NDJSON file to import")
+        parser.add_argument('--user', required=True, help="Email of the user that will own the rectangles")
+        parser.add_argument(
+            '--format',
+            choices=['geojson', 'ndjson'],
+            help="Input format (default: guessed from the file extension)"
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user with email {options['user']}")
+        
+        import_format = options['format']
+        if import_format is None:
+            is_ndjson = options['path'].endswith(('.ndjson', '.jsonl'))
+            import_format = 'ndjson' if is_ndjson else 'geojson'
+        
+        try:
+            with open(options['path'], 'rb') as stream:
+                result = import_stream(
+                    user, stream, import_format=import_format, batch_size=options['batch_size']
+                )
+        except OSError as e:
+            raise CommandError(str(e))
+        
+        for error in result.as_dict()['errors']:
+            self.stderr.write(f"Feature {error['index']}: {error['errors']}")
+        if result.parse_error:
+            self.stderr.write(f"Stopped early: {result.parse_error}")
+        
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.created} rectangles for {user.email} "
+            f"({result.error_count} features rejected)"
+        ))
@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from rectangles.models import ZoneChange
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete rectangle change log entries older than the retention period. "
+        "Clients that last synced before that have to resync."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=getattr(settings, 'RECTANGLES_CHANGE_LOG_RETENTION_DAYS', 30),
+            help="Number of days of changes to keep"
+        )
+    
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        deleted, _ = ZoneChange.objects.filter(created_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} change log entries"))
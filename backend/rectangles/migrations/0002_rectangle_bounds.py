@@ -0,0 +1,58 @@
+# Generated by Django 5.2.4 on 2026-10-18 00:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+from rectangles.geometry import polygon_bounds
+
+
+def backfill_bounds(apps, schema_editor):
+    Rectangle = apps.get_model('rectangles', 'Rectangle')
+    batch = []
+    for rectangle in Rectangle.objects.only('id', 'coordinates').iterator(chunk_size=1000):
+        bounds = polygon_bounds(rectangle.coordinates)
+        if bounds is None:
+            continue
+        rectangle.min_lng, rectangle.min_lat, rectangle.max_lng, rectangle.max_lat = bounds
+        batch.append(rectangle)
+        if len(batch) >= 1000:
+            Rectangle.objects.bulk_update(batch, ['min_lng', 'min_lat', 'max_lng', 'max_lat'])
+            batch = []
+    if batch:
+        Rectangle.objects.bulk_update(batch, ['min_lng', 'min_lat', 'max_lng', 'max_lat'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rectangles', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rectangle',
+            name='max_lat',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='rectangle',
+            name='max_lng',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='rectangle',
+            name='min_lat',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='rectangle',
+            name='min_lng',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='rectangle',
+            index=models.Index(fields=['user', 'min_lng', 'min_lat', 'max_lng', 'max_lat'], name='rectangles__user_id_7213a0_idx'),
+        ),
+        migrations.RunPython(backfill_bounds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rectangles', '0002_rectangle_bounds'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='rectangle',
+            options={'ordering': ['-created_at', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='rectangle',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='rectangles_user_created_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='rectangle',
+            name='rectangles__user_id_7306be_idx',
+        ),
+    ]
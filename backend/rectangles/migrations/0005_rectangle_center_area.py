@@ -0,0 +1,59 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+from rectangles.geometry import polygon_bounds, bbox_center, bbox_area
+
+
+def backfill_center_area(apps, schema_editor):
+    Rectangle = apps.get_model('rectangles', 'Rectangle')
+    fields = ['center_lng', 'center_lat', 'area']
+    batch = []
+    for rectangle in Rectangle.objects.only('id', 'coordinates').iterator(chunk_size=1000):
+        bounds = polygon_bounds(rectangle.coordinates)
+        if bounds is None:
+            continue
+        rectangle.center_lng, rectangle.center_lat = bbox_center(*bounds)
+        rectangle.area = bbox_area(*bounds)
+        batch.append(rectangle)
+        if len(batch) >= 1000:
+            Rectangle.objects.bulk_update(batch, fields)
+            batch = []
+    if batch:
+        Rectangle.objects.bulk_update(batch, fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rectangles', '0004_zoneversion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rectangle',
+            name='area',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='rectangle',
+            name='center_lat',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='rectangle',
+            name='center_lng',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_center_area, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='rectangle',
+            index=models.Index(fields=['user', 'area'], name='rectangles__user_id_a60b32_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rectangle',
+            index=models.Index(fields=['user', 'center_lng', 'center_lat'], name='rectangles__user_id_d10810_idx'),
+        ),
+    ]
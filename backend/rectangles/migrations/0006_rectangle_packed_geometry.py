@@ -0,0 +1,76 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+from rectangles.packing import pack_polygon, unpack_polygon
+
+
+def pack_coordinates(apps, schema_editor):
+    Rectangle = apps.get_model('rectangles', 'Rectangle')
+    encoding = getattr(settings, 'RECTANGLES_COORDINATE_ENCODING', 'float64')
+    batch = []
+    failed = []
+    for rectangle in Rectangle.objects.only('id', 'coordinates').iterator(chunk_size=1000):
+        try:
+            rectangle.geometry = pack_polygon(rectangle.coordinates, encoding)
+        except ValueError:
+            failed.append(rectangle.id)
+            continue
+        batch.append(rectangle)
+        if len(batch) >= 1000:
+            Rectangle.objects.bulk_update(batch, ['geometry'])
+            batch = []
+    if failed:
+        # The coordinates column is dropped next, so refuse to lose any data
+        ids = ', '.join(str(rectangle_id) for rectangle_id in failed[:100])
+        more = f" and {len(failed) - 100} more" if len(failed) > 100 else ""
+        raise ValueError(
+            f"Can't pack the coordinates of rectangles {ids}{more}; "
+            f"fix or delete them and run the migration again"
+        )
+    if batch:
+        Rectangle.objects.bulk_update(batch, ['geometry'])
+
+
+def unpack_coordinates(apps, schema_editor):
+    Rectangle = apps.get_model('rectangles', 'Rectangle')
+    batch = []
+    for rectangle in Rectangle.objects.only('id', 'geometry').iterator(chunk_size=1000):
+        rectangle.coordinates = unpack_polygon(rectangle.geometry)
+        batch.append(rectangle)
+        if len(batch) >= 1000:
+            Rectangle.objects.bulk_update(batch, ['coordinates'])
+            batch = []
+    if batch:
+        Rectangle.objects.bulk_update(batch, ['coordinates'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rectangles', '0005_rectangle_center_area'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rectangle',
+            name='geometry',
+            field=models.BinaryField(editable=False, null=True, help_text='Packed polygon coordinates, exposed as GeoJSON by the coordinates property'),
+        ),
+        migrations.AlterField(
+            model_name='rectangle',
+            name='coordinates',
+            field=models.JSONField(null=True, help_text='GeoJSON coordinates for the rectangle'),
+        ),
+        migrations.RunPython(pack_coordinates, unpack_coordinates),
+        migrations.RemoveField(
+            model_name='rectangle',
+            name='coordinates',
+        ),
+        migrations.AlterField(
+            model_name='rectangle',
+            name='geometry',
+            field=models.BinaryField(editable=False, help_text='Packed polygon coordinates, exposed as GeoJSON by the coordinates property'),
+        ),
+    ]
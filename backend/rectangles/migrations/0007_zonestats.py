@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('rectangles', '0006_rectangle_packed_geometry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ZoneStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='zone_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('count', models.PositiveBigIntegerField(default=0)),
+                ('total_area', models.FloatField(default=0)),
+                ('min_lng', models.FloatField(blank=True, null=True)),
+                ('min_lat', models.FloatField(blank=True, null=True)),
+                ('max_lng', models.FloatField(blank=True, null=True)),
+                ('max_lat', models.FloatField(blank=True, null=True)),
+                ('created_per_day', models.JSONField(blank=True, default=dict)),
+                ('created_per_month', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'zone stats',
+            },
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:40
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+TRIGRAM_INDEX = 'rectangles_name_trgm_idx'
+
+
+def rename_duplicates(apps, schema_editor):
+    """Suffix all but the oldest of every user's same-named rectangles"""
+    Rectangle = apps.get_model('rectangles', 'Rectangle')
+    duplicates = (
+        Rectangle.objects
+        .values('user_id', 'name')
+        .annotate(copies=Count('id'))
+        .filter(copies__gt=1)
+        .order_by()
+    )
+    for duplicate in duplicates:
+        used = set(
+            Rectangle.objects.filter(user_id=duplicate['user_id']).values_list('name', flat=True)
+        )
+        rectangles = (
+            Rectangle.objects
+            .filter(user_id=duplicate['user_id'], name=duplicate['name'])
+            .order_by('created_at', 'id')[1:]
+        )
+        suffix = 2
+        for rectangle in rectangles:
+            while True:
+                tag = f" ({suffix})"
+                name = duplicate['name'][:100 - len(tag)] + tag
+                suffix += 1
+                if name not in used:
+                    break
+            used.add(name)
+            Rectangle.objects.filter(pk=rectangle.pk).update(name=name)
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX} ON rectangles_rectangle '
+        f'USING gin ((UPPER(name::text)) gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {TRIGRAM_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rectangles', '0007_zonestats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicates, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='rectangle',
+            name='rectangles__name_b6ddb1_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='rectangle',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='unique_rectangle_name_per_user'),
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -1,9 +1,67 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction, IntegrityError
 from django.contrib.auth import get_user_model
 from django.core.validators import MinLengthValidator
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .geometry import polygon_bounds, bbox_center, bbox_area
+from .packing import pack_polygon, unpack_polygon
 
 User = get_user_model()
 
+# Columns written from the coordinates, recalculated whenever they change
+GEOMETRY_FIELDS = [
+    'geometry', 'min_lng', 'min_lat', 'max_lng', 'max_lat', 'center_lng', 'center_lat', 'area'
+]
+
+# Columns aggregated into ZoneStats
+EXTENT_FIELDS = ['area', 'min_lng', 'min_lat', 'max_lng', 'max_lat']
+
+UNIQUE_NAME_CONSTRAINT = 'unique_rectangle_name_per_user'
+
+
+def is_duplicate_name_error(error):
+    """Whether an IntegrityError was raised by the per-user unique name constraint"""
+    message = str(error)
+    # PostgreSQL names the constraint, SQLite lists its columns
+    return UNIQUE_NAME_CONSTRAINT in message or 'rectangles_rectangle.name' in message
+
+
+def coordinate_encoding():
+    """Encoding used to pack newly written geometry, see rectangles.packing"""
+    return getattr(settings, 'RECTANGLES_COORDINATE_ENCODING', 'float64')
+
+
+class RectangleQuerySet(models.QuerySet):
+    """
+    QuerySet with spatial filters backed by the persisted bounding box columns
+    """
+
+    def intersecting_bbox(self, min_lng, min_lat, max_lng, max_lat):
+        """Return rectangles whose bounding box intersects the given bbox"""
+        lat_filter = Q(min_lat__lte=max_lat, max_lat__gte=min_lat)
+
+        if min_lng <= max_lng:
+            lng_filter = Q(min_lng__lte=max_lng, max_lng__gte=min_lng)
+        else:
+            # The bbox crosses the antimeridian, so match either side of it
+            lng_filter = Q(max_lng__gte=min_lng) | Q(min_lng__lte=max_lng)
+
+        return self.filter(lat_filter & lng_filter)
+
+    def center_within_bbox(self, min_lng, min_lat, max_lng, max_lat):
+        """Return rectangles whose center lies inside the given bbox"""
+        lat_filter = Q(center_lat__gte=min_lat, center_lat__lte=max_lat)
+
+        if min_lng <= max_lng:
+            lng_filter = Q(center_lng__gte=min_lng, center_lng__lte=max_lng)
+        else:
+            lng_filter = Q(center_lng__gte=min_lng) | Q(center_lng__lte=max_lng)
+
+        return self.filter(lat_filter & lng_filter)
+
 
 class Rectangle(models.Model):
     """
@@ -14,37 +72,359 @@ class Rectangle(models.Model):
         max_length=100, 
         validators=[MinLengthValidator(1, "Name cannot be empty")]
     )
-    coordinates = models.JSONField(
-        help_text="GeoJSON coordinates for the rectangle"
+    geometry = models.BinaryField(
+        editable=False,
+        help_text="Packed polygon coordinates, exposed as GeoJSON by the coordinates property"
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Bounding box of the coordinates, kept in sync on save for SQL filtering
+    min_lng = models.FloatField(null=True, blank=True, editable=False)
+    min_lat = models.FloatField(null=True, blank=True, editable=False)
+    max_lng = models.FloatField(null=True, blank=True, editable=False)
+    max_lat = models.FloatField(null=True, blank=True, editable=False)
+    
+    # Center of the bounding box and geodesic area in square meters
+    center_lng = models.FloatField(null=True, blank=True, editable=False)
+    center_lat = models.FloatField(null=True, blank=True, editable=False)
+    area = models.FloatField(null=True, blank=True, editable=False)
+    
+    objects = RectangleQuerySet.as_manager()
+    
+    # GeoJSON decoded from geometry on first access, or assigned by the caller
+    _coordinates = None
+    
+    # Area and bounds as loaded from the database, so ZoneStats can subtract
+    # them when the rectangle is updated
+    _saved_extent = None
+    
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
         indexes = [
-            models.Index(fields=['user', 'created_at']),
-            models.Index(fields=['name']),
+            models.Index(fields=['user', '-created_at', '-id'], name='rectangles_user_created_idx'),
+            models.Index(fields=['user', 'min_lng', 'min_lat', 'max_lng', 'max_lat']),
+            models.Index(fields=['user', 'area']),
+            models.Index(fields=['user', 'center_lng', 'center_lat']),
+        ]
+        # The ?search= filter is served by a PostgreSQL-only trigram index on
+        # UPPER(name), created in migration 0008
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name=UNIQUE_NAME_CONSTRAINT),
         ]
     
     def __str__(self):
         return f"{self.name} - {self.user.email}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if all(field in field_names for field in EXTENT_FIELDS):
+            instance._saved_extent = instance.extent()
+        return instance
+    
+    def save(self, *args, **kwargs):
+        self.update_geometry()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'coordinates' in update_fields:
+            kwargs['update_fields'] = set(update_fields) - {'coordinates'} | set(GEOMETRY_FIELDS)
+        super().save(*args, **kwargs)
+    
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        if fields is not None:
+            fields = ['geometry' if field == 'coordinates' else field for field in fields]
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        if fields is None or 'geometry' in fields:
+            self._coordinates = None
+    
+    @property
+    def coordinates(self):
+        """GeoJSON Polygon of the rectangle, decoded lazily from geometry"""
+        if self._coordinates is None and self.geometry:
+            self._coordinates = unpack_polygon(self.geometry)
+        return self._coordinates
+    
+    @coordinates.setter
+    def coordinates(self, value):
+        self._coordinates = value
+    
+    def update_geometry(self):
+        """
+        Repack the geometry and recalculate the bounding box, center and area
+        columns from the coordinates, if they have been decoded or assigned
+        """
+        if self._coordinates is None:
+            return
+        self.geometry = pack_polygon(self._coordinates, coordinate_encoding())
+        bounds = polygon_bounds(self._coordinates)
+        if bounds is None:
+            for field in GEOMETRY_FIELDS[1:]:
+                setattr(self, field, None)
+            return
+        self.min_lng, self.min_lat, self.max_lng, self.max_lat = bounds
+        self.center_lng, self.center_lat = bbox_center(*bounds)
+        self.area = bbox_area(*bounds)
+    
+    def extent(self):
+        """Return the (area, min_lng, min_lat, max_lng, max_lat) columns"""
+        return tuple(getattr(self, field) for field in EXTENT_FIELDS)
+    
+    @property
+    def bounds(self):
+        """Bounding box as [min_lng, min_lat, max_lng, max_lat]"""
+        if self.min_lng is None:
+            return None
+        return [self.min_lng, self.min_lat, self.max_lng, self.max_lat]
+    
     @property
     def center_coordinates(self):
-        """Calculate center point of the rectangle"""
-        if not self.coordinates or 'coordinates' not in self.coordinates:
+        """Center point of the rectangle as [lng, lat]"""
+        if self.center_lng is None:
             return None
+        return [self.center_lng, self.center_lat]
+
+
+class ZoneVersion(models.Model):
+    """
+    Per-user change counter for rectangles, bumped on every save and delete.
+    
+    Used as the validator for conditional GETs of the rectangle endpoints.
+    """
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name='zone_version'
+    )
+    version = models.PositiveBigIntegerField(default=0)
+    modified_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"Zone version {self.version} - {self.user_id}"
+    
+    @classmethod
+    def current(cls, user_id):
+        """Return the (version, modified_at) of a user's rectangles"""
+        row = cls.objects.filter(user_id=user_id).values_list('version', 'modified_at').first()
+        return row or (0, None)
+    
+    @classmethod
+    async def acurrent(cls, user_id):
+        """Return the (version, modified_at) of a user's rectangles, from a coroutine"""
+        row = await cls.objects.filter(user_id=user_id).values_list('version', 'modified_at').afirst()
+        return row or (0, None)
+    
+    @classmethod
+    def bump(cls, user_id):
+        """
+        Increment the version of a user's rectangles and return the new one.
         
-        coords = self.coordinates['coordinates'][0]  # First ring of polygon
-        if len(coords) < 4:  # Need at least 4 points for a rectangle
+        The update locks the user's row until the surrounding transaction
+        ends, so writes that bump inside one transaction are serialized.
+        """
+        now = timezone.now()
+        updated = cls.objects.filter(user_id=user_id).update(
+            version=F('version') + 1, modified_at=now
+        )
+        if not updated:
+            try:
+                with transaction.atomic():
+                    cls.objects.create(user_id=user_id, version=1, modified_at=now)
+                return 1
+            except IntegrityError:
+                # Created concurrently by another writer
+                cls.objects.filter(user_id=user_id).update(
+                    version=F('version') + 1, modified_at=now
+                )
+        return cls.objects.filter(user_id=user_id).values_list('version', flat=True).get()
+
+
+class ZoneChange(models.Model):
+    """
+    Append-only log of changes to a user's rectangles.
+    
+    Every batch of changes is logged under the ZoneVersion it bumped the
+    user's version to, which serves as its sequence number. Deleted
+    rectangles are kept as tombstones.
+    """
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ACTION_CHOICES = [
+        (CREATED, 'Created'),
+        (UPDATED, 'Updated'),
+        (DELETED, 'Deleted'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='zone_changes')
+    seq = models.PositiveBigIntegerField()
+    # Not a foreign key, so the entry outlives the rectangle
+    rectangle_id = models.BigIntegerField()
+    action = models.CharField(max_length=7, choices=ACTION_CHOICES)
+    # Shared by all entries of a batch, so pruning by age never splits one
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'seq'], name='rectangles_change_seq_idx'),
+            models.Index(fields=['created_at'], name='rectangles_change_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.action} {self.rectangle_id} at {self.seq} - {self.user_id}"
+    
+    @classmethod
+    def record(cls, user_id, seq, created=(), updated=(), deleted=()):
+        """Log a batch of rectangle changes under a sequence number"""
+        now = timezone.now()
+        cls.objects.bulk_create([
+            cls(user_id=user_id, seq=seq, rectangle_id=rectangle.id, action=action, created_at=now)
+            for action, rectangles in ((cls.CREATED, created), (cls.UPDATED, updated),
+                                       (cls.DELETED, deleted))
+            for rectangle in rectangles
+        ])
+
+
+def creation_day(created_at):
+    """Day a rectangle was created on in the default time zone, as YYYY-MM-DD"""
+    return timezone.localtime(created_at, timezone.get_default_timezone()).date().isoformat()
+
+
+class ZoneStats(models.Model):
+    """
+    Per-user aggregates of the rectangles, kept up to date incrementally on
+    every change so reading them is a single primary key lookup.
+    
+    Creation counts are keyed by day (YYYY-MM-DD) and month (YYYY-MM) in the
+    default time zone and only count rectangles that still exist. Users
+    without a row get one built from their rectangles on first use.
+    """
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name='zone_stats'
+    )
+    count = models.PositiveBigIntegerField(default=0)
+    total_area = models.FloatField(default=0)
+    min_lng = models.FloatField(null=True, blank=True)
+    min_lat = models.FloatField(null=True, blank=True)
+    max_lng = models.FloatField(null=True, blank=True)
+    max_lat = models.FloatField(null=True, blank=True)
+    created_per_day = models.JSONField(default=dict, blank=True)
+    created_per_month = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name_plural = 'zone stats'
+    
+    def __str__(self):
+        return f"Zone stats {self.count} - {self.user_id}"
+    
+    @property
+    def bounds(self):
+        """Bounding box of all rectangles as [min_lng, min_lat, max_lng, max_lat]"""
+        if self.min_lng is None:
             return None
+        return [self.min_lng, self.min_lat, self.max_lng, self.max_lat]
+    
+    @classmethod
+    def for_user(cls, user_id):
+        """Return the stats of a user, building them if they don't exist yet"""
+        return cls.objects.filter(user_id=user_id).first() or cls.rebuild(user_id)
+    
+    @classmethod
+    def rebuild(cls, user_id):
+        """Recalculate the stats of a user from all of their rectangles"""
+        rectangles = Rectangle.objects.filter(user_id=user_id).order_by()
+        totals = rectangles.aggregate(
+            count=Count('id'), total_area=Sum('area'),
+            min_lng=Min('min_lng'), min_lat=Min('min_lat'),
+            max_lng=Max('max_lng'), max_lat=Max('max_lat'),
+        )
+        per_day = (
+            rectangles
+            .annotate(day=TruncDate('created_at', tzinfo=timezone.get_default_timezone()))
+            .values('day')
+            .annotate(created=Count('id'))
+        )
+        created_per_day = {row['day'].isoformat(): row['created'] for row in per_day}
+        created_per_month = {}
+        for day, created in created_per_day.items():
+            created_per_month[day[:7]] = created_per_month.get(day[:7], 0) + created
         
-        # Calculate center from first and third points (diagonal)
-        lng1, lat1 = coords[0]
-        lng2, lat2 = coords[2]
+        totals['total_area'] = totals['total_area'] or 0
+        stats, _ = cls.objects.update_or_create(user_id=user_id, defaults={
+            **totals,
+            'created_per_day': created_per_day,
+            'created_per_month': created_per_month,
+        })
+        return stats
+    
+    @classmethod
+    def apply_changes(cls, user_id, created=(), updated=(), deleted=()):
+        """
+        Update the stats of a user with a batch of rectangle changes, in the
+        same form as the zones_changed signal sends them
+        """
+        with transaction.atomic():
+            stats = cls.objects.select_for_update().filter(user_id=user_id).first()
+            if stats is None or not stats._apply(created, updated, deleted):
+                cls.rebuild(user_id)
+            else:
+                stats.save()
+        for rectangle in (*created, *updated):
+            rectangle._saved_extent = rectangle.extent()
+    
+    def _apply(self, created, updated, deleted):
+        """
+        Apply changes in memory. Returns False if a rectangle lacks the
+        values needed to do so, and the stats must be rebuilt instead.
+        """
+        removed_extents = [rectangle._saved_extent for rectangle in (*updated, *deleted)]
+        if None in removed_extents or any(
+            'created_at' in rectangle.get_deferred_fields() for rectangle in deleted
+        ):
+            return False
+        added_extents = [rectangle.extent() for rectangle in (*created, *updated)]
         
-        center_lng = (lng1 + lng2) / 2
-        center_lat = (lat1 + lat2) / 2
+        self.count = max(self.count + len(created) - len(deleted), 0)
+        self.total_area += (
+            sum(extent[0] or 0 for extent in added_extents)
+            - sum(extent[0] or 0 for extent in removed_extents)
+        )
+        self._count_created([rectangle.created_at for rectangle in created], 1)
+        self._count_created([rectangle.created_at for rectangle in deleted], -1)
         
-        return [center_lng, center_lat] 
\ No newline at end of file
+        # Bounds can only shrink if a removed box touched them
+        bounds = self.bounds
+        if bounds is not None and any(
+            extent[1] is not None and (
+                extent[1] <= bounds[0] or extent[2] <= bounds[1]
+                or extent[3] >= bounds[2] or extent[4] >= bounds[3]
+            )
+            for extent in removed_extents
+        ):
+            totals = Rectangle.objects.filter(user_id=self.user_id).aggregate(
+                min_lng=Min('min_lng'), min_lat=Min('min_lat'),
+                max_lng=Max('max_lng'), max_lat=Max('max_lat'),
+            )
+            self.min_lng, self.min_lat, self.max_lng, self.max_lat = (
+                totals['min_lng'], totals['min_lat'], totals['max_lng'], totals['max_lat']
+            )
+        else:
+            for extent in added_extents:
+                if extent[1] is None:
+                    continue
+                if self.min_lng is None:
+                    self.min_lng, self.min_lat, self.max_lng, self.max_lat = extent[1:]
+                    continue
+                self.min_lng = min(self.min_lng, extent[1])
+                self.min_lat = min(self.min_lat, extent[2])
+                self.max_lng = max(self.max_lng, extent[3])
+                self.max_lat = max(self.max_lat, extent[4])
+        return True
+    
+    def _count_created(self, created_ats, step):
+        for created_at in created_ats:
+            day = creation_day(created_at)
+            for counts, key in ((self.created_per_day, day), (self.created_per_month, day[:7])):
+                value = counts.get(key, 0) + step
+                if value > 0:
+                    counts[key] = value
+                else:
+                    counts.pop(key, None)
@@ -0,0 +1,195 @@
+"""
+Overlap detection between rectangles
+
+All overlapping pairs are found with a plane sweep along longitude. The
+rectangles currently crossed by the sweep line are kept in an interval tree
+over latitude, so every new rectangle only visits the active rectangles it
+actually overlaps: O(n log n + k) for n rectangles and k overlapping pairs.
+
+Rectangles that merely touch along an edge or corner are not reported, since
+their intersection has no area.
+"""
+from bisect import bisect_left, insort
+from collections import namedtuple
+
+from .geometry import bbox_area
+from .models import Rectangle
+
+Overlap = namedtuple('Overlap', ['first_id', 'second_id', 'bounds', 'area'])
+
+
+class _IntervalNode:
+    __slots__ = ('center', 'left', 'right', 'by_low', 'by_high', 'count')
+
+    def __init__(self, center):
+        self.center = center
+        self.left = None
+        self.right = None
+        # Active intervals stored at this node, as (low, id) and (high, id)
+        self.by_low = []
+        self.by_high = []
+        # Number of active intervals in this subtree
+        self.count = 0
+
+
+class IntervalTree:
+    """
+    Centered interval tree with a static skeleton and dynamic membership
+
+    The skeleton is built up front from every interval endpoint, so intervals
+    can be inserted and removed while sweeping without rebalancing.
+    """
+
+    def __init__(self, endpoints):
+        self.root = self._build(sorted(set(endpoints)))
+
+    def _build(self, values):
+        if not values:
+            return None
+        middle = len(values) // 2
+        node = _IntervalNode(values[middle])
+        node.left = self._build(values[:middle])
+        node.right = self._build(values[middle + 1:])
+        return node
+
+    def _path(self, low, high):
+        """Yield nodes from the root down to the node that stores [low, high]"""
+        node = self.root
+        while node is not None:
+            yield node
+            if high < node.center:
+                node = node.left
+            elif low > node.center:
+                node = node.right
+            else:
+                return
+        raise ValueError("Interval endpoints must be part of the tree skeleton")
+
+    def insert(self, low, high, item_id):
+        for node in self._path(low, high):
+            node.count += 1
+        insort(node.by_low, (low, item_id))
+        insort(node.by_high, (high, item_id))
+
+    def remove(self, low, high, item_id):
+        for node in self._path(low, high):
+            node.count -= 1
+        del node.by_low[bisect_left(node.by_low, (low, item_id))]
+        del node.by_high[bisect_left(node.by_high, (high, item_id))]
+
+    def overlapping(self, low, high):
+        """Return ids of active intervals that intersect [low, high]"""
+        result = []
+        self._collect(self.root, low, high, result)
+        return result
+
+    def _collect(self, node, low, high, result):
+        while node is not None and node.count:
+            if high < node.center:
+                for interval_low, item_id in node.by_low:
+                    if interval_low > high:
+                        break
+                    result.append(item_id)
+                node = node.left
+            elif low > node.center:
+                for interval_high, item_id in reversed(node.by_high):
+                    if interval_high < low:
+                        break
+                    result.append(item_id)
+                node = node.right
+            else:
+                # Every interval stored here contains the center, which lies
+                # inside the query
+                result.extend(item_id for _, item_id in node.by_low)
+                self._collect(node.left, low, high, result)
+                node = node.right
+
+
+def intersection(first, second):
+    """
+    Intersection of two (min_x, min_y, max_x, max_y) boxes, or None when
+    they don't overlap with a positive area.
+    """
+    min_x = max(first[0], second[0])
+    min_y = max(first[1], second[1])
+    max_x = min(first[2], second[2])
+    max_y = min(first[3], second[3])
+    if min_x >= max_x or min_y >= max_y:
+        return None
+    return min_x, min_y, max_x, max_y
+
+
+def find_overlaps(items):
+    """
+    Find every pair of overlapping boxes.
+
+    items is an iterable of (item_id, min_x, min_y, max_x, max_y) tuples.
+    Returns a list of Overlap tuples with first_id < second_id.
+    """
+    # Degenerate boxes can't overlap anything with a positive area
+    boxes = {
+        item_id: (min_x, min_y, max_x, max_y)
+        for item_id, min_x, min_y, max_x, max_y in items
+        if min_x < max_x and min_y < max_y
+    }
+    if not boxes:
+        return []
+
+    # Removals sort before insertions at the same longitude, so boxes that
+    # only touch along a meridian never meet in the active set
+    events = []
+    for item_id, (min_x, _, max_x, _) in boxes.items():
+        events.append((min_x, 1, item_id))
+        events.append((max_x, 0, item_id))
+    events.sort()
+
+    active = IntervalTree(y for box in boxes.values() for y in (box[1], box[3]))
+    overlaps = []
+    for _, is_insert, item_id in events:
+        box = boxes[item_id]
+        if not is_insert:
+            active.remove(box[1], box[3], item_id)
+            continue
+
+        for other_id in active.overlapping(box[1], box[3]):
+            bounds = intersection(box, boxes[other_id])
+            if bounds is not None:
+                first_id, second_id = sorted((item_id, other_id))
+                overlaps.append(Overlap(first_id, second_id, bounds, bbox_area(*bounds)))
+        active.insert(box[1], box[3], item_id)
+
+    return overlaps
+
+
+def find_user_overlaps(user_id):
+    """Find every pair of overlapping rectangles owned by a user"""
+    rows = (
+        Rectangle.objects
+        .filter(user_id=user_id, min_lng__isnull=False)
+        .values_list('id', 'min_lng', 'min_lat', 'max_lng', 'max_lat')
+    )
+    return find_overlaps(rows)
+
+
+def find_candidate_overlaps(user_id, bounds, exclude_id=None):
+    """
+    Check a candidate bounding box against a user's existing rectangles.
+
+    Returns a list of Overlap tuples where first_id is the existing rectangle
+    and second_id is None (the candidate).
+    """
+    rows = (
+        Rectangle.objects
+        .filter(user_id=user_id)
+        .intersecting_bbox(*bounds)
+        .values_list('id', 'min_lng', 'min_lat', 'max_lng', 'max_lat')
+    )
+    if exclude_id is not None:
+        rows = rows.exclude(id=exclude_id)
+
+    overlaps = []
+    for item_id, *other in rows:
+        overlap_bounds = intersection(bounds, other)
+        if overlap_bounds is not None:
+            overlaps.append(Overlap(item_id, None, overlap_bounds, bbox_area(*overlap_bounds)))
+    return overlaps
@@ -0,0 +1,189 @@
+"""
+Compact binary storage for rectangle geometry
+
+Polygons are stored as packed coordinate arrays instead of GeoJSON. Every
+blob starts with a small header, so rows written with different encodings
+can be read side by side:
+
+    uint8   encoding (FLOAT64, INT32 or INT32_DELTA)
+    uint16  number of rings
+    uint32  number of points, once per ring
+    ...     coordinate data
+
+FLOAT64 stores lng/lat pairs as little-endian doubles and is lossless.
+INT32 quantizes to 1e-7 degrees (about 1cm) and halves the size. INT32_DELTA
+stores the quantized coordinates as zigzag varint differences from the
+previous point, which is smallest for the axis-aligned rings of rectangles.
+
+Only longitude and latitude are kept; any further position values are
+dropped.
+"""
+import struct
+
+import numpy as np
+
+FLOAT64 = 1
+INT32 = 2
+INT32_DELTA = 3
+
+ENCODINGS = {
+    'float64': FLOAT64,
+    'int32': INT32,
+    'int32-delta': INT32_DELTA,
+}
+
+# Quantization step of the integer encodings, in degrees
+SCALE = 10_000_000
+
+_HEADER = struct.Struct('<BH')
+
+
+def _ring_arrays(geojson):
+    """Return the rings of a GeoJSON Polygon as (n, 2) float64 arrays"""
+    if not isinstance(geojson, dict) or not isinstance(geojson.get('coordinates'), list):
+        raise ValueError("Geometry must be a GeoJSON Polygon")
+
+    rings = []
+    for ring in geojson['coordinates']:
+        if not isinstance(ring, list):
+            raise ValueError("Polygon rings must be arrays of positions")
+        try:
+            points = [(float(point[0]), float(point[1])) for point in ring]
+        except (TypeError, ValueError, IndexError, KeyError):
+            raise ValueError("Positions must be [longitude, latitude] number pairs")
+        rings.append(np.array(points, dtype='<f8').reshape(-1, 2))
+    return rings
+
+
+def _encode_varints(values):
+    out = bytearray()
+    for value in values:
+        value = (value << 1) ^ (value >> 63)
+        while value > 0x7F:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+    return bytes(out)
+
+
+# Below this many values a Python loop beats numpy's per-call overhead
+_VECTOR_DECODE_MIN = 32
+
+
+def _decode_varints_loop(data, offset, count):
+    values = np.empty(count, dtype=np.int64)
+    for index in range(count):
+        value = shift = 0
+        while True:
+            byte = data[offset]
+            offset += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        values[index] = (value >> 1) ^ -(value & 1)
+    return values
+
+
+def _decode_varints(data, offset, count):
+    if count < _VECTOR_DECODE_MIN:
+        return _decode_varints_loop(data, offset, count)
+    encoded = np.frombuffer(data, dtype=np.uint8, offset=offset)
+    # Every value ends with the first byte below 0x80
+    ends = np.flatnonzero(encoded < 0x80)[:count]
+    encoded = encoded[:ends[-1] + 1]
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    value_of_byte = np.repeat(np.arange(count), ends - starts + 1)
+    shifts = 7 * (np.arange(len(encoded)) - starts[value_of_byte])
+    values = np.bitwise_or.reduceat((encoded & 0x7F).astype(np.uint64) << shifts.astype(np.uint64), starts)
+    return (values >> np.uint64(1)).astype(np.int64) ^ -(values & np.uint64(1)).astype(np.int64)
+
+
+def pack_polygon(geojson, encoding='float64'):
+    """
+    Pack a GeoJSON Polygon into bytes using one of ENCODINGS.
+
+    Raises ValueError if the geometry can't be packed.
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown coordinate encoding: {encoding}")
+    code = ENCODINGS[encoding]
+    rings = _ring_arrays(geojson)
+
+    header = _HEADER.pack(code, len(rings)) + struct.pack(
+        f'<{len(rings)}I', *(len(ring) for ring in rings)
+    )
+    points = np.concatenate(rings) if rings else np.empty((0, 2), dtype='<f8')
+
+    if code == FLOAT64:
+        return header + points.tobytes()
+
+    if (np.abs(points[:, 0]) > 180).any() or (np.abs(points[:, 1]) > 90).any():
+        raise ValueError("Coordinates are out of range for integer encoding")
+    quantized = np.rint(points * SCALE).astype('<i4')
+    if code == INT32:
+        return header + quantized.tobytes()
+
+    deltas = np.diff(quantized.astype(np.int64), axis=0, prepend=0)
+    return header + _encode_varints(deltas.ravel().tolist())
+
+
+def unpack_points(data):
+    """
+    Unpack bytes written by pack_polygon.
+
+    Returns a (ring sizes, points) tuple, where points is an (n, 2) float64
+    array holding the positions of all rings one after the other.
+    """
+    data = memoryview(data)
+    code, ring_count = _HEADER.unpack_from(data)
+    sizes = struct.unpack_from(f'<{ring_count}I', data, _HEADER.size)
+    offset = _HEADER.size + 4 * ring_count
+    total = sum(sizes)
+
+    if code == FLOAT64:
+        points = np.frombuffer(data, dtype='<f8', count=total * 2, offset=offset)
+    elif code == INT32:
+        points = np.frombuffer(data, dtype='<i4', count=total * 2, offset=offset) / SCALE
+    elif code == INT32_DELTA:
+        deltas = _decode_varints(data, offset, total * 2).reshape(-1, 2)
+        points = np.cumsum(deltas, axis=0) / SCALE
+    else:
+        raise ValueError(f"Unknown coordinate encoding code: {code}")
+
+    return sizes, points.reshape(-1, 2)
+
+
+def unpack_ring(data):
+    """Unpack only the outer ring as an (n, 2) float64 array, or None"""
+    sizes, points = unpack_points(data)
+    if not sizes:
+        return None
+    return points[:sizes[0]]
+
+
+def unpack_polygon(data):
+    """Unpack bytes written by pack_polygon into a GeoJSON Polygon"""
+    data = memoryview(data)
+    code, ring_count = _HEADER.unpack_from(data)
+    if code in (FLOAT64, INT32):
+        # struct is faster than numpy for the handful of points in a polygon
+        sizes = struct.unpack_from(f'<{ring_count}I', data, _HEADER.size)
+        offset = _HEADER.size + 4 * ring_count
+        count = sum(sizes) * 2
+        if code == FLOAT64:
+            values = struct.unpack_from(f'<{count}d', data, offset)
+        else:
+            values = [value / SCALE for value in struct.unpack_from(f'<{count}i', data, offset)]
+        pairs = iter(values)
+        positions = [[lng, lat] for lng, lat in zip(pairs, pairs)]
+    else:
+        sizes, points = unpack_points(data)
+        positions = points.tolist()
+
+    rings = []
+    start = 0
+    for size in sizes:
+        rings.append(positions[start:start + size])
+        start += size
+    return {'type': 'Polygon', 'coordinates': rings}
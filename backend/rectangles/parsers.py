@@ -0,0 +1,17 @@
+import numpy as np
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class PointArrayParser(BaseParser):
+    """
+    Parses a compact binary body of little-endian float64 (lng, lat) pairs
+    into an (n, 2) NumPy array
+    """
+    media_type = 'application/octet-stream'
+    
+    def parse(self, stream, media_type=None, parser_context=None):
+        body = stream.read() if stream is not None else b''
+        if len(body) % 16:
+            raise ParseError("Binary body must contain float64 (lng, lat) pairs")
+        return np.frombuffer(body, dtype='<f8').reshape(-1, 2)
@@ -1,80 +1,129 @@
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
-from .models import Rectangle
+from drawnzones.sparse import SparseFieldsetMixin
+from .models import Rectangle, is_duplicate_name_error
+from .geometry import polygon_bounds
+from .simplify import output_geometry
+from .overlaps import find_candidate_overlaps
+from .validation import validate_polygon
 
 
-class RectangleSerializer(serializers.ModelSerializer):
+DUPLICATE_NAME_ERROR = "You already have a rectangle with this name"
+
+
+class UniqueNameMixin:
+    """
+    Serializer mixin reporting violations of the per-user unique name
+    constraint as a validation error on name
+    """
+    
+    def save(self, **kwargs):
+        try:
+            with transaction.atomic():
+                return super().save(**kwargs)
+        except IntegrityError as e:
+            if not is_duplicate_name_error(e):
+                raise
+            raise serializers.ValidationError({'name': [DUPLICATE_NAME_ERROR]})
+
+
+class PolygonField(serializers.JSONField):
+    """
+    GeoJSON Polygon checked by rectangles.validation
+    
+    Bulk writes validate the geometries of a whole batch at once, and set
+    ``geometry_validated`` in the context of items that passed.
+    """
+    
+    def to_internal_value(self, data):
+        data = super().to_internal_value(data)
+        if self.context.get('geometry_validated'):
+            return data
+        try:
+            return validate_polygon(data)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
+
+class CoordinatesField(PolygonField):
+    """
+    GeoJSON coordinates, rounded and simplified on output when the serializer
+    context has ``geometry_options``
+    """
+    
+    def get_attribute(self, instance):
+        options = self.context.get('geometry_options')
+        if options is None:
+            return super().get_attribute(instance)
+        return output_geometry(instance, options)
+
+
+class RectangleSerializer(UniqueNameMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer for Rectangle model
     """
+    coordinates = CoordinatesField()
     center_coordinates = serializers.ReadOnlyField()
     
+    field_columns = {
+        'coordinates': ['geometry', 'updated_at'],
+        'center_coordinates': ['center_lng', 'center_lat'],
+    }
+    
     class Meta:
         model = Rectangle
         fields = [
-            'id', 'name', 'coordinates', 'center_coordinates',
+            'id', 'name', 'coordinates', 'center_coordinates', 'area',
             'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'center_coordinates']
-    
-    def validate_coordinates(self, value):
-        """Validate that coordinates are valid GeoJSON"""
-        if not isinstance(value, dict):
-            raise serializers.ValidationError("Coordinates must be a valid GeoJSON object")
-        
-        if value.get('type') != 'Polygon':
-            raise serializers.ValidationError("Coordinates must be a Polygon type")
-        
-        if 'coordinates' not in value or not value['coordinates']:
-            raise serializers.ValidationError("Coordinates must contain coordinates array")
-        
-        coords = value['coordinates']
-        if not isinstance(coords, list) or len(coords) == 0:
-            raise serializers.ValidationError("Coordinates must be a non-empty array")
-        
-        # Validate that we have at least 4 points for a rectangle
-        if len(coords[0]) < 4:
-            raise serializers.ValidationError("Rectangle must have at least 4 coordinate points")
-        
-        return value
+        read_only_fields = ['id', 'created_at', 'updated_at', 'center_coordinates', 'area']
 
 
-class RectangleCreateSerializer(serializers.ModelSerializer):
+class RectangleCreateSerializer(UniqueNameMixin, serializers.ModelSerializer):
     """
     Serializer for creating rectangles
     """
+    coordinates = PolygonField()
+    reject_overlaps = serializers.BooleanField(write_only=True, required=False, default=False)
+    
     class Meta:
         model = Rectangle
-        fields = ['name', 'coordinates']
+        fields = ['name', 'coordinates', 'reject_overlaps']
     
     def validate_name(self, value):
         """Validate rectangle name"""
         if not value or not value.strip():
             raise serializers.ValidationError("Name cannot be empty")
         
-        # Check if user already has a rectangle with this name
-        user = self.context['request'].user
-        if Rectangle.objects.filter(user=user, name=value.strip()).exists():
-            raise serializers.ValidationError("You already have a rectangle with this name")
-        
+        # Duplicate names are rejected by the database when saving
         return value.strip()
     
-    def validate_coordinates(self, value):
-        """Validate that coordinates are valid GeoJSON"""
-        if not isinstance(value, dict):
-            raise serializers.ValidationError("Coordinates must be a valid GeoJSON object")
-        
-        if value.get('type') != 'Polygon':
-            raise serializers.ValidationError("Coordinates must be a Polygon type")
-        
-        if 'coordinates' not in value or not value['coordinates']:
-            raise serializers.ValidationError("Coordinates must contain coordinates array")
+    def validate(self, attrs):
+        """Optionally reject rectangles that overlap existing zones"""
+        reject_overlaps = attrs.pop('reject_overlaps', False)
         
-        coords = value['coordinates']
-        if not isinstance(coords, list) or len(coords) == 0:
-            raise serializers.ValidationError("Coordinates must be a non-empty array")
+        if reject_overlaps:
+            bounds = polygon_bounds(attrs['coordinates'])
+            user = self.context['request'].user
+            overlaps = find_candidate_overlaps(user.id, bounds) if bounds else []
+            if overlaps:
+                ids = ', '.join(str(overlap.first_id) for overlap in overlaps)
+                raise serializers.ValidationError({
+                    'coordinates': [f"Rectangle overlaps existing rectangles: {ids}"]
+                })
         
-        # Validate that we have at least 4 points for a rectangle
-        if len(coords[0]) < 4:
-            raise serializers.ValidationError("Rectangle must have at least 4 coordinate points")
-        
-        return value 
\ No newline at end of file
+        return attrs
+
+
+class RectangleBulkItemSerializer(RectangleCreateSerializer):
+    """
+    Serializer for validating one rectangle of a bulk write
+    
+    Items are written by rectangles.bulk, which resolves name conflicts for
+    the whole batch at once.
+    """
+    reject_overlaps = None
+    
+    class Meta:
+        model = Rectangle
+        fields = ['name', 'coordinates']
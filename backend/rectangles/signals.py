@@ -0,0 +1,114 @@
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal, receiver
+
+from .models import Rectangle, ZoneChange, ZoneStats, ZoneVersion, User
+from .caching import bump_generation
+from . import classify, clusters, events, spatial
+
+# Sent whenever a user's rectangles change, with ``user_id`` and the lists of
+# ``created``, ``updated`` and ``deleted`` Rectangle instances. Bulk write
+# paths that bypass model signals (bulk_create, bulk_update, queryset.update)
+# must send it themselves, once per batch.
+zones_changed = Signal()
+
+_batch_state = threading.local()
+
+
+@contextmanager
+def batched_zone_changes():
+    """
+    Suppress the per-row zones_changed signals inside the block.
+
+    The caller is responsible for sending a single zones_changed signal that
+    describes the whole batch.
+    """
+    previous = getattr(_batch_state, 'active', False)
+    _batch_state.active = True
+    try:
+        yield
+    finally:
+        _batch_state.active = previous
+
+
+def send_zones_changed(user_id, created=(), updated=(), deleted=()):
+    """Send zones_changed for a batch of rectangle changes"""
+    zones_changed.send(
+        sender=Rectangle,
+        user_id=user_id,
+        created=list(created),
+        updated=list(updated),
+        deleted=list(deleted),
+    )
+
+
+@receiver(post_save, sender=Rectangle)
+def rectangle_saved(sender, instance, created, **kwargs):
+    """Forward single-row saves as a zones_changed signal"""
+    if getattr(_batch_state, 'active', False):
+        return
+    if created:
+        send_zones_changed(instance.user_id, created=[instance])
+    else:
+        send_zones_changed(instance.user_id, updated=[instance])
+
+
+def _deleted_with_user(origin):
+    """Whether a delete cascades from deleting the rectangles' owner"""
+    return isinstance(origin, User) or getattr(origin, 'model', None) is User
+
+
+@receiver(post_delete, sender=Rectangle)
+def rectangle_deleted(sender, instance, origin=None, **kwargs):
+    """Forward single-row deletes as a zones_changed signal"""
+    if getattr(_batch_state, 'active', False) or _deleted_with_user(origin):
+        return
+    send_zones_changed(instance.user_id, deleted=[instance])
+
+
+@receiver(zones_changed)
+def invalidate_zone_caches(sender, user_id, created=(), updated=(), deleted=(), **kwargs):
+    """
+    Once the changes are committed, drop cached data derived from the user's
+    rectangles, or update it in place where that is cheaper than rebuilding
+    it. Bumping the generation earlier would let a concurrent reader cache
+    data built from the old rows under the new generation, and a rolled back
+    write would still invalidate everything.
+    """
+    # Deleting clears the instances' ids, so take what the clusters need now
+    added = [zone for zone in map(clusters.zone_row, (*created, *updated)) if zone is not None]
+    removed = [rectangle.id for rectangle in (*updated, *deleted)]
+    
+    def invalidate():
+        generation = bump_generation(user_id)
+        spatial.invalidate_user_index(user_id)
+        classify.invalidate_user_grid(user_id)
+        clusters.update_user_clusters(user_id, generation, added, removed)
+    
+    transaction.on_commit(invalidate)
+
+
+@receiver(zones_changed)
+def bump_zone_version(sender, user_id, created=(), updated=(), deleted=(), **kwargs):
+    """
+    Advance the user's change version used for conditional GETs, and log the
+    changes under the new version in the same transaction
+    """
+    with transaction.atomic():
+        version = ZoneVersion.bump(user_id)
+        ZoneChange.record(user_id, version, created, updated, deleted)
+
+
+@receiver(zones_changed)
+def update_zone_stats(sender, user_id, created=(), updated=(), deleted=(), **kwargs):
+    """Apply the changes to the user's incrementally maintained stats"""
+    ZoneStats.apply_changes(user_id, created, updated, deleted)
+
+
+@receiver(zones_changed)
+def notify_zone_events(sender, user_id, **kwargs):
+    """Wake the user's change event streams once the changes are committed"""
+    transaction.on_commit(lambda: events.notify_user(user_id))
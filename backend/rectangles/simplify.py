@@ -0,0 +1,170 @@
+"""
+Coordinate precision control and simplification of output geometry
+
+Clients can ask for coordinates rounded to a number of decimals
+(``?precision=``) and for rings simplified with Douglas-Peucker
+(``?simplify=``, a tolerance in degrees). Simplification is the expensive
+part, so simplified geometry is cached per rectangle, tolerance and
+precision, keyed by the rectangle's ``updated_at`` so edits never serve
+stale shapes.
+"""
+from collections import namedtuple
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .packing import unpack_points
+
+MAX_PRECISION = 15
+
+# Smallest valid closed polygon ring
+MIN_RING_SIZE = 4
+
+OutputOptions = namedtuple('OutputOptions', ['precision', 'tolerance'])
+
+
+def parse_output_options(params):
+    """
+    Parse ``precision`` and ``simplify`` query parameters.
+
+    Returns OutputOptions, or None when neither is given. Raises ValueError
+    with a {param: message} dict as its argument on invalid values.
+    """
+    precision = params.get('precision')
+    tolerance = params.get('simplify')
+    if precision in (None, '') and tolerance in (None, ''):
+        return None
+
+    if precision in (None, ''):
+        precision = None
+    else:
+        try:
+            precision = int(precision)
+        except ValueError:
+            precision = -1
+        if not 0 <= precision <= MAX_PRECISION:
+            raise ValueError({'precision': f"Must be an integer between 0 and {MAX_PRECISION}"})
+
+    if tolerance in (None, ''):
+        tolerance = None
+    else:
+        try:
+            tolerance = float(tolerance)
+        except ValueError:
+            tolerance = -1
+        if not 0 <= tolerance < float('inf'):
+            raise ValueError({'simplify': "Must be a non-negative number of degrees"})
+
+    return OutputOptions(precision, tolerance or None)
+
+
+def douglas_peucker(points, tolerance):
+    """
+    Simplify a line given as an (n, 2) array, keeping its first and last
+    points and every point further than tolerance from the simplified line
+    """
+    count = len(points)
+    if count < 3:
+        return points
+
+    keep = np.zeros(count, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, count - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        first, last = points[start], points[end]
+        between = points[start + 1:end]
+        direction = last - first
+        length_sq = direction @ direction
+        if length_sq == 0:
+            # A closed ring starts and ends on the same point
+            nearest = first
+        else:
+            t = np.clip((between - first) @ direction / length_sq, 0, 1)
+            nearest = first + t[:, None] * direction
+        distances = np.hypot(*(between - nearest).T)
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            split = start + 1 + index
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+
+    return points[keep]
+
+
+def simplify_ring(ring, tolerance):
+    """Simplify a closed ring, keeping it unchanged if it would collapse"""
+    simplified = douglas_peucker(ring, tolerance)
+    if len(simplified) < MIN_RING_SIZE:
+        return ring
+    return simplified
+
+
+def transform_geometry(geometry, options):
+    """
+    Decode packed geometry into a GeoJSON Polygon, simplified and rounded
+    according to the output options
+    """
+    sizes, points = unpack_points(geometry)
+    rings = []
+    start = 0
+    for size in sizes:
+        ring = points[start:start + size]
+        start += size
+        if options.tolerance:
+            ring = simplify_ring(ring, options.tolerance)
+        if options.precision is not None:
+            ring = np.round(ring, options.precision)
+        rings.append(ring.tolist())
+    return {'type': 'Polygon', 'coordinates': rings}
+
+
+def _cache_key(rectangle_id, updated_at, options):
+    version = int(updated_at.timestamp() * 1_000_000)
+    return (
+        f"rectangles:simplified:{rectangle_id}:{version}:"
+        f"{options.tolerance!r}:{options.precision}"
+    )
+
+
+def output_geometries(items, options):
+    """
+    Return the output GeoJSON of (id, updated_at, geometry) items, or None
+    for items without geometry.
+
+    Simplified geometry is read from and written to the cache in one round
+    trip each for the whole list.
+    """
+    if not options.tolerance:
+        return [
+            transform_geometry(geometry, options) if geometry else None
+            for _, _, geometry in items
+        ]
+
+    keys = [_cache_key(rectangle_id, updated_at, options) for rectangle_id, updated_at, _ in items]
+    cached = cache.get_many(keys)
+    missing = {}
+    results = []
+    for key, (_, _, geometry) in zip(keys, items):
+        if not geometry:
+            results.append(None)
+            continue
+        if key not in cached:
+            missing[key] = transform_geometry(geometry, options)
+        results.append(cached.get(key, missing.get(key)))
+
+    if missing:
+        timeout = getattr(settings, 'RECTANGLES_SIMPLIFY_CACHE_TIMEOUT', 86400)
+        cache.set_many(missing, timeout)
+    return results
+
+
+def output_geometry(rectangle, options):
+    """Return the output GeoJSON of a single rectangle"""
+    return output_geometries(
+        [(rectangle.id, rectangle.updated_at, rectangle.geometry)], options
+    )[0]
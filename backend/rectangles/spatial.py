@@ -0,0 +1,235 @@
+"""
+In-memory spatial index over a user's rectangles
+
+Rectangles are indexed by their persisted bounding box with a static
+Sort-Tile-Recursive (STR) packed R-tree, which answers bbox, point and
+nearest-neighbour queries. Indexes are built lazily per user and kept in a
+small LRU cache; they are rebuilt when the user's cache generation changes
+(see ``caching.py``).
+"""
+import heapq
+import itertools
+import math
+import threading
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .caching import aget_generation, get_generation
+from .geometry import point_bbox_distance
+from .models import Rectangle
+
+NODE_CAPACITY = 16
+
+# Entry/node tuple layout: (min_x, min_y, max_x, max_y, payload)
+# For leaf entries the payload is the rectangle id, for nodes it is a
+# (children, is_leaf) pair.
+MIN_X, MIN_Y, MAX_X, MAX_Y, PAYLOAD = range(5)
+
+
+class STRTree:
+    """
+    Static R-tree packed with the Sort-Tile-Recursive algorithm
+    """
+
+    def __init__(self, items, node_capacity=NODE_CAPACITY):
+        """
+        Build the tree from an iterable of
+        (item_id, min_x, min_y, max_x, max_y) tuples.
+        """
+        self.node_capacity = node_capacity
+        entries = [
+            (min_x, min_y, max_x, max_y, item_id)
+            for item_id, min_x, min_y, max_x, max_y in items
+        ]
+        self.size = len(entries)
+        self.root = None
+
+        if not entries:
+            return
+
+        nodes = self._pack(entries, is_leaf=True)
+        while len(nodes) > 1:
+            nodes = self._pack(nodes, is_leaf=False)
+        self.root = nodes[0]
+
+    def __len__(self):
+        return self.size
+
+    def _pack(self, entries, is_leaf):
+        """Group entries into parent nodes of at most node_capacity children"""
+        capacity = self.node_capacity
+        node_count = math.ceil(len(entries) / capacity)
+        slice_count = math.ceil(math.sqrt(node_count))
+        slice_size = slice_count * capacity
+
+        entries = sorted(entries, key=lambda e: e[MIN_X] + e[MAX_X])
+        nodes = []
+        for start in range(0, len(entries), slice_size):
+            vertical_slice = sorted(
+                entries[start:start + slice_size],
+                key=lambda e: e[MIN_Y] + e[MAX_Y]
+            )
+            for offset in range(0, len(vertical_slice), capacity):
+                children = vertical_slice[offset:offset + capacity]
+                nodes.append((
+                    min(c[MIN_X] for c in children),
+                    min(c[MIN_Y] for c in children),
+                    max(c[MAX_X] for c in children),
+                    max(c[MAX_Y] for c in children),
+                    (children, is_leaf),
+                ))
+        return nodes
+
+    def query_bbox(self, min_x, min_y, max_x, max_y):
+        """Return ids of all items whose bounds intersect the given box"""
+        root = self.root
+        if root is None or not (
+            root[MIN_X] <= max_x and root[MAX_X] >= min_x
+            and root[MIN_Y] <= max_y and root[MAX_Y] >= min_y
+        ):
+            return []
+
+        result = []
+        stack = [root]
+        while stack:
+            children, is_leaf = stack.pop()[PAYLOAD]
+            for child in children:
+                if (child[MIN_X] <= max_x and child[MAX_X] >= min_x
+                        and child[MIN_Y] <= max_y and child[MAX_Y] >= min_y):
+                    if is_leaf:
+                        result.append(child[PAYLOAD])
+                    else:
+                        stack.append(child)
+        return result
+
+    def query_point(self, x, y):
+        """Return ids of all items whose bounds contain the point"""
+        return self.query_bbox(x, y, x, y)
+
+    def nearest(self, x, y, k, distance, max_distance=None):
+        """
+        Return up to k (item_id, distance) pairs closest to the point, nearest
+        first, by best-first search.
+
+        distance(x, y, min_x, min_y, max_x, max_y) measures the distance from
+        the point to a box. Nodes are visited in order of their distance, so
+        only the part of the tree closer than the k-th result is expanded.
+        """
+        if self.root is None or k <= 0:
+            return []
+
+        # (distance, tie breaker, entry, is_item); the counter keeps entries
+        # from ever being compared
+        counter = itertools.count()
+        heap = [(distance(x, y, *self.root[:PAYLOAD]), next(counter), self.root, False)]
+        result = []
+        while heap and len(result) < k:
+            entry_distance, _, entry, is_item = heapq.heappop(heap)
+            if max_distance is not None and entry_distance > max_distance:
+                break
+            if is_item:
+                result.append((entry[PAYLOAD], entry_distance))
+                continue
+            children, is_leaf = entry[PAYLOAD]
+            for child in children:
+                child_distance = distance(x, y, *child[:PAYLOAD])
+                if max_distance is None or child_distance <= max_distance:
+                    heapq.heappush(heap, (child_distance, next(counter), child, is_leaf))
+        return result
+
+
+class UserIndexCache:
+    """
+    Thread-safe LRU cache of per-user indexes, keyed by cache generation
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @property
+    def max_size(self):
+        return getattr(settings, 'RECTANGLES_SPATIAL_INDEX_CACHE_SIZE', 128)
+
+    def get(self, user_id, generation):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] != generation:
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[1]
+
+    def set(self, user_id, generation, index):
+        with self._lock:
+            self._entries[user_id] = (generation, index)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_index_cache = UserIndexCache()
+
+
+def _user_boxes(user_id):
+    return (
+        Rectangle.objects
+        .filter(user_id=user_id, min_lng__isnull=False)
+        .values_list('id', 'min_lng', 'min_lat', 'max_lng', 'max_lat')
+    )
+
+
+def build_user_index(user_id):
+    """Build a spatial index over all of a user's rectangles"""
+    return STRTree(_user_boxes(user_id).iterator(chunk_size=2000))
+
+
+def get_user_index(user_id):
+    """Return the (lazily built) spatial index for a user's rectangles"""
+    generation = get_generation(user_id)
+    index = _index_cache.get(user_id, generation)
+    if index is None:
+        index = build_user_index(user_id)
+        _index_cache.set(user_id, generation, index)
+    return index
+
+
+async def aget_user_index(user_id):
+    """Return the (lazily built) spatial index for a user's rectangles, from a coroutine"""
+    generation = await aget_generation(user_id)
+    index = _index_cache.get(user_id, generation)
+    if index is None:
+        rows = [row async for row in _user_boxes(user_id)]
+        # Sorting and packing the tree is CPU work, keep it off the event loop
+        index = await sync_to_async(STRTree)(rows)
+        _index_cache.set(user_id, generation, index)
+    return index
+
+
+def invalidate_user_index(user_id):
+    """Drop the cached spatial index for a user in this process"""
+    _index_cache.discard(user_id)
+
+
+def rectangles_containing(user_id, lng, lat):
+    """Return ids of the user's rectangles that contain the point"""
+    return get_user_index(user_id).query_point(lng, lat)
+
+
+def nearest_rectangles(user_id, lng, lat, k, max_distance=None):
+    """
+    Return (id, distance in meters) pairs of the user's k rectangles closest
+    to the point, optionally only those within max_distance meters
+    """
+    return get_user_index(user_id).nearest(
+        lng, lat, k, point_bbox_distance, max_distance=max_distance
+    )
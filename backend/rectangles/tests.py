@@ -1,12 +1,70 @@
-from django.test import TestCase
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.client import FakePayload
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from django.utils.translation import gettext_lazy
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
 from rest_framework.test import APITestCase
 from rest_framework import status
-from .models import Rectangle
+from .models import Rectangle, ZoneStats, ZoneVersion
+from .spatial import STRTree
+from .geometry import point_bbox_distance
+from .classify import ZoneGrid
+from .geofence import GeofenceEngine, GeofenceEvent, _device_hash, _lock_key, _state_key
+from .clusters import ClusterIndex, get_user_clusters
+from .events import ZoneEventBroker, stream_events
+from .overlaps import find_overlaps, intersection
+from .export import aexport_rows, aiter_ndjson, export_rows, iter_geojson
+from .importer import iter_geojson_features, iter_ndjson_features
+from .packing import pack_polygon, unpack_polygon
+from .validation import validate_polygon, validate_polygons
+from .simplify import douglas_peucker, OutputOptions
+from .fastpath import rectangle_values, serialize_rectangles
+from .serializers import RectangleSerializer
+from drawnzones.conditional import not_modified, set_validators
+from drawnzones.pagination import KeysetPagination
+from drawnzones.parsers import FastJSONParser
+from drawnzones.renderers import FastJSONRenderer
+from asgiref.sync import sync_to_async
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from unittest.mock import patch
+import numpy as np
+import asyncio
+import io
+import json
+import tempfile
 
 User = get_user_model()
 
 
+def polygon(*rings):
+    """GeoJSON Polygon with the given rings"""
+    return {'type': 'Polygon', 'coordinates': [list(ring) for ring in rings]}
+
+
+def box_ring(min_lng, min_lat, max_lng, max_lat):
+    """Closed ring around an axis-aligned box"""
+    return [
+        [min_lng, min_lat], [min_lng, max_lat], [max_lng, max_lat],
+        [max_lng, min_lat], [min_lng, min_lat]
+    ]
+
+
+def box_polygon(min_lng, min_lat, max_lng, max_lat):
+    """GeoJSON Polygon of an axis-aligned box"""
+    return polygon(box_ring(min_lng, min_lat, max_lng, max_lat))
+
+
 class RectangleModelTest(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(
@@ -139,4 +197,1976 @@ class RectangleAPITest(APITestCase):
         
         response = self.client.delete(f'/api/rectangles/{self.rectangle.id}/')
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
-        self.assertEqual(Rectangle.objects.count(), 0) 
\ No newline at end of file
+        self.assertEqual(Rectangle.objects.count(), 0) 
+
+
+class RectangleBBoxTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+        
+        self.nyc = Rectangle.objects.create(
+            user=self.user,
+            name='New York',
+            coordinates=box_polygon(-74.006, 40.7128, -73.996, 40.7228)
+        )
+        self.london = Rectangle.objects.create(
+            user=self.user,
+            name='London',
+            coordinates=box_polygon(-0.13, 51.50, -0.12, 51.51)
+        )
+    
+    def test_bounds_kept_in_sync_on_save(self):
+        """Test bounding box columns are updated when coordinates change"""
+        self.assertEqual(self.nyc.bounds, [-74.006, 40.7128, -73.996, 40.7228])
+        
+        self.nyc.coordinates = box_polygon(1, 2, 3, 4)
+        self.nyc.save()
+        self.nyc.refresh_from_db()
+        
+        self.assertEqual(self.nyc.bounds, [1, 2, 3, 4])
+
+    def test_filter_by_bbox(self):
+        """Test the bbox query parameter only returns intersecting rectangles"""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get('/api/rectangles/', {'bbox': '-75,40,-73,41'})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        names = [item['name'] for item in response.data['results']]
+        self.assertEqual(names, ['New York'])
+
+    def test_filter_by_bbox_invalid(self):
+        """Test a malformed bbox is rejected"""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get('/api/rectangles/', {'bbox': '-75,40,-73'})
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('bbox', response.data)
+
+
+class RectangleContainsTest(APITestCase):
+    def setUp(self):
+        # Derived data is cached by user id and generation, and generations only
+        # move when writes commit, which tests never do
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        
+        self.rectangle = Rectangle.objects.create(
+            user=self.user,
+            name='Test Rectangle',
+            coordinates={
+                'type': 'Polygon',
+                'coordinates': [[
+                    [-74.006, 40.7128],
+                    [-74.006, 40.7228],
+                    [-73.996, 40.7228],
+                    [-73.996, 40.7128],
+                    [-74.006, 40.7128]
+                ]]
+            }
+        )
+
+    def test_str_tree_query(self):
+        """Test the STR tree finds exactly the boxes containing a point"""
+        items = [(i, i, i, i + 1.5, i + 1.5) for i in range(1000)]
+        tree = STRTree(items)
+        
+        self.assertEqual(len(tree), 1000)
+        self.assertEqual(sorted(tree.query_point(10.25, 10.25)), [9, 10])
+        self.assertEqual(tree.query_point(-5, -5), [])
+        self.assertEqual(STRTree([]).query_point(0, 0), [])
+
+    def test_contains_point(self):
+        """Test looking up rectangles that contain a point"""
+        response = self.client.get('/api/rectangles/contains/', {'lng': -74.0, 'lat': 40.72})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['id'], self.rectangle.id)
+
+    def test_index_invalidated_on_change(self):
+        """Test the cached index reflects saved and deleted rectangles"""
+        params = {'lng': 10.5, 'lat': 10.5}
+        self.assertEqual(self.client.get('/api/rectangles/contains/', params).data['count'], 0)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rectangle.coordinates = {
+                'type': 'Polygon',
+                'coordinates': [[[10, 10], [10, 11], [11, 11], [11, 10], [10, 10]]]
+            }
+            self.rectangle.save()
+        self.assertEqual(self.client.get('/api/rectangles/contains/', params).data['count'], 1)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rectangle.delete()
+        self.assertEqual(self.client.get('/api/rectangles/contains/', params).data['count'], 0)
+
+    def test_contains_invalid_point(self):
+        """Test missing or out of range coordinates are rejected"""
+        response = self.client.get('/api/rectangles/contains/', {'lng': 200, 'lat': 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        response = self.client.get('/api/rectangles/contains/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RectangleClassifyTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        
+        self.first = Rectangle.objects.create(
+            user=self.user,
+            name='First',
+            coordinates={
+                'type': 'Polygon',
+                'coordinates': [[[0, 0], [0, 2], [2, 2], [2, 0], [0, 0]]]
+            }
+        )
+        self.second = Rectangle.objects.create(
+            user=self.user,
+            name='Second',
+            coordinates={
+                'type': 'Polygon',
+                'coordinates': [[[1, 1], [1, 3], [3, 3], [3, 1], [1, 1]]]
+            }
+        )
+
+    def test_zone_grid_matches_brute_force(self):
+        """Test the vectorized grid agrees with a brute force comparison"""
+        rng = np.random.default_rng(42)
+        corners = rng.uniform(-50, 50, size=(300, 2))
+        sizes = rng.uniform(0, 10, size=(300, 2))
+        bounds = np.hstack([corners, corners + sizes])
+        points = rng.uniform(-60, 60, size=(2000, 2))
+        
+        grid = ZoneGrid(np.arange(300), bounds)
+        point_index, zone_ids = grid.classify(points)
+        
+        expected = [
+            (p, z) for p in range(len(points)) for z in range(len(bounds))
+            if bounds[z, 0] <= points[p, 0] <= bounds[z, 2]
+            and bounds[z, 1] <= points[p, 1] <= bounds[z, 3]
+        ]
+        self.assertEqual(sorted(zip(point_index.tolist(), zone_ids.tolist())), expected)
+
+    def test_classify_json(self):
+        """Test classifying a JSON batch of points"""
+        data = {'points': [[0.5, 0.5], [1.5, 1.5], [2.5, 2.5], [10, 10]]}
+        response = self.client.post('/api/rectangles/classify/', data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual(
+            [sorted(ids) for ids in response.data['results']],
+            [[self.first.id], sorted([self.first.id, self.second.id]), [self.second.id], []]
+        )
+
+    def test_classify_binary(self):
+        """Test classifying a binary float64 batch of points"""
+        body = np.array([[0.5, 0.5], [10, 10]], dtype='<f8').tobytes()
+        response = self.client.post(
+            '/api/rectangles/classify/', body, content_type='application/octet-stream'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [[self.first.id], []])
+
+    def test_classify_invalid_points(self):
+        """Test malformed and out of range points are rejected"""
+        for points in ([[0, 0, 0]], [[0, 95]], 'nope'):
+            response = self.client.post(
+                '/api/rectangles/classify/', {'points': points}, format='json'
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RectangleOverlapsTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        
+        self.first = Rectangle.objects.create(
+            user=self.user,
+            name='First',
+            coordinates=box_polygon(0, 0, 2, 2)
+        )
+        self.second = Rectangle.objects.create(
+            user=self.user,
+            name='Second',
+            coordinates=box_polygon(1, 1, 3, 3)
+        )
+        # Touches Second along an edge, which is not an overlap
+        Rectangle.objects.create(
+            user=self.user,
+            name='Third',
+            coordinates=box_polygon(3, 1, 4, 2)
+        )
+    
+    def test_sweep_matches_brute_force(self):
+        """Test the sweep line finds the same pairs as a brute force comparison"""
+        rng = np.random.default_rng(7)
+        corners = rng.integers(0, 100, size=(400, 2)).astype(float)
+        sizes = rng.integers(0, 8, size=(400, 2)).astype(float)
+        items = [
+            (i, corners[i, 0], corners[i, 1], corners[i, 0] + sizes[i, 0], corners[i, 1] + sizes[i, 1])
+            for i in range(400)
+        ]
+        
+        found = sorted((o.first_id, o.second_id) for o in find_overlaps(items))
+        expected = [
+            (a[0], b[0]) for a in items for b in items
+            if a[0] < b[0] and intersection(a[1:], b[1:]) is not None
+        ]
+        self.assertEqual(found, expected)
+
+    def test_list_overlaps(self):
+        """Test listing overlapping rectangle pairs"""
+        response = self.client.get('/api/rectangles/overlaps/')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+        result = response.data['results'][0]
+        self.assertEqual(result['rectangle_ids'], sorted([self.first.id, self.second.id]))
+        self.assertEqual(result['bounds'], [1, 1, 2, 2])
+        self.assertAlmostEqual(result['area'] / 1e6, 12363, delta=5)
+
+    def test_create_rejects_overlap(self):
+        """Test creation can be refused when the rectangle overlaps a zone"""
+        data = {
+            'name': 'Overlapping',
+            'coordinates': box_polygon(1.5, 1.5, 5, 5),
+            'reject_overlaps': True
+        }
+        response = self.client.post('/api/rectangles/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('coordinates', response.data)
+        
+        data['reject_overlaps'] = False
+        response = self.client.post('/api/rectangles/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+class RectangleTileTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        
+        self.rectangle = Rectangle.objects.create(
+            user=self.user,
+            name='Manhattan',
+            coordinates={
+                'type': 'Polygon',
+                'coordinates': [[
+                    [-74.006, 40.7128],
+                    [-74.006, 40.7228],
+                    [-73.996, 40.7228],
+                    [-73.996, 40.7128],
+                    [-74.006, 40.7128]
+                ]]
+            }
+        )
+
+    def test_tile_contains_zone(self):
+        """Test a tile over the rectangle encodes it"""
+        response = self.client.get('/api/rectangles/tiles/12/1205/1539.mvt')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/vnd.mapbox-vector-tile')
+        self.assertIn(b'zones', response.content)
+        self.assertIn(b'Manhattan', response.content)
+
+    def test_tile_without_zones_is_empty(self):
+        """Test a tile away from every rectangle is empty"""
+        response = self.client.get('/api/rectangles/tiles/12/0/0.mvt')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, b'')
+
+    def test_tile_cache_invalidated_on_change(self):
+        """Test cached tiles are rebuilt after a rectangle changes"""
+        url = '/api/rectangles/tiles/12/1205/1539.mvt'
+        self.assertIn(b'Manhattan', self.client.get(url).content)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rectangle.name = 'Downtown'
+            self.rectangle.save()
+        
+        content = self.client.get(url).content
+        self.assertIn(b'Downtown', content)
+        self.assertNotIn(b'Manhattan', content)
+
+    def test_invalid_tile(self):
+        """Test tile coordinates outside the zoom level are rejected"""
+        response = self.client.get('/api/rectangles/tiles/2/4/0.mvt')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RectangleBulkTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        
+        self.existing = Rectangle.objects.create(
+            user=self.user,
+            name='Existing',
+            coordinates=box_polygon(0, 0, 1, 1)
+        )
+    
+    def test_bulk_create(self):
+        """Test creating many rectangles with per-item errors"""
+        data = [
+            {'name': 'Zone 1', 'coordinates': box_polygon(1, 1, 2, 2)},
+            {'name': 'Existing', 'coordinates': box_polygon(2, 2, 3, 3)},
+            {'name': 'Zone 1', 'coordinates': box_polygon(3, 3, 4, 4)},
+            {'name': 'Zone 2', 'coordinates': {'type': 'Point'}},
+            {'name': 'Zone 3', 'coordinates': box_polygon(4, 4, 5, 5)},
+        ]
+        response = self.client.post('/api/rectangles/bulk/', data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([item['name'] for item in response.data['created']], ['Zone 1', 'Zone 3'])
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2, 3])
+        
+        zone = Rectangle.objects.get(name='Zone 3')
+        self.assertEqual(zone.bounds, [4, 4, 5, 5])
+
+    def test_bulk_update(self):
+        """Test updating many rectangles at once"""
+        other = Rectangle.objects.create(
+            user=self.user,
+            name='Other',
+            coordinates=box_polygon(5, 5, 6, 6)
+        )
+        data = [
+            {'id': self.existing.id, 'name': 'Renamed', 'coordinates': box_polygon(7, 7, 8, 8)},
+            {'id': other.id, 'name': 'Renamed'},
+            {'id': 999999, 'name': 'Missing'},
+        ]
+        response = self.client.patch('/api/rectangles/bulk/', data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['updated']), 1)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2])
+        
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.name, 'Renamed')
+        self.assertEqual(self.existing.bounds, [7, 7, 8, 8])
+
+    def test_bulk_delete(self):
+        """Test deleting many rectangles at once"""
+        response = self.client.delete(
+            '/api/rectangles/bulk/', {'ids': [self.existing.id, 999999]}, format='json'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['deleted'], [self.existing.id])
+        self.assertEqual(response.data['errors'][0]['id'], 999999)
+        self.assertFalse(Rectangle.objects.exists())
+
+    def test_bulk_invalidates_spatial_index(self):
+        """Test bulk writes invalidate the cached spatial index"""
+        params = {'lng': 10.5, 'lat': 10.5}
+        self.assertEqual(self.client.get('/api/rectangles/contains/', params).data['count'], 0)
+        
+        data = [{'name': 'Zone', 'coordinates': box_polygon(10, 10, 11, 11)}]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/rectangles/bulk/', data, format='json')
+        self.assertEqual(self.client.get('/api/rectangles/contains/', params).data['count'], 1)
+
+
+class RectangleExportTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        
+        self.rectangle_data = {
+            'type': 'Polygon',
+            'coordinates': [[
+                [-74.006, 40.7128],
+                [-74.006, 40.7228],
+                [-73.996, 40.7228],
+                [-73.996, 40.7128],
+                [-74.006, 40.7128]
+            ]]
+        }
+        for i in range(3):
+            Rectangle.objects.create(
+                user=self.user,
+                name=f'Rectangle {i}',
+                coordinates=self.rectangle_data
+            )
+
+    def test_export_geojson(self):
+        """Test streaming the rectangles as a FeatureCollection"""
+        response = self.client.get('/api/rectangles/export/')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/geo+json')
+        collection = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(collection['type'], 'FeatureCollection')
+        self.assertEqual(len(collection['features']), 3)
+        self.assertEqual(collection['features'][0]['geometry'], self.rectangle_data)
+        self.assertEqual(collection['features'][0]['properties']['name'], 'Rectangle 0')
+
+    def test_export_ndjson(self):
+        """Test streaming the rectangles as newline-delimited features"""
+        response = self.client.get('/api/rectangles/export/', {'output': 'ndjson'})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(json.loads(lines[2])['properties']['name'], 'Rectangle 2')
+
+    def test_export_is_incremental(self):
+        """Test chunks are produced while rows are still being read"""
+        read = []
+        
+        def rows():
+            for row in export_rows(self.user.id):
+                read.append(row[0])
+                yield row
+        
+        with patch('rectangles.export.FEATURES_PER_CHUNK', 1):
+            chunks = iter_geojson(rows())
+            self.assertEqual(next(chunks), '{"type":"FeatureCollection","features":[')
+            next(chunks)
+            self.assertEqual(len(read), 1)
+            rest = list(chunks)
+        
+        self.assertEqual(len(read), 3)
+        self.assertEqual(rest[-1], ']}')
+
+    async def test_async_export_is_incremental(self):
+        """Test the async export yields encoded chunks while rows are still being read"""
+        read = []
+        
+        async def rows():
+            async for row in aexport_rows(self.user.id):
+                read.append(row[0])
+                yield row
+        
+        with patch('rectangles.export.FEATURES_PER_CHUNK', 1):
+            chunks = aiter_ndjson(rows())
+            first = await anext(chunks)
+            self.assertEqual(len(read), 1)
+            rest = [chunk async for chunk in chunks]
+        
+        self.assertEqual(len(read), 3)
+        lines = b''.join([first, *rest]).decode().splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], read)
+
+    async def test_export_streams_under_asgi(self):
+        """Test the export view's first chunk is sent before the last row is read"""
+        token = await Token.objects.acreate(user=self.user)
+        read = []
+        
+        async def rows(user_id):
+            async for row in aexport_rows(user_id):
+                read.append(row[0])
+                yield row
+        
+        with patch('rectangles.export.FEATURES_PER_CHUNK', 1), \
+                patch('rectangles.export.aexport_rows', rows):
+            response = await self.async_client.get(
+                '/api/rectangles/export/', headers={'Authorization': f'Token {token.key}'}
+            )
+            self.assertTrue(response.is_async)
+            chunks = aiter(response.streaming_content)
+            first = await anext(chunks)
+            second = await anext(chunks)
+            self.assertEqual(len(read), 1)
+            rest = [chunk async for chunk in chunks]
+        
+        self.assertEqual(len(read), 3)
+        collection = json.loads(b''.join([first, second, *rest]))
+        self.assertEqual([feature['id'] for feature in collection['features']], read)
+
+    def test_export_empty(self):
+        """Test exporting with no rectangles produces an empty collection"""
+        Rectangle.objects.all().delete()
+        response = self.client.get('/api/rectangles/export/')
+        
+        collection = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(collection['features'], [])
+
+
+class RectangleImportTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        
+        self.geometry = {
+            'type': 'Polygon',
+            'coordinates': [[
+                [-74.006, 40.7128],
+                [-74.006, 40.7228],
+                [-73.996, 40.7228],
+                [-73.996, 40.7128],
+                [-74.006, 40.7128]
+            ]]
+        }
+        self.features = [
+            {'type': 'Feature', 'properties': {'name': 'Zone 1'}, 'geometry': self.geometry},
+            {'type': 'Feature', 'properties': {'name': 'Zone 2'}, 'geometry': {'type': 'Point'}},
+            {'type': 'Point', 'coordinates': [0, 0]},
+            {'type': 'Feature', 'properties': {'name': 'Zone 1'}, 'geometry': self.geometry},
+            {'type': 'Feature', 'properties': {'name': 'Zone 3'}, 'geometry': self.geometry},
+        ]
+
+    def test_import_feature_collection(self):
+        """Test importing a FeatureCollection with per-feature errors"""
+        body = json.dumps({'type': 'FeatureCollection', 'features': self.features})
+        response = self.client.post(
+            '/api/rectangles/import/', body, content_type='application/geo+json'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2, 3])
+        self.assertEqual(
+            sorted(Rectangle.objects.values_list('name', flat=True)), ['Zone 1', 'Zone 3']
+        )
+
+    def test_import_ndjson(self):
+        """Test importing newline-delimited features"""
+        body = '\n'.join(json.dumps(feature) for feature in self.features) + '\n'
+        response = self.client.post(
+            '/api/rectangles/import/', body, content_type='application/x-ndjson'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+
+    def test_ndjson_lines_split_across_reads(self):
+        """Test NDJSON lines are decoded however the input is split, and long lines are refused"""
+        body = '\n'.join(json.dumps(feature, ensure_ascii=False) for feature in self.features)
+        body = ('\n\n' + body + '\n{"bad\n').encode('utf-8')
+        
+        for read_size in (1, 2, 5, 64, 65536):
+            parsed = list(iter_ndjson_features(io.BytesIO(body), read_size))
+            self.assertEqual(parsed, self.features + [None])
+        
+        with patch('rectangles.importer.MAX_VALUE_SIZE', 100):
+            features = iter_ndjson_features(io.BytesIO(b'{}\n' + b' ' * 1000 + b'{}\n'), 16)
+            self.assertEqual(next(features), {})
+            with self.assertRaises(ValueError):
+                next(features)
+
+    def test_import_truncated_document(self):
+        """Test features before a syntax error are still imported"""
+        body = json.dumps({'type': 'FeatureCollection', 'features': self.features})[:-1]
+        response = self.client.post(
+            '/api/rectangles/import/', body, content_type='application/geo+json'
+        )
+        
+        self.assertEqual(response.data['created'], 2)
+        self.assertIsNotNone(response.data['parse_error'])
+
+    def test_features_split_across_reads(self):
+        """Test features are decoded however the input is split into reads"""
+        features = self.features + [{
+            'type': 'Feature',
+            'properties': {'name': 'Quote " backslash \\ brackets ]}[{ é'},
+            'geometry': self.geometry,
+        }]
+        body = json.dumps({'type': 'FeatureCollection', 'features': features, 'count': 6})
+        
+        for read_size in (1, 2, 3, 7, 64):
+            parsed = list(iter_geojson_features(io.BytesIO(body.encode('utf-8')), read_size))
+            self.assertEqual(parsed, features)
+        
+        with self.assertRaises(ValueError):
+            list(iter_geojson_features(io.BytesIO(b'{"features": [{"type": "Feature"'), 4))
+
+    async def test_import_without_content_length(self):
+        """Test a chunked upload, which has no Content-Length, is read until EOF"""
+        token = await Token.objects.acreate(user=self.user)
+        body = json.dumps({'type': 'FeatureCollection', 'features': self.features})
+        # The test client's helpers always send a Content-Length
+        response = await self.async_client.request(
+            method='POST', path='/api/rectangles/import/', query_string='',
+            headers=[(b'authorization', f'Token {token.key}'.encode('ascii'))],
+            _body_file=FakePayload(body)
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()['created'], 2)
+
+    def test_import_command(self):
+        """Test the import_zones management command"""
+        body = json.dumps({'type': 'FeatureCollection', 'features': self.features})
+        with tempfile.NamedTemporaryFile('w', suffix='.geojson') as geojson_file:
+            geojson_file.write(body)
+            geojson_file.flush()
+            call_command(
+                'import_zones', geojson_file.name, user=self.user.email,
+                stdout=io.StringIO(), stderr=io.StringIO()
+            )
+        
+        self.assertEqual(Rectangle.objects.filter(user=self.user).count(), 2)
+
+
+class RectanglePaginationTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        
+        coordinates = {
+            'type': 'Polygon',
+            'coordinates': [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]]
+        }
+        Rectangle.objects.bulk_create([
+            Rectangle(user=self.user, name=f'Zone {i}', coordinates=coordinates)
+            for i in range(25)
+        ])
+        self.expected_ids = list(
+            Rectangle.objects.filter(user=self.user)
+            .order_by('-created_at', '-id')
+            .values_list('id', flat=True)
+        )
+
+    def test_keyset_pages_cover_every_rectangle_once(self):
+        """Test following next links returns every rectangle in order"""
+        ids = []
+        url = '/api/rectangles/?page_size=10'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        
+        self.assertEqual(ids, self.expected_ids)
+        
+        # Orderings mixing directions
+        ids = []
+        url = '/api/rectangles/?page_size=4&ordering=-name,created_at'
+        while url:
+            response = self.client.get(url)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(ids, list(
+            Rectangle.objects.order_by('-name', 'created_at', '-id').values_list('id', flat=True)
+        ))
+
+    def test_keyset_pages_with_equal_created_at(self):
+        """Test rectangles created at the same instant are ordered by id"""
+        Rectangle.objects.filter(user=self.user).update(created_at=timezone.now())
+        
+        ids = []
+        url = '/api/rectangles/?page_size=7'
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertFalse(any('OFFSET' in query['sql'] for query in queries))
+            ids.extend(item['id'] for item in response.data['results'])
+            last_page, url = response.data, response.data['next']
+        
+        self.assertEqual(ids, sorted(self.expected_ids, reverse=True))
+        
+        # And back again through the previous links
+        ids = [item['id'] for item in last_page['results']]
+        url = last_page['previous']
+        while url:
+            response = self.client.get(url)
+            ids[:0] = [item['id'] for item in response.data['results']]
+            url = response.data['previous']
+        self.assertEqual(ids, sorted(self.expected_ids, reverse=True))
+
+    def test_invalid_cursor(self):
+        """Test malformed cursors are rejected"""
+        for cursor in ('x', 'cD1ub3QtYS1kYXRlJnA9MQ==', 'cD0x'):
+            response = self.client.get('/api/rectangles/', {'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_async_and_sync_pages_match(self):
+        """Test the async keyset page reads the same rows and links as the sync one"""
+        queryset = Rectangle.objects.filter(user=self.user).values('id', 'created_at')
+        request = Request(RequestFactory().get('/api/rectangles/', {'page_size': 10}))
+        
+        paginator = KeysetPagination()
+        page = await paginator.apaginate_queryset(queryset, request)
+        sync_paginator = KeysetPagination()
+        sync_page = await sync_to_async(sync_paginator.paginate_queryset)(queryset, request)
+        
+        self.assertEqual([row['id'] for row in page], self.expected_ids[:10])
+        self.assertEqual(page, sync_page)
+        self.assertEqual(paginator.get_next_link(), sync_paginator.get_next_link())
+
+    def test_page_number_mode_is_opt_in(self):
+        """Test passing page switches to page-number pagination with a count"""
+        response = self.client.get('/api/rectangles/', {'page': 2})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(
+            [item['id'] for item in response.data['results']],
+            self.expected_ids[20:]
+        )
+
+
+class RectangleConditionalGetTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        
+        self.coordinates = {
+            'type': 'Polygon',
+            'coordinates': [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]]
+        }
+        self.rectangle = Rectangle.objects.create(
+            user=self.user, name='Zone', coordinates=self.coordinates
+        )
+
+    def test_list_not_modified(self):
+        """Test an unchanged list is answered with a 304 without loading rows"""
+        response = self.client.get('/api/rectangles/')
+        etag = response['ETag']
+        
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/rectangles/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_list_if_modified_since(self):
+        """Test If-Modified-Since alone can't get a 304 when there is an ETag"""
+        last_modified = self.client.get('/api/rectangles/')['Last-Modified']
+        
+        response = self.client.get('/api/rectangles/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Last-Modified'], last_modified)
+    
+    def test_if_modified_since_without_etag(self):
+        """Test If-Modified-Since is only answered once the change's second has passed"""
+        request = RequestFactory().get('/', HTTP_IF_MODIFIED_SINCE=http_date())
+        
+        # Another change could still happen within the same second
+        self.assertIsNone(not_modified(request, last_modified=timezone.now()))
+        self.assertNotIn('Last-Modified', set_validators(HttpResponse(), last_modified=timezone.now()))
+        
+        last_modified = timezone.now() - timedelta(seconds=2)
+        response = not_modified(request, last_modified=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['Last-Modified'], http_date(last_modified.timestamp()))
+
+    def test_etag_depends_on_query(self):
+        """Test different query strings get different ETags"""
+        first = self.client.get('/api/rectangles/')['ETag']
+        second = self.client.get('/api/rectangles/', {'bbox': '0,0,1,1'})['ETag']
+        
+        self.assertNotEqual(first, second)
+
+    def test_changes_invalidate_etag(self):
+        """Test saves, deletes and bulk writes change the list and stats ETags"""
+        urls = ['/api/rectangles/', '/api/rectangles/stats/']
+        
+        def etags():
+            return [self.client.get(url)['ETag'] for url in urls]
+        
+        before = etags()
+        self.rectangle.name = 'Renamed'
+        self.rectangle.save()
+        after_save = etags()
+        self.client.post('/api/rectangles/bulk/', [
+            {'name': 'Bulk', 'coordinates': self.coordinates}
+        ], format='json')
+        after_bulk = etags()
+        self.rectangle.delete()
+        after_delete = etags()
+        
+        for url_etags in zip(before, after_save, after_bulk, after_delete):
+            self.assertEqual(len(set(url_etags)), 4)
+        for url, etag in zip(urls, before):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_user_with_rectangles_can_be_deleted(self):
+        """Test deleting a user does not recreate their zone version"""
+        self.client.get('/api/rectangles/')
+        self.user.delete()
+        
+        self.assertFalse(Rectangle.objects.exists())
+        self.assertFalse(ZoneVersion.objects.exists())
+
+
+class RectangleDerivedGeometryTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        
+        self.small = Rectangle.objects.create(
+            user=self.user, name='Small', coordinates=box_polygon(0, 0, 1, 1)
+        )
+        self.large = Rectangle.objects.create(
+            user=self.user, name='Large', coordinates=box_polygon(10, 10, 14, 14)
+        )
+    
+    def test_center_and_area_stored_on_save(self):
+        """Test center and geodesic area columns are kept in sync on save"""
+        self.assertEqual(self.small.center_coordinates, [0.5, 0.5])
+        # One degree square at the equator is roughly 12,364 km²
+        self.assertAlmostEqual(self.small.area / 1e6, 12364, delta=10)
+        
+        self.small.coordinates = box_polygon(2, 2, 4, 4)
+        self.small.save(update_fields=['coordinates'])
+        self.small.refresh_from_db()
+        
+        self.assertEqual(self.small.center_coordinates, [3, 3])
+        self.assertEqual([self.small.center_lng, self.small.center_lat], [3, 3])
+
+    def test_bulk_create_stores_center_and_area(self):
+        """Test the bulk write path fills the derived columns"""
+        self.client.post('/api/rectangles/bulk/', [
+            {'name': 'Bulk', 'coordinates': box_polygon(20, 20, 22, 22)}
+        ], format='json')
+        rectangle = Rectangle.objects.get(name='Bulk')
+        
+        self.assertEqual(rectangle.center_coordinates, [21, 21])
+        self.assertGreater(rectangle.area, 0)
+
+    def test_order_by_area(self):
+        """Test the list can be sorted by area"""
+        response = self.client.get('/api/rectangles/', {'ordering': 'area'})
+        
+        self.assertEqual(
+            [item['name'] for item in response.data['results']], ['Small', 'Large']
+        )
+        self.assertEqual(response.data['results'][0]['area'], self.small.area)
+
+    def test_filter_by_area_and_center(self):
+        """Test the list can be filtered by area range and center bbox"""
+        min_area = self.client.get('/api/rectangles/', {'min_area': self.small.area * 2})
+        center = self.client.get('/api/rectangles/', {'center_bbox': '-1,-1,1,1'})
+        invalid = self.client.get('/api/rectangles/', {'max_area': 'big'})
+        
+        self.assertEqual([item['name'] for item in min_area.data['results']], ['Large'])
+        self.assertEqual([item['name'] for item in center.data['results']], ['Small'])
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RectanglePackingTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+        
+        self.polygon = {
+            'type': 'Polygon',
+            'coordinates': [
+                [[-74.006, 40.7128], [-74.006, 40.7228], [-73.996, 40.7228],
+                 [-73.996, 40.7128], [-74.006, 40.7128]],
+                [[-74.0, 40.715], [-74.0, 40.716], [-73.999, 40.716], [-74.0, 40.715]]
+            ]
+        }
+
+    def test_float64_round_trip_is_lossless(self):
+        """Test float64 packing restores the exact GeoJSON"""
+        self.assertEqual(unpack_polygon(pack_polygon(self.polygon)), self.polygon)
+
+    def test_integer_encodings(self):
+        """Test quantized encodings are within 1e-7 degrees and smaller"""
+        packed = {
+            encoding: pack_polygon(self.polygon, encoding)
+            for encoding in ('float64', 'int32', 'int32-delta')
+        }
+        
+        self.assertLess(len(packed['int32']), len(packed['float64']))
+        self.assertLess(len(packed['int32-delta']), len(packed['int32']))
+        for encoding in ('int32', 'int32-delta'):
+            decoded = unpack_polygon(packed[encoding])
+            expected = np.concatenate([np.array(ring) for ring in self.polygon['coordinates']])
+            actual = np.concatenate([np.array(ring) for ring in decoded['coordinates']])
+            self.assertEqual(len(decoded['coordinates'][1]), 4)
+            np.testing.assert_allclose(actual, expected, atol=1e-7)
+
+    def test_delta_encoding_of_long_rings(self):
+        """Test long delta encoded rings decode like the short ones"""
+        angles = np.linspace(0, 2 * np.pi, 500)
+        ring = np.column_stack([170 * np.cos(angles), 80 * np.sin(angles)]).round(7).tolist()
+        polygon = {'type': 'Polygon', 'coordinates': [ring + [ring[0]]]}
+        
+        decoded = unpack_polygon(pack_polygon(polygon, 'int32-delta'))
+        np.testing.assert_allclose(decoded['coordinates'][0], polygon['coordinates'][0], atol=1e-7)
+
+    def test_invalid_geometry_is_rejected(self):
+        """Test non-numeric positions can't be packed"""
+        with self.assertRaises(ValueError):
+            pack_polygon({'type': 'Polygon', 'coordinates': [[['a', 'b']]]})
+        with self.assertRaises(ValueError):
+            pack_polygon({'type': 'Polygon', 'coordinates': [[[200, 0]]]}, 'int32')
+
+    @override_settings(RECTANGLES_COORDINATE_ENCODING='int32-delta')
+    def test_model_stores_packed_geometry(self):
+        """Test the model packs on save and decodes GeoJSON lazily"""
+        rectangle = Rectangle.objects.create(
+            user=self.user, name='Packed', coordinates=self.polygon
+        )
+        loaded = Rectangle.objects.get(pk=rectangle.pk)
+        
+        self.assertIsNone(loaded._coordinates)
+        self.assertEqual(loaded.coordinates['coordinates'][0][0], [-74.006, 40.7128])
+        
+        loaded.coordinates = {
+            'type': 'Polygon',
+            'coordinates': [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]]
+        }
+        loaded.save(update_fields=['coordinates'])
+        loaded.refresh_from_db()
+        
+        self.assertEqual(loaded.coordinates['coordinates'][0][2], [1, 1])
+        self.assertEqual(loaded.bounds, [0, 0, 1, 1])
+
+
+class RectangleOutputOptionsTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        
+        # A square with extra, nearly collinear vertices along its edges
+        self.rectangle = Rectangle.objects.create(
+            user=self.user,
+            name='Detailed',
+            coordinates={
+                'type': 'Polygon',
+                'coordinates': [[
+                    [0.123456789, 0.123456789], [0.123456789, 0.5], [0.1235, 1],
+                    [0.5, 1.0000001], [1, 1], [1, 0], [0.123456789, 0.123456789]
+                ]]
+            }
+        )
+
+    def test_douglas_peucker(self):
+        """Test points within the tolerance are dropped"""
+        line = np.array([[0, 0], [1, 0.01], [2, 0], [3, 1]])
+        
+        self.assertEqual(douglas_peucker(line, 0.1).tolist(), [[0, 0], [2, 0], [3, 1]])
+        self.assertEqual(len(douglas_peucker(line, 0.001)), 4)
+
+    def test_list_precision(self):
+        """Test ?precision= rounds list coordinates"""
+        response = self.client.get('/api/rectangles/', {'precision': 2})
+        ring = response.data['results'][0]['coordinates']['coordinates'][0]
+        
+        self.assertEqual(ring[0], [0.12, 0.12])
+
+    def test_detail_simplify(self):
+        """Test ?simplify= drops vertices but keeps a valid closed ring"""
+        url = f'/api/rectangles/{self.rectangle.id}/'
+        full = self.client.get(url).data['coordinates']['coordinates'][0]
+        simplified = self.client.get(url, {'simplify': 0.01}).data['coordinates']['coordinates'][0]
+        
+        self.assertEqual(len(full), 7)
+        self.assertEqual(len(simplified), 5)
+        self.assertEqual(simplified[0], simplified[-1])
+
+    def test_simplified_cache_follows_updates(self):
+        """Test cached simplified geometry is not served after an edit"""
+        url = f'/api/rectangles/{self.rectangle.id}/'
+        self.client.get(url, {'simplify': 0.01})
+        
+        self.rectangle.coordinates = {
+            'type': 'Polygon',
+            'coordinates': [[[5, 5], [5, 6], [6, 6], [6, 5], [5, 5]]]
+        }
+        self.rectangle.save()
+        ring = self.client.get(url, {'simplify': 0.01}).data['coordinates']['coordinates'][0]
+        
+        self.assertEqual(ring[0], [5, 5])
+
+    def test_list_batches_simplified_cache_reads(self):
+        """Test a listed page reads its simplified shapes in one round trip"""
+        for index in range(3):
+            Rectangle.objects.create(
+                user=self.user, name=f'Zone {index}', coordinates=box_polygon(index, 0, index + 1, 1)
+            )
+        
+        with patch('rectangles.simplify.cache.get_many', wraps=cache.get_many) as get_many:
+            response = self.client.get('/api/rectangles/', {'simplify': 0.01, 'ordering': 'created_at'})
+        
+        self.assertEqual(get_many.call_count, 1)
+        self.assertEqual(len(get_many.call_args.args[0]), 4)
+        results = response.data['results']
+        self.assertEqual(len(results[0]['coordinates']['coordinates'][0]), 5)
+        self.assertEqual(results[1]['coordinates']['coordinates'][0][0], [0, 0])
+
+    def test_export_precision_and_simplify(self):
+        """Test export applies the same output options"""
+        response = self.client.get(
+            '/api/rectangles/export/', {'output': 'ndjson', 'precision': 1, 'simplify': 0.01}
+        )
+        feature = json.loads(b''.join(response.streaming_content))
+        
+        self.assertEqual(len(feature['geometry']['coordinates'][0]), 5)
+        self.assertEqual(feature['geometry']['coordinates'][0][0], [0.1, 0.1])
+
+    def test_invalid_options(self):
+        """Test invalid precision and tolerance values are rejected"""
+        precision = self.client.get('/api/rectangles/', {'precision': 20})
+        tolerance = self.client.get('/api/rectangles/', {'simplify': '-1'})
+        
+        self.assertEqual(precision.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('precision', precision.data)
+        self.assertEqual(tolerance.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('simplify', tolerance.data)
+
+
+class RectangleSparseFieldsetTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        
+        self.rectangle = Rectangle.objects.create(
+            user=self.user,
+            name='Zone',
+            coordinates={
+                'type': 'Polygon',
+                'coordinates': [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]]
+            }
+        )
+
+    def test_fields_selects_response_and_columns(self):
+        """Test ?fields= limits the response and skips unused columns"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/rectangles/', {'fields': 'id,name,created_at'})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(response.data['results'][0]), {'id', 'name', 'created_at'}
+        )
+        select = [query['sql'] for query in queries if 'rectangles_rectangle' in query['sql']][-1]
+        self.assertNotIn('geometry', select)
+        self.assertNotIn('center_lng', select)
+
+    def test_omit(self):
+        """Test ?omit= removes fields from the response"""
+        response = self.client.get('/api/rectangles/', {'omit': 'coordinates,area'})
+        item = response.data['results'][0]
+        
+        self.assertNotIn('coordinates', item)
+        self.assertNotIn('area', item)
+        self.assertEqual(item['center_coordinates'], [0.5, 0.5])
+
+    def test_unknown_field(self):
+        """Test unknown field names are rejected"""
+        response = self.client.get('/api/rectangles/', {'fields': 'id,secret'})
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('fields', response.data)
+
+    def test_api_key_fields(self):
+        """Test API key listings support sparse fieldsets"""
+        self.client.post('/api/auth/api-keys/', {'name': 'Key'}, format='json')
+        response = self.client.get('/api/auth/api-keys/', {'fields': 'id,name'})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name'})
+
+
+class RectangleFastPathTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+        
+        for index in range(3):
+            Rectangle.objects.create(
+                user=self.user,
+                name=f'Zone {index}',
+                coordinates={
+                    'type': 'Polygon',
+                    'coordinates': [[
+                        [index, 0.123456], [index, 1], [index + 1, 1],
+                        [index + 1, 0.123456], [index, 0.123456]
+                    ]]
+                }
+            )
+
+    def test_matches_rectangle_serializer(self):
+        """Test the fast path gives exactly the RectangleSerializer output"""
+        queryset = Rectangle.objects.filter(user=self.user)
+        expected = json.loads(json.dumps(RectangleSerializer(queryset, many=True).data))
+        
+        self.assertEqual(serialize_rectangles(rectangle_values(queryset)), expected)
+
+    def test_matches_with_options_and_fields(self):
+        """Test output options and sparse fieldsets match the serializer"""
+        queryset = Rectangle.objects.filter(user=self.user)
+        options = OutputOptions(precision=2, tolerance=0.01)
+        selected = {'id', 'coordinates', 'updated_at'}
+        context = {'geometry_options': options, 'selected_fields': selected}
+        expected = json.loads(json.dumps(
+            RectangleSerializer(queryset, many=True, context=context).data
+        ))
+        
+        self.assertEqual(
+            serialize_rectangles(rectangle_values(queryset, selected), options, selected),
+            expected
+        )
+
+    def test_benchmark_command(self):
+        """Test the list benchmark runs and leaves no rows behind"""
+        out = io.StringIO()
+        call_command('benchmark_list', rows=20, repeat=1, stdout=out)
+        
+        self.assertIn('Speedup', out.getvalue())
+        self.assertEqual(Rectangle.objects.count(), 3)
+
+
+class RectangleJSONTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        
+        self.data = {
+            'name': 'Zone\u2028\u00c4',
+            'created_at': timezone.now(),
+            'area': Decimal('12.5'),
+            'label': gettext_lazy('Zone'),
+            'coordinates': np.array([[1.5, 2.25], [3.0, 4.0]]),
+            'bounds': (1, 2, 3, 4),
+        }
+
+    def test_renderer_matches_json_renderer(self):
+        """Test the fast renderer gives the same bytes as JSONRenderer"""
+        self.assertEqual(
+            FastJSONRenderer().render(self.data), JSONRenderer().render(self.data)
+        )
+
+    def test_renderer_fallbacks(self):
+        """Test indented output and missing orjson use JSONRenderer"""
+        indented = FastJSONRenderer().render(self.data, 'application/json; indent=2')
+        self.assertEqual(indented, JSONRenderer().render(self.data, 'application/json; indent=2'))
+        
+        with patch('drawnzones.renderers.orjson', None):
+            self.assertEqual(
+                FastJSONRenderer().render(self.data), JSONRenderer().render(self.data)
+            )
+
+    def test_renderer_rejects_non_finite_floats(self):
+        """Test NaN and infinity fail like with JSONRenderer, while None renders"""
+        page = {'previous': None, 'results': [{'area': None, 'name': 'null'}]}
+        expected = JSONRenderer().render(page)
+        with patch.object(JSONRenderer, 'render', side_effect=AssertionError("Rendered twice")):
+            self.assertEqual(FastJSONRenderer().render(page), expected)
+        
+        for value in (float('nan'), float('inf'), np.array([1.0, np.nan]), np.float32('-inf')):
+            with self.assertRaises(ValueError):
+                JSONRenderer().render({'previous': None, 'results': [{'area': value}]})
+            with self.assertRaises(ValueError):
+                FastJSONRenderer().render({'previous': None, 'results': [{'area': value}]})
+
+    def test_parser(self):
+        """Test the fast parser decodes bodies and rejects invalid JSON"""
+        body = json.dumps({'coordinates': [[[i * 0.5, i * 0.25] for i in range(1000)]]})
+        parsed = FastJSONParser().parse(io.BytesIO(body.encode()))
+        self.assertEqual(parsed, json.loads(body))
+        
+        with patch('drawnzones.parsers.orjson', None):
+            self.assertEqual(FastJSONParser().parse(io.BytesIO(body.encode())), parsed)
+        
+        for invalid in (b'{"a": ', b'{"a": NaN}'):
+            with self.assertRaises(ParseError):
+                FastJSONParser().parse(io.BytesIO(invalid))
+
+    def test_api_round_trip(self):
+        """Test rectangles are created from and listed as fast JSON"""
+        coordinates = {
+            'type': 'Polygon',
+            'coordinates': [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]]
+        }
+        response = self.client.post(
+            '/api/rectangles/',
+            json.dumps({'name': 'Zone', 'coordinates': coordinates}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        
+        response = self.client.get('/api/rectangles/')
+        self.assertEqual(response.json()['results'][0]['coordinates'], coordinates)
+        
+        response = self.client.post(
+            '/api/rectangles/', '{"name": ', content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_benchmark_command(self):
+        """Test the JSON benchmark reports encode and decode throughput"""
+        out = io.StringIO()
+        call_command('benchmark_json', rows=20, repeat=1, stdout=out)
+        
+        self.assertIn('encode speedup', out.getvalue())
+        self.assertIn('decode speedup', out.getvalue())
+
+
+class RectangleStatsTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def assert_matches_rebuild(self):
+        stats = ZoneStats.objects.get(user=self.user)
+        rebuilt = ZoneStats.rebuild(self.user.id)
+        
+        self.assertEqual(stats.count, rebuilt.count)
+        self.assertAlmostEqual(stats.total_area, rebuilt.total_area, delta=1e-3)
+        self.assertEqual(stats.bounds, rebuilt.bounds)
+        self.assertEqual(stats.created_per_day, rebuilt.created_per_day)
+        self.assertEqual(stats.created_per_month, rebuilt.created_per_month)
+
+    def test_stats_follow_changes(self):
+        """Test creates, updates and deletes keep the stats incrementally"""
+        first = Rectangle.objects.create(
+            user=self.user, name='First', coordinates=box_polygon(0, 0, 1, 1)
+        )
+        second = Rectangle.objects.create(
+            user=self.user, name='Second', coordinates=box_polygon(10, 10, 11, 11)
+        )
+        stats = ZoneStats.objects.get(user=self.user)
+        self.assertEqual(stats.count, 2)
+        self.assertEqual(stats.bounds, [0, 0, 11, 11])
+        self.assertAlmostEqual(stats.total_area, first.area + second.area)
+        
+        self.client.patch(f'/api/rectangles/{second.id}/', {
+            'coordinates': box_polygon(5, 5, 7, 7)
+        }, format='json')
+        self.assertEqual(ZoneStats.objects.get(user=self.user).bounds, [0, 0, 7, 7])
+        self.assert_matches_rebuild()
+        
+        self.client.post('/api/rectangles/bulk/', [
+            {'name': f'Bulk {index}', 'coordinates': box_polygon(-index, -index, 1 - index, 1 - index)}
+            for index in range(3)
+        ], format='json')
+        self.assert_matches_rebuild()
+        
+        first.delete()
+        self.client.delete('/api/rectangles/bulk/', {'ids': [second.id]}, format='json')
+        self.assertEqual(ZoneStats.objects.get(user=self.user).bounds, [-2, -2, 1, 1])
+        self.assert_matches_rebuild()
+
+    def test_stats_endpoint(self):
+        """Test the stats endpoint reads one row and returns the histograms"""
+        for index in range(3):
+            Rectangle.objects.create(
+                user=self.user, name=f'Zone {index}', coordinates=box_polygon(index, 0, index + 1, 1)
+            )
+        today = timezone.localdate().isoformat()
+        
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/rectangles/stats/', {'days': 7})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_rectangles'], 3)
+        self.assertEqual(response.data['recent_rectangles'], 3)
+        self.assertEqual(response.data['bounds'], [0, 0, 3, 1])
+        self.assertEqual(len(response.data['created_per_day']), 7)
+        self.assertEqual(response.data['created_per_day'][-1], {'date': today, 'count': 3})
+        self.assertEqual(response.data['created_per_month'], [{'month': today[:7], 'count': 3}])
+        
+        response = self.client.get('/api/rectangles/stats/', {'days': 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_stats_last_modified_includes_date(self):
+        """Test the stats' Last-Modified moves to the start of a new day like the ETag"""
+        Rectangle.objects.create(
+            user=self.user, name='Zone', coordinates=box_polygon(0, 0, 1, 1)
+        )
+        ZoneVersion.objects.filter(user=self.user).update(
+            modified_at=timezone.now() - timedelta(days=3)
+        )
+        start_of_today = timezone.make_aware(
+            datetime.combine(timezone.localdate(), time.min), timezone.get_default_timezone()
+        )
+        
+        response = self.client.get('/api/rectangles/stats/')
+        self.assertEqual(response['Last-Modified'], http_date(start_of_today.timestamp()))
+
+    def test_stats_built_on_first_read(self):
+        """Test stats are built for users whose stats row doesn't exist yet"""
+        Rectangle.objects.create(
+            user=self.user, name='Zone', coordinates=box_polygon(0, 0, 1, 1)
+        )
+        ZoneStats.objects.all().delete()
+        
+        response = self.client.get('/api/rectangles/stats/')
+        
+        self.assertEqual(response.data['total_rectangles'], 1)
+        self.assertTrue(ZoneStats.objects.filter(user=self.user).exists())
+
+
+class RectangleNameTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        
+        self.coordinates = {
+            'type': 'Polygon',
+            'coordinates': [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]]
+        }
+        self.taken = Rectangle.objects.create(
+            user=self.user, name='Taken', coordinates=self.coordinates
+        )
+
+    def test_duplicate_name_on_create(self):
+        """Test creating a rectangle with a used name is a validation error"""
+        response = self.client.post('/api/rectangles/', {
+            'name': ' Taken ', 'coordinates': self.coordinates
+        }, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['name'], ["You already have a rectangle with this name"])
+        self.assertEqual(Rectangle.objects.count(), 1)
+
+    def test_duplicate_name_on_update(self):
+        """Test renaming a rectangle to a used name is a validation error"""
+        other = Rectangle.objects.create(
+            user=self.user, name='Other', coordinates=self.coordinates
+        )
+        
+        response = self.client.patch(f'/api/rectangles/{other.id}/', {'name': 'Taken'}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('name', response.data)
+        other.refresh_from_db()
+        self.assertEqual(other.name, 'Other')
+
+    def test_same_name_for_other_users(self):
+        """Test names only have to be unique per user"""
+        other_user = User.objects.create_user(
+            email='other@example.com', username='otheruser', password='testpass123'
+        )
+        
+        Rectangle.objects.create(user=other_user, name='Taken', coordinates=self.coordinates)
+        
+        self.assertEqual(Rectangle.objects.filter(name='Taken').count(), 2)
+
+    def test_bulk_create_retries_concurrent_conflicts(self):
+        """Test a name taken after the batch was checked is reported, not raised"""
+        with patch('rectangles.bulk._conflicting_names', side_effect=[set(), {'Taken'}]):
+            response = self.client.post('/api/rectangles/bulk/', [
+                {'name': 'Taken', 'coordinates': self.coordinates},
+                {'name': 'Fresh', 'coordinates': self.coordinates},
+            ], format='json')
+        
+        self.assertEqual([item['name'] for item in response.data['created']], ['Fresh'])
+        self.assertEqual(response.data['errors'][0]['index'], 0)
+
+    def test_search(self):
+        """Test ?search= matches names case-insensitively"""
+        for name in ('North Field', 'south field', 'Harbor'):
+            Rectangle.objects.create(user=self.user, name=name, coordinates=self.coordinates)
+        
+        response = self.client.get('/api/rectangles/', {'search': 'FIELD', 'ordering': 'name'})
+        
+        self.assertEqual(
+            [item['name'] for item in response.data['results']], ['North Field', 'south field']
+        )
+
+
+class RectangleGeofenceTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        
+        self.zone = Rectangle.objects.create(user=self.user, name='Depot', coordinates={
+            'type': 'Polygon',
+            'coordinates': [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]]
+        })
+
+    def test_engine_transitions(self):
+        """Test the engine emits enter and exit events with dwell times"""
+        grid = ZoneGrid([1, 2], [[0, 0, 2, 2], [1, 1, 3, 3]])
+        engine = GeofenceEngine(grid)
+        
+        events = engine.process([
+            ('truck', -1, -1, 0),
+            ('truck', 0.5, 0.5, 10),
+            ('truck', 1.5, 1.5, 20),
+            ('truck', 1.6, 1.6, 25),
+            ('truck', 2.5, 2.5, 40),
+            ('truck', 9, 9, 30),
+        ])
+        
+        self.assertEqual(events, [
+            GeofenceEvent('truck', 1, 'enter', 10, None),
+            GeofenceEvent('truck', 2, 'enter', 20, None),
+            GeofenceEvent('truck', 1, 'exit', 40, 30),
+        ])
+        self.assertEqual(engine.skipped, 1)
+        self.assertEqual(engine.states['truck'], [40, {2: 20}])
+
+    def test_endpoint_keeps_device_state(self):
+        """Test device state carries over between batches"""
+        response = self.client.post('/api/rectangles/geofence/', {'updates': [
+            ['van', 0.5, 0.5, 100],
+            {'device_id': 7, 'lng': 5, 'lat': 5, 'timestamp': 100},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['events'], [{
+            'device_id': 'van', 'zone_id': self.zone.id, 'event': 'enter',
+            'timestamp': 100, 'dwell': None
+        }])
+        
+        response = self.client.post('/api/rectangles/geofence/', {'updates': [
+            ['van', 0.6, 0.6, 160],
+            ['van', 5, 5, 190],
+        ]}, format='json')
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['events'][0]['event'], 'exit')
+        self.assertEqual(response.data['events'][0]['dwell'], 90)
+
+    def test_device_state_is_locked(self):
+        """Test a batch waits for other batches of its devices and keys state by hash"""
+        lock = _lock_key(self.user.id, _device_hash('van'))
+        cache.add(lock, 'other batch')
+        
+        with override_settings(RECTANGLES_GEOFENCE_LOCK_TIMEOUT=0):
+            response = self.client.post('/api/rectangles/geofence/', {'updates': [
+                ['van', 0.5, 0.5, 100],
+            ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIsNone(cache.get(_state_key(self.user.id, _device_hash('van'))))
+        
+        cache.delete(lock)
+        response = self.client.post('/api/rectangles/geofence/', {'updates': [
+            ['van', 0.5, 0.5, 100],
+        ]}, format='json')
+        self.assertEqual(response.data['count'], 1)
+        self.assertIsNone(cache.get(lock))
+        self.assertEqual(
+            cache.get(_state_key(self.user.id, _device_hash('van'))), [100, {self.zone.id: 100}]
+        )
+
+    def test_invalid_updates(self):
+        """Test malformed updates are rejected"""
+        for updates in ([['van', 0.5, 0.5]], [['van', 'x', 0.5, 1]], [[None, 0, 0, 1]], {}):
+            response = self.client.post(
+                '/api/rectangles/geofence/', {'updates': updates}, format='json'
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RectangleNearestTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_matches_brute_force(self):
+        """Test best-first search finds the same neighbours as a full scan"""
+        rng = np.random.default_rng(7)
+        mins = rng.uniform([-20, -20], [20, 20], size=(500, 2))
+        boxes = np.hstack([mins, mins + rng.uniform(0.01, 1, size=(500, 2))])
+        tree = STRTree((index, *box) for index, box in enumerate(boxes.tolist()))
+        calls = []
+        
+        def distance(*args):
+            calls.append(args)
+            return point_bbox_distance(*args)
+        
+        for lng, lat in rng.uniform(-25, 25, size=(20, 2)).tolist():
+            expected = sorted(
+                (point_bbox_distance(lng, lat, *box), index)
+                for index, box in enumerate(boxes.tolist())
+            )[:5]
+            calls.clear()
+            result = tree.nearest(lng, lat, 5, distance)
+            
+            self.assertEqual([item_id for item_id, _ in result], [index for _, index in expected])
+            self.assertLess(len(calls), len(boxes))
+
+    def test_max_distance(self):
+        """Test rectangles beyond max_distance are left out"""
+        tree = STRTree([(1, 0, 0, 1, 1), (2, 10, 0, 11, 1)])
+        
+        result = tree.nearest(2, 0.5, 5, point_bbox_distance, max_distance=200000)
+        
+        self.assertEqual([item_id for item_id, _ in result], [1])
+        self.assertAlmostEqual(result[0][1], 111195, delta=100)
+
+    def test_endpoint(self):
+        """Test the endpoint returns the closest rectangles with distances"""
+        ids = []
+        with self.captureOnCommitCallbacks(execute=True):
+            for index in range(4):
+                lng = index * 2
+                ids.append(Rectangle.objects.create(user=self.user, name=f'Zone {index}', coordinates={
+                    'type': 'Polygon',
+                    'coordinates': [[[lng, 0], [lng, 1], [lng + 1, 1], [lng + 1, 0], [lng, 0]]]
+                }).id)
+        
+        response = self.client.get('/api/rectangles/nearest/', {'lng': 0.5, 'lat': 0.5, 'k': 2})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in response.data['results']], ids[:2])
+        self.assertEqual(response.data['results'][0]['distance'], 0)
+        self.assertGreater(response.data['results'][1]['distance'], 100000)
+        self.assertIn('coordinates', response.data['results'][0])
+        
+        for params in ({'lng': 0, 'lat': 0, 'k': 0}, {'lng': 0, 'lat': 0, 'max_distance': -1}, {'lng': 0}):
+            response = self.client.get('/api/rectangles/nearest/', params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RectangleClusterTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def create_zone(self, name, lng, lat, size=0.01):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Rectangle.objects.create(
+                user=self.user, name=name, coordinates=box_polygon(lng, lat, lng + size, lat + size)
+            )
+
+    def test_incremental_updates_match_rebuild(self):
+        """Test adding and removing zones gives the same pyramid as a rebuild"""
+        rng = np.random.default_rng(3)
+        centers = rng.uniform([-10, 40], [10, 60], size=(300, 2)).tolist()
+        zones = [(index, lng, lat, lng - 0.1, lat - 0.1, lng + 0.1, lat + 0.1)
+                 for index, (lng, lat) in enumerate(centers)]
+        index = ClusterIndex(zones[:200])
+        for zone in zones[200:]:
+            index.add(zone)
+        for zone in zones[:100]:
+            index.remove(zone[0])
+        
+        rebuilt = ClusterIndex(zones[100:])
+        for level, expected in zip(index.levels, rebuilt.levels):
+            self.assertEqual(level.keys(), expected.keys())
+            for key, cell in level.items():
+                self.assertEqual(cell[0], expected[key][0])
+                np.testing.assert_allclose(cell[1:], expected[key][1:])
+
+    def test_endpoint(self):
+        """Test nearby zones are clustered at low zoom and apart at high zoom"""
+        first = self.create_zone('A', 13.40, 52.50)
+        self.create_zone('B', 13.41, 52.51)
+        self.create_zone('C', -74.00, 40.71)
+        
+        response = self.client.get('/api/rectangles/clusters/', {'zoom': 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([cluster['count'] for cluster in response.data['clusters']], [2, 1])
+        berlin = response.data['clusters'][0]
+        self.assertAlmostEqual(berlin['center'][0], 13.41)
+        np.testing.assert_allclose(berlin['bounds'], [13.40, 52.50, 13.42, 52.52])
+        self.assertNotIn('zone_id', berlin)
+        
+        response = self.client.get('/api/rectangles/clusters/', {
+            'zoom': 16, 'bbox': '13,52,14,53'
+        })
+        self.assertEqual(response.data['count'], 2)
+        self.assertIn(first.id, [cluster['zone_id'] for cluster in response.data['clusters']])
+        
+        response = self.client.get('/api/rectangles/clusters/', {'zoom': 'far'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cached_pyramid_follows_changes(self):
+        """Test the cached pyramid is updated in place when zones change"""
+        zone = self.create_zone('A', 13.40, 52.50)
+        self.client.get('/api/rectangles/clusters/', {'zoom': 3})
+        cached = get_user_clusters(self.user.id)
+        
+        self.create_zone('B', 13.41, 52.51)
+        with self.captureOnCommitCallbacks(execute=True):
+            zone.delete()
+        
+        self.assertIs(get_user_clusters(self.user.id), cached)
+        self.assertEqual(len(cached), 1)
+        response = self.client.get('/api/rectangles/clusters/', {'zoom': 3})
+        self.assertEqual(response.data['clusters'][0]['count'], 1)
+
+    def test_rolled_back_changes_leave_pyramid(self):
+        """Test zones of a rolled back write never reach the cached pyramid"""
+        self.create_zone('A', 13.40, 52.50)
+        cached = get_user_clusters(self.user.id)
+        
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    Rectangle.objects.create(user=self.user, name='B', coordinates={
+                        'type': 'Polygon',
+                        'coordinates': [[[13.41, 52.51], [13.41, 52.52], [13.42, 52.52], [13.42, 52.51], [13.41, 52.51]]]
+                    })
+                    raise RuntimeError
+        
+        self.assertEqual(callbacks, [])
+        self.assertIs(get_user_clusters(self.user.id), cached)
+        self.assertEqual(len(cached), 1)
+
+
+class RectangleChangesTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        
+        self.coordinates = {
+            'type': 'Polygon',
+            'coordinates': [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]]
+        }
+
+    def changes(self, since):
+        return self.client.get('/api/rectangles/changes/', {'since': since}).data
+
+    def test_changes_and_tombstones(self):
+        """Test changes are compacted per rectangle with tombstones for deletes"""
+        kept = Rectangle.objects.create(user=self.user, name='Kept', coordinates=self.coordinates)
+        removed = Rectangle.objects.create(user=self.user, name='Removed', coordinates=self.coordinates)
+        synced = self.changes(0)
+        self.assertEqual([item['id'] for item in synced['changed']], [kept.id, removed.id])
+        self.assertEqual(synced['seq'], 2)
+        
+        kept.name = 'Renamed'
+        kept.save()
+        removed_id = removed.id
+        removed.delete()
+        transient = Rectangle.objects.create(user=self.user, name='Transient', coordinates=self.coordinates)
+        transient.delete()
+        
+        data = self.changes(synced['seq'])
+        self.assertFalse(data['resync'])
+        self.assertFalse(data['has_more'])
+        self.assertEqual(data['seq'], 6)
+        self.assertEqual([item['name'] for item in data['changed']], ['Renamed'])
+        self.assertEqual(data['deleted'], [removed_id])
+        self.assertEqual(self.changes(6)['changed'], [])
+
+    def test_pages_keep_batches_whole(self):
+        """Test large change sets are paged without splitting a batch"""
+        self.client.post('/api/rectangles/bulk/', [
+            {'name': f'Bulk {index}', 'coordinates': self.coordinates} for index in range(3)
+        ], format='json')
+        Rectangle.objects.create(user=self.user, name='Single', coordinates=self.coordinates)
+        
+        with override_settings(RECTANGLES_CHANGES_PAGE_SIZE=2):
+            first = self.changes(0)
+            second = self.changes(first['seq'])
+        
+        self.assertEqual((first['seq'], first['has_more'], len(first['changed'])), (1, True, 3))
+        self.assertEqual((second['seq'], second['has_more'], len(second['changed'])), (2, False, 1))
+
+    def test_resync(self):
+        """Test clients are told to resync when the log was pruned"""
+        Rectangle.objects.create(user=self.user, name='Zone', coordinates=self.coordinates)
+        call_command('prune_zone_changes', days=0, stdout=io.StringIO())
+        
+        data = self.changes(0)
+        
+        self.assertTrue(data['resync'])
+        self.assertEqual(data['seq'], 1)
+        
+        for since in (5, -1, 'x'):
+            response = self.client.get('/api/rectangles/changes/', {'since': since})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unlogged_writes_are_rolled_back(self):
+        """Test a change is not kept when writing its log entry fails"""
+        kept = Rectangle.objects.create(user=self.user, name='Kept', coordinates=self.coordinates)
+        
+        with patch('rectangles.models.ZoneChange.record', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.post(
+                    '/api/rectangles/', {'name': 'Zone', 'coordinates': self.coordinates}, format='json'
+                )
+            with self.assertRaises(RuntimeError):
+                self.client.patch(f'/api/rectangles/{kept.id}/', {'name': 'Renamed'}, format='json')
+            with self.assertRaises(RuntimeError):
+                self.client.delete(f'/api/rectangles/{kept.id}/')
+        
+        self.assertEqual(list(Rectangle.objects.values_list('name', flat=True)), ['Kept'])
+        self.assertEqual(self.changes(0)['seq'], 1)
+
+
+class RectangleEventsTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+        
+        self.coordinates = {
+            'type': 'Polygon',
+            'coordinates': [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]]
+        }
+
+    def create(self, name):
+        return Rectangle.objects.create(user=self.user, name=name, coordinates=self.coordinates)
+
+    def parse(self, chunk):
+        fields = dict(line.split(': ', 1) for line in chunk.decode().splitlines() if line)
+        return fields['event'], int(fields['id']), json.loads(fields['data'])
+
+    async def test_stream_catches_up_then_follows_changes(self):
+        """Test a stream resumes after its last event id and follows new changes"""
+        await sync_to_async(self.create)('First')
+        broker = ZoneEventBroker(asyncio.get_running_loop(), poll_interval=0.01)
+        stream = stream_events(self.user.id, since=0, broker=broker, keepalive=5)
+        
+        self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+        self.assertEqual(self.parse(await anext(stream))[:2], ('ready', 0))
+        event, seq, data = self.parse(await anext(stream))
+        self.assertEqual((event, seq), ('changes', 1))
+        self.assertEqual([item['name'] for item in data['changed']], ['First'])
+        
+        second = await sync_to_async(self.create)('Second')
+        event, seq, data = self.parse(await asyncio.wait_for(anext(stream), 5))
+        self.assertEqual((event, seq, data['deleted']), ('changes', 2, []))
+        self.assertEqual([item['id'] for item in data['changed']], [second.id])
+        
+        await stream.aclose()
+        self.assertEqual(broker.subscribers, {})
+
+    async def test_changes_are_read_once_for_all_connections(self):
+        """Test a poll fans the same rendered events out to every connection"""
+        broker = ZoneEventBroker(asyncio.get_running_loop(), poll_interval=60, max_pending=1)
+        first = await broker.subscribe(self.user.id)
+        second = await broker.subscribe(self.user.id)
+        await sync_to_async(self.create)('Zone')
+        
+        await broker.poll()
+        
+        frame = first.queue.get_nowait()
+        self.assertIs(second.queue.get_nowait(), frame)
+        self.assertEqual((frame.from_seq, frame.seq), (0, 1))
+        self.assertEqual(broker.versions[self.user.id], 1)
+        
+        # Connections that fall behind are flagged to read what they missed
+        for name in ('Other', 'Another'):
+            await sync_to_async(self.create)(name)
+            await broker.poll()
+        self.assertTrue(first.overflowed)
+        self.assertEqual(first.queue.get_nowait().seq, 2)
+        
+        broker.unsubscribe(first)
+        broker.unsubscribe(second)
+        self.assertEqual(broker.versions, {})
+
+    def test_authentication_and_since(self):
+        """Test the stream needs credentials and a sequence number it can resume from"""
+        self.create('Zone')
+        response = self.client.get('/api/rectangles/events/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        for since in ('2', '-1', 'x'):
+            response = self.client.get('/api/rectangles/events/', HTTP_LAST_EVENT_ID=since)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        response = self.client.get('/api/rectangles/events/', {'since': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertTrue(response.is_async)
+
+
+class RectangleAsyncViewTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+        self.token = Token.objects.create(user=self.user)
+        
+        self.coordinates = {
+            'type': 'Polygon',
+            'coordinates': [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]]
+        }
+
+    async def test_reads_async_and_writes_through_sync_views(self):
+        """Test list and detail reads and the writes handed to the DRF views"""
+        headers = {'Authorization': f'Token {self.token.key}'}
+        response = await self.async_client.post(
+            '/api/rectangles/', {'name': 'Zone', 'coordinates': self.coordinates},
+            content_type='application/json', headers=headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        rectangle_id = response.json()['id']
+        
+        response = await self.async_client.get('/api/rectangles/', {'fields': 'id,name'}, headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['results'], [{'id': rectangle_id, 'name': 'Zone'}])
+        
+        response = await self.async_client.get(f'/api/rectangles/{rectangle_id}/', headers=headers)
+        rectangle = await Rectangle.objects.aget(pk=rectangle_id)
+        self.assertEqual(response.json(), RectangleSerializer(rectangle).data)
+        
+        response = await self.async_client.get('/api/rectangles/contains/', {'lng': 0.5, 'lat': 0.5}, headers=headers)
+        self.assertEqual([item['id'] for item in response.json()['results']], [rectangle_id])
+        
+        response = await self.async_client.delete(f'/api/rectangles/{rectangle_id}/', headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response = await self.async_client.get(f'/api/rectangles/{rectangle_id}/', headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        
+        response = await self.async_client.get('/api/rectangles/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class RectangleValidationTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_invalid_geometries(self):
+        """Test every check reports its error and valid polygons pass"""
+        square = box_ring(0, 0, 1, 1)
+        cases = [
+            (polygon(square), None),
+            (polygon(square[::-1]), None),
+            (polygon([position + [12.5] for position in square]), None),
+            (polygon(box_ring(0, 0, 10, 10), box_ring(2, 2, 3, 3)), None),
+            (polygon(square[:-1] + [[0, 0.5]]), "Polygon rings must be closed, ending with their first position"),
+            (polygon(box_ring(0, 0, 181, 1)), "Longitudes must be between -180 and 180 and latitudes between -90 and 90"),
+            (polygon(box_ring(0, 0, float('nan'), 1)), "Coordinates must be finite numbers"),
+            (polygon([[0, 0], [1, 1], [2, 2], [0, 0]]), "Polygon rings must enclose an area"),
+            (polygon([[0, 0], ['a', 1], [1, 1], [0, 0]]), "Positions must be [longitude, latitude] number pairs"),
+            (polygon(box_ring(0, 0, 10, 10), box_ring(20, 2, 30, 3)), "Polygon holes must lie within the outer ring"),
+            (polygon(square[:3]), "Rectangle must have at least 4 coordinate points"),
+            ({'type': 'Point', 'coordinates': [0, 0]}, "Coordinates must be a Polygon type"),
+        ]
+        geometries = [geometry for geometry, _ in cases]
+        
+        self.assertEqual(validate_polygons(geometries), [error for _, error in cases])
+        self.assertEqual(validate_polygons(geometries), [validate_polygons([g])[0] for g in geometries])
+        with self.assertRaisesMessage(ValueError, "Polygon rings must enclose an area"):
+            validate_polygon(polygon(square[:2] + square[1::-1]))
+
+    @override_settings(RECTANGLES_MAX_VERTICES=10, RECTANGLES_REQUIRE_AXIS_ALIGNED=True)
+    def test_limits_and_axis_aligned_setting(self):
+        """Test the vertex limit and optional axis-aligned rectangle check"""
+        diamond = [[0, 1], [1, 2], [2, 1], [1, 0], [0, 1]]
+        
+        self.assertEqual(validate_polygons([
+            polygon(box_ring(0, 0, 1, 1)),
+            polygon(diamond),
+            polygon(box_ring(0, 0, 3, 3), box_ring(1, 1, 2, 2)),
+            polygon(diamond[:-1] * 3 + [diamond[0]]),
+        ]), [
+            None,
+            "Coordinates must be an axis-aligned rectangle",
+            "Coordinates must be an axis-aligned rectangle",
+            "A polygon can have at most 10 coordinate points",
+        ])
+
+    def test_write_paths_share_validation(self):
+        """Test single and bulk writes reject the same geometry the same way"""
+        unclosed = polygon(box_ring(0, 0, 1, 1)[:-1] + [[0, 0.5]])
+        error = "Polygon rings must be closed, ending with their first position"
+        
+        response = self.client.post(
+            '/api/rectangles/', {'name': 'Zone', 'coordinates': unclosed}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['coordinates'], [error])
+        
+        data = [
+            {'name': 'Zone 1', 'coordinates': polygon(box_ring(0, 0, 1, 1))},
+            {'name': 'Zone 2', 'coordinates': unclosed},
+        ]
+        response = self.client.post('/api/rectangles/bulk/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['created']), 1)
+        self.assertEqual(response.data['errors'], [{'index': 1, 'errors': {'coordinates': [error]}}])
+        
+        zone = Rectangle.objects.get(name='Zone 1')
+        response = self.client.patch(
+            f'/api/rectangles/{zone.id}/', {'coordinates': unclosed}, format='json'
+        )
+        self.assertEqual(response.data['coordinates'], [error])
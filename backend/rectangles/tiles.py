@@ -0,0 +1,254 @@
+"""
+Mapbox Vector Tile encoding for rectangles
+
+Tiles use the standard Web Mercator z/x/y scheme. Each tile holds a single
+``zones`` layer with one polygon feature per rectangle intersecting the tile,
+tagged with the rectangle name. Encoded tiles are cached per user and tile,
+keyed by the user's cache generation so they are invalidated whenever the
+user's rectangles change.
+"""
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .caching import get_generation
+from .models import Rectangle
+from .packing import unpack_ring
+
+LAYER_NAME = 'zones'
+EXTENT = 4096
+# Geometry is clipped to the tile plus this many pixels on each side
+BUFFER = 64
+MAX_ZOOM = 24
+
+# Protobuf wire types
+VARINT = 0
+LENGTH_DELIMITED = 2
+
+# Geometry commands and feature types from the vector tile spec
+MOVE_TO = 1
+LINE_TO = 2
+CLOSE_PATH = 7
+POLYGON = 3
+
+
+def tile_bounds(z, x, y):
+    """Return the (min_lng, min_lat, max_lng, max_lat) bounds of a tile"""
+    n = 2 ** z
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360 - 180, lat(y + 1), (x + 1) / n * 360 - 180, lat(y)
+
+
+def is_valid_tile(z, x, y):
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def _project(lng, lat, z, x, y):
+    """Project lng/lat to pixel coordinates inside the tile"""
+    n = 2 ** z
+    lat = max(min(lat, 85.0511287798), -85.0511287798)
+    world_x = (lng + 180) / 360 * n
+    sin_lat = math.sin(math.radians(lat))
+    world_y = (0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * n
+    return (world_x - x) * EXTENT, (world_y - y) * EXTENT
+
+
+def _clip_ring(ring, low, high):
+    """Clip a closed ring to the square [low, high] (Sutherland-Hodgman)"""
+    edges = (
+        (lambda p: p[0] >= low, 0, low),
+        (lambda p: p[0] <= high, 0, high),
+        (lambda p: p[1] >= low, 1, low),
+        (lambda p: p[1] <= high, 1, high),
+    )
+    for inside, axis, value in edges:
+        if not ring:
+            break
+        clipped = []
+        previous = ring[-1]
+        for point in ring:
+            if inside(point):
+                if not inside(previous):
+                    clipped.append(_crossing(previous, point, axis, value))
+                clipped.append(point)
+            elif inside(previous):
+                clipped.append(_crossing(previous, point, axis, value))
+            previous = point
+        ring = clipped
+    return ring
+
+
+def _crossing(start, end, axis, value):
+    t = (value - start[axis]) / (end[axis] - start[axis])
+    other = 1 - axis
+    point = [0, 0]
+    point[axis] = value
+    point[other] = start[other] + t * (end[other] - start[other])
+    return tuple(point)
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 31)
+
+
+def _command(command_id, count):
+    return (command_id & 0x7) | (count << 3)
+
+
+def encode_polygon(ring, z, x, y):
+    """
+    Encode a lng/lat ring as vector tile polygon geometry commands.
+
+    Returns None if nothing of the ring remains inside the buffered tile.
+    """
+    points = [_project(lng, lat, z, x, y) for lng, lat in ring]
+    if len(points) > 1 and points[0] == points[-1]:
+        points.pop()
+    points = _clip_ring(points, -BUFFER, EXTENT + BUFFER)
+
+    # Snap to the integer tile grid and drop repeated vertices
+    snapped = []
+    for px, py in points:
+        point = (int(round(px)), int(round(py)))
+        if not snapped or snapped[-1] != point:
+            snapped.append(point)
+    if len(snapped) > 1 and snapped[0] == snapped[-1]:
+        snapped.pop()
+    if not snapped:
+        return None
+
+    # Exterior rings must be clockwise in tile coordinates (positive area)
+    area = sum(
+        x0 * y1 - x1 * y0
+        for (x0, y0), (x1, y1) in zip(snapped, snapped[1:] + snapped[:1])
+    )
+    if area == 0:
+        # Keep zones visible at low zoom by drawing them as a single pixel
+        px, py = snapped[0]
+        snapped = [(px, py), (px + 1, py), (px + 1, py + 1), (px, py + 1)]
+    elif area < 0:
+        snapped.reverse()
+
+    commands = [_command(MOVE_TO, 1)]
+    cursor_x = cursor_y = 0
+    for index, (px, py) in enumerate(snapped):
+        if index == 1:
+            commands.append(_command(LINE_TO, len(snapped) - 1))
+        commands.append(_zigzag(px - cursor_x))
+        commands.append(_zigzag(py - cursor_y))
+        cursor_x, cursor_y = px, py
+    commands.append(_command(CLOSE_PATH, 1))
+    return commands
+
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _key(field, wire_type):
+    return _varint((field << 3) | wire_type)
+
+
+def _uint_field(field, value):
+    return _key(field, VARINT) + _varint(value)
+
+
+def _bytes_field(field, data):
+    return _key(field, LENGTH_DELIMITED) + _varint(len(data)) + data
+
+
+def _packed_field(field, values):
+    return _bytes_field(field, b''.join(_varint(value) for value in values))
+
+
+def encode_tile(zones, z, x, y):
+    """
+    Encode zones into a vector tile.
+
+    zones is an iterable of (id, name, ring) tuples, where ring is the outer
+    ring as a list of [lng, lat] positions. Returns the tile as bytes, which
+    is empty when no zone has geometry inside the tile.
+    """
+    values = []
+    value_indexes = {}
+    features = []
+
+    for zone_id, name, ring in zones:
+        if not ring:
+            continue
+        geometry = encode_polygon(ring, z, x, y)
+        if geometry is None:
+            continue
+
+        if name not in value_indexes:
+            value_indexes[name] = len(values)
+            values.append(_bytes_field(1, name.encode('utf-8')))
+
+        features.append(_bytes_field(2, b''.join([
+            _uint_field(1, zone_id),
+            _packed_field(2, [0, value_indexes[name]]),
+            _uint_field(3, POLYGON),
+            _packed_field(4, geometry),
+        ])))
+
+    if not features:
+        return b''
+
+    layer = b''.join([
+        _uint_field(15, 2),
+        _bytes_field(1, LAYER_NAME.encode('utf-8')),
+        *features,
+        _bytes_field(3, b'name'),
+        *(_bytes_field(4, value) for value in values),
+        _uint_field(5, EXTENT),
+    ])
+    return _bytes_field(3, layer)
+
+
+def _outer_ring(geometry):
+    ring = unpack_ring(geometry)
+    return ring.tolist() if ring is not None else None
+
+
+def _tile_cache_key(user_id, generation, z, x, y):
+    return f"rectangles:tile:{user_id}:{generation}:{z}:{x}:{y}"
+
+
+def get_user_tile(user_id, z, x, y):
+    """Return the encoded vector tile of a user's rectangles, using the cache"""
+    key = _tile_cache_key(user_id, get_generation(user_id), z, x, y)
+    tile = cache.get(key)
+    if tile is not None:
+        return tile
+
+    # Pad the query so zones inside the tile buffer are included
+    min_lng, min_lat, max_lng, max_lat = tile_bounds(z, x, y)
+    pad_lng = (max_lng - min_lng) * BUFFER / EXTENT
+    pad_lat = (max_lat - min_lat) * BUFFER / EXTENT
+    rows = (
+        Rectangle.objects
+        .filter(user_id=user_id)
+        .intersecting_bbox(
+            max(min_lng - pad_lng, -180), max(min_lat - pad_lat, -90),
+            min(max_lng + pad_lng, 180), min(max_lat + pad_lat, 90)
+        )
+        .values_list('id', 'name', 'geometry')
+    )
+    zones = ((zone_id, name, _outer_ring(geometry)) for zone_id, name, geometry in rows)
+
+    tile = encode_tile(zones, z, x, y)
+    timeout = getattr(settings, 'RECTANGLES_TILE_CACHE_TIMEOUT', 3600)
+    cache.set(key, tile, timeout)
+    return tile
@@ -5,11 +5,47 @@ app_name = 'rectangles'
 
 urlpatterns = [
     # List and create rectangles
-    path('', views.RectangleListCreateView.as_view(), name='rectangle-list-create'),
+    path('', views.AsyncRectangleListView.as_view(), name='rectangle-list-create'),
     
     # Retrieve, update, delete specific rectangle
-    path('<int:pk>/', views.RectangleDetailView.as_view(), name='rectangle-detail'),
+    path('<int:pk>/', views.AsyncRectangleDetailView.as_view(), name='rectangle-detail'),
+    
+    # Bulk create, update and delete
+    path('bulk/', views.RectangleBulkView.as_view(), name='rectangle-bulk'),
+    
+    # Streaming GeoJSON/NDJSON export
+    path('export/', views.rectangle_export, name='rectangle-export'),
+    
+    # Streaming GeoJSON/NDJSON import
+    path('import/', views.rectangle_import, name='rectangle-import'),
+    
+    # Changes since a sequence number, for delta sync
+    path('changes/', views.rectangle_changes, name='rectangle-changes'),
+    
+    # Server-sent events of rectangle changes
+    path('events/', views.rectangle_events, name='rectangle-events'),
     
     # Statistics
     path('stats/', views.rectangle_stats, name='rectangle-stats'),
+    
+    # Point-in-zone lookup
+    path('contains/', views.rectangle_contains, name='rectangle-contains'),
+    
+    # k nearest rectangles to a point
+    path('nearest/', views.rectangle_nearest, name='rectangle-nearest'),
+    
+    # Batch point-in-zone classification
+    path('classify/', views.rectangle_classify, name='rectangle-classify'),
+    
+    # Geofence enter/exit events for device location updates
+    path('geofence/', views.rectangle_geofence, name='rectangle-geofence'),
+    
+    # Overlapping rectangle pairs
+    path('overlaps/', views.rectangle_overlaps, name='rectangle-overlaps'),
+    
+    # Mapbox Vector Tiles
+    path('tiles/<int:z>/<int:x>/<int:y>.mvt', views.rectangle_tile, name='rectangle-tile'),
+    
+    # Clustered zone centers for low zoom map views
+    path('clusters/', views.rectangle_clusters, name='rectangle-clusters'),
 ] 
\ No newline at end of file
@@ -0,0 +1,227 @@
+"""
+Geometry validation for every rectangle write path
+
+Serializers validate one GeoJSON Polygon at a time with validate_polygon,
+while bulk writes and imports validate a whole batch with validate_polygons.
+Both check the structure of each geometry in Python, then convert the
+positions of the whole batch into one array and run every other check as
+array operations over all of its rings at once:
+
+- positions are pairs of finite numbers, within longitude/latitude range
+- rings have at least 4 positions and are closed
+- rings enclose an area, so rings whose points are all on one line, or
+  which walk back along themselves, are rejected. Winding order is not
+  enforced; RFC 7946 asks parsers not to reject either orientation.
+- holes lie within the bounds of the outer ring
+- a polygon has at most RECTANGLES_MAX_RINGS rings and
+  RECTANGLES_MAX_VERTICES positions in total
+- with RECTANGLES_REQUIRE_AXIS_ALIGNED, the polygon is a single
+  axis-aligned rectangle
+"""
+import numpy as np
+from django.conf import settings
+
+# Areas of rings this small relative to their squared extent are rounding
+# noise of points on a line
+AREA_TOLERANCE = 1e-12
+
+# Checks run on every ring, in order
+NOT_FINITE, OUT_OF_RANGE, NOT_CLOSED, NO_AREA, HOLE_OUTSIDE, NOT_RECTANGLE = range(6)
+
+RING_ERRORS = [
+    "Coordinates must be finite numbers",
+    "Longitudes must be between -180 and 180 and latitudes between -90 and 90",
+    "Polygon rings must be closed, ending with their first position",
+    "Polygon rings must enclose an area",
+    "Polygon holes must lie within the outer ring",
+    "Coordinates must be an axis-aligned rectangle",
+]
+
+POSITION_ERROR = "Positions must be [longitude, latitude] number pairs"
+
+
+def _max_rings():
+    return getattr(settings, 'RECTANGLES_MAX_RINGS', 100)
+
+
+def _max_vertices():
+    return getattr(settings, 'RECTANGLES_MAX_VERTICES', 10000)
+
+
+def _rings(geojson, max_rings, max_vertices):
+    """
+    Return the rings of a GeoJSON Polygon after checking its structure.
+
+    Raises ValueError describing the first problem found.
+    """
+    if not isinstance(geojson, dict):
+        raise ValueError("Coordinates must be a valid GeoJSON object")
+    if geojson.get('type') != 'Polygon':
+        raise ValueError("Coordinates must be a Polygon type")
+
+    rings = geojson.get('coordinates')
+    if not rings:
+        raise ValueError("Coordinates must contain coordinates array")
+    if not isinstance(rings, list):
+        raise ValueError("Coordinates must be a non-empty array")
+    if len(rings) > max_rings:
+        raise ValueError(f"A polygon can have at most {max_rings} rings")
+    if not all(isinstance(ring, list) for ring in rings):
+        raise ValueError("Polygon rings must be arrays of positions")
+    if len(rings[0]) < 4:
+        raise ValueError("Rectangle must have at least 4 coordinate points")
+    if any(len(ring) < 4 for ring in rings):
+        raise ValueError("Polygon holes must have at least 4 coordinate points")
+    if sum(len(ring) for ring in rings) > max_vertices:
+        raise ValueError(f"A polygon can have at most {max_vertices} coordinate points")
+    return rings
+
+
+def _positions(positions):
+    """
+    Convert a list of positions to an (n, 2) float64 array, dropping any
+    values after longitude and latitude. Returns None unless every position
+    is an array of at least two numbers.
+    """
+    try:
+        array = np.array(positions)
+    except ValueError:
+        # Positions of different lengths
+        try:
+            array = np.array([
+                position[:2] if isinstance(position, list) else position for position in positions
+            ])
+        except ValueError:
+            return None
+    if array.ndim != 2 or array.shape[1] < 2 or array.dtype.kind not in 'iuf':
+        return None
+    return array[:, :2].astype(np.float64)
+
+
+def _check_rings(points, sizes, exterior, require_axis_aligned):
+    """
+    Check the rings of many polygons, stored one after the other in points
+    with sizes[i] positions each. exterior marks the outer ring of every
+    polygon.
+
+    Returns an array with, for every ring, the index of the first failed
+    check in RING_ERRORS, or -1.
+    """
+    ends = np.cumsum(sizes)
+    starts = ends - sizes
+    failed = np.full(len(sizes), -1)
+
+    def fail(check, bad_rings):
+        failed[(failed == -1) & bad_rings] = check
+
+    with np.errstate(invalid='ignore', over='ignore'):
+        finite = np.isfinite(points).all(axis=1)
+        fail(NOT_FINITE, np.logical_or.reduceat(~finite, starts))
+
+        lng, lat = points[:, 0], points[:, 1]
+        outside = (np.abs(lng) > 180) | (np.abs(lat) > 90)
+        fail(OUT_OF_RANGE, np.logical_or.reduceat(outside, starts))
+
+        fail(NOT_CLOSED, (points[starts] != points[ends - 1]).any(axis=1))
+
+        # Shoelace area relative to each ring's first position, with the
+        # terms joining one ring to the next zeroed out
+        relative = points - np.repeat(points[starts], sizes, axis=0)
+        x, y = relative[:, 0], relative[:, 1]
+        cross = np.append(x[:-1] * y[1:] - x[1:] * y[:-1], 0)
+        cross[ends - 1] = 0
+        twice_area = np.add.reduceat(cross, starts)
+        (min_lng, min_lat), (max_lng, max_lat) = (
+            np.minimum.reduceat(points, starts).T, np.maximum.reduceat(points, starts).T
+        )
+        extent = np.maximum(max_lng - min_lng, max_lat - min_lat)
+        fail(NO_AREA, ~(np.abs(twice_area) > AREA_TOLERANCE * extent ** 2))
+
+        # Every hole's bounds within the bounds of its polygon's outer ring
+        outer = np.maximum.accumulate(np.where(exterior, np.arange(len(sizes)), 0))
+        fail(HOLE_OUTSIDE, ~exterior & (
+            (min_lng < min_lng[outer]) | (min_lat < min_lat[outer])
+            | (max_lng > max_lng[outer]) | (max_lat > max_lat[outer])
+        ))
+
+        if require_axis_aligned:
+            corners = sizes == 5
+            ring_of_point = np.repeat(np.arange(len(sizes)), sizes)
+            on_sides = (
+                ((lng == min_lng[ring_of_point]) | (lng == max_lng[ring_of_point]))
+                & ((lat == min_lat[ring_of_point]) | (lat == max_lat[ring_of_point]))
+            )
+            # Each of the four edges moves along exactly one axis
+            steps = np.diff(points, axis=0) != 0
+            one_axis = np.append(steps[:, 0] ^ steps[:, 1], True)
+            one_axis[ends - 1] = True
+            fail(NOT_RECTANGLE, ~exterior | ~corners | ~(
+                np.logical_and.reduceat(on_sides & one_axis, starts)
+            ))
+
+    return failed
+
+
+def validate_polygons(geometries):
+    """
+    Validate a batch of GeoJSON Polygons.
+
+    Returns a list with, for every geometry, the message of the first
+    problem found, or None if it is valid.
+    """
+    max_rings, max_vertices = _max_rings(), _max_vertices()
+    require_axis_aligned = getattr(settings, 'RECTANGLES_REQUIRE_AXIS_ALIGNED', False)
+
+    errors = []
+    structured = []
+    for index, geojson in enumerate(geometries):
+        try:
+            rings = _rings(geojson, max_rings, max_vertices)
+        except ValueError as e:
+            errors.append(str(e))
+            continue
+        errors.append(None)
+        if require_axis_aligned and len(rings) > 1:
+            errors[index] = RING_ERRORS[NOT_RECTANGLE]
+            continue
+        structured.append((index, rings))
+    if not structured:
+        return errors
+
+    points = _positions([position for _, rings in structured for ring in rings for position in ring])
+    if points is None:
+        # Find the geometries whose positions aren't number pairs
+        arrays = []
+        for index, rings in structured:
+            array = _positions([position for ring in rings for position in ring])
+            if array is None:
+                errors[index] = POSITION_ERROR
+            else:
+                arrays.append(array)
+        structured = [(index, rings) for index, rings in structured if errors[index] is None]
+        if not structured:
+            return errors
+        points = np.concatenate(arrays)
+
+    sizes = np.array([len(ring) for _, rings in structured for ring in rings])
+    exterior = np.array([ring_index == 0 for _, rings in structured for ring_index in range(len(rings))])
+    polygon_of_ring = np.repeat([index for index, _ in structured], [len(rings) for _, rings in structured])
+
+    failed = _check_rings(points, sizes, exterior, require_axis_aligned)
+    # Report the first failing ring of every polygon
+    for index, check in zip(polygon_of_ring[failed >= 0].tolist(), failed[failed >= 0].tolist()):
+        if errors[index] is None:
+            errors[index] = RING_ERRORS[check]
+    return errors
+
+
+def validate_polygon(geojson):
+    """
+    Validate a GeoJSON Polygon.
+
+    Raises ValueError describing the first problem found.
+    """
+    error = validate_polygons([geojson])[0]
+    if error is not None:
+        raise ValueError(error)
+    return geojson
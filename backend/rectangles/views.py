@@ -1,25 +1,101 @@
 from rest_framework import status, generics
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, parser_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter, SearchFilter
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.shortcuts import get_object_or_404
-from .models import Rectangle
+from rest_framework.views import APIView
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.shortcuts import aget_object_or_404, get_object_or_404
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from drawnzones.asyncviews import AsyncAPIView, async_api_view
+from drawnzones.conditional import make_etag, not_modified, set_validators
+from drawnzones.parsers import FastJSONParser
+from drawnzones.sparse import SparseFieldsetViewMixin
+from .models import Rectangle, ZoneStats, ZoneVersion
 from .serializers import RectangleSerializer, RectangleCreateSerializer
+from .geometry import parse_bbox, parse_point, point_bbox_distance
+from .spatial import aget_user_index
+from .classify import classify_user_points
+from .geofence import GeofenceBusy, parse_updates, process_user_updates
+from .parsers import PointArrayParser
+from .overlaps import find_user_overlaps
+from .tiles import MAX_ZOOM, get_user_tile, is_valid_tile
+from .clusters import get_user_clusters
+from .bulk import bulk_create_rectangles, bulk_update_rectangles, bulk_delete_rectangles
+from .export import EXPORT_FORMATS, aiter_export, iter_export
+from .importer import import_stream
+from .simplify import parse_output_options
+from .fastpath import rectangle_values, serialize_rectangles
+from .changes import change_set_data, changes_since
+from .events import stream_events
+from datetime import datetime, time, timedelta
 import logging
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_HISTOGRAM_DAYS = 30
 
-class RectangleListCreateView(generics.ListCreateAPIView):
+MAX_HISTOGRAM_DAYS = 366
+
+DEFAULT_NEAREST = 5
+
+MAX_NEAREST = 100
+
+
+def _geometry_options(request):
+    """Parse the ?precision= and ?simplify= output options of a request"""
+    try:
+        return parse_output_options(request.query_params)
+    except ValueError as e:
+        raise ValidationError(e.args[0])
+
+
+class RectangleListMixin(SparseFieldsetViewMixin):
     """
-    List all rectangles for the authenticated user and create new rectangles
+    Queryset, filters and output options of the rectangle listing, shared by
+    its sync and async views
+    
+    Listings support sparse fieldsets with ?fields= or ?omit=, and
+    case-insensitive name search with ?search=.
     """
     permission_classes = [IsAuthenticated]
     serializer_class = RectangleSerializer
+    filter_backends = [SearchFilter, OrderingFilter]
+    search_fields = ['name']
+    ordering_fields = ['created_at', 'updated_at', 'name', 'area', 'center_lng', 'center_lat']
+    ordering = ['-created_at', '-id']
     
     def get_queryset(self):
-        """Return rectangles for the authenticated user"""
-        return Rectangle.objects.filter(user=self.request.user)
+        """
+        Return rectangles for the authenticated user, optionally limited to a
+        bbox, an area range (min_area/max_area in square meters) or to
+        rectangles whose center lies inside center_bbox
+        """
+        queryset = Rectangle.objects.filter(user=self.request.user)
+        params = self.request.query_params
+        
+        for param, bbox_filter in (('bbox', 'intersecting_bbox'),
+                                   ('center_bbox', 'center_within_bbox')):
+            if params.get(param):
+                try:
+                    queryset = getattr(queryset, bbox_filter)(*parse_bbox(params[param]))
+                except ValueError as e:
+                    raise ValidationError({param: [str(e)]})
+        
+        for param, lookup in (('min_area', 'area__gte'), ('max_area', 'area__lte')):
+            if params.get(param):
+                try:
+                    value = float(params[param])
+                except ValueError:
+                    raise ValidationError({param: ["Must be a number"]})
+                queryset = queryset.filter(**{lookup: value})
+        
+        return queryset
     
     def get_serializer_class(self):
         """Use different serializer for create vs list"""
@@ -27,9 +103,54 @@ class RectangleListCreateView(generics.ListCreateAPIView):
             return RectangleCreateSerializer
         return RectangleSerializer
     
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['geometry_options'] = _geometry_options(self.request)
+        return context
+    
+    def get_listing(self):
+        """
+        Return the (selected fields, output options, rows queryset) of the
+        listing. Rows are serialized by the fast path in rectangles.fastpath,
+        which gives the same output as RectangleSerializer.
+        """
+        selected = self.get_selected_fields()
+        options = _geometry_options(self.request)
+        queryset = self.filter_queryset(self.get_queryset())
+        ordering = [field.lstrip('-') for field in queryset.query.order_by]
+        return selected, options, rectangle_values(queryset, selected, ordering)
+
+
+class RectangleListCreateView(RectangleListMixin, generics.ListCreateAPIView):
+    """
+    List all rectangles for the authenticated user and create new rectangles
+    """
+    
+    def list(self, request, *args, **kwargs):
+        """
+        List rectangles, answering conditional requests from the zone version
+        """
+        version, modified_at = ZoneVersion.current(request.user.id)
+        etag = make_etag(request.user.id, version, request.get_full_path())
+        response = not_modified(request, etag, modified_at)
+        if response is not None:
+            return response
+        
+        selected, options, queryset = self.get_listing()
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            response = Response(serialize_rectangles(queryset, options, selected))
+        else:
+            response = self.get_paginated_response(serialize_rectangles(page, options, selected))
+        return set_validators(response, etag, modified_at)
+    
     def perform_create(self, serializer):
-        """Save the rectangle with the current user"""
-        rectangle = serializer.save(user=self.request.user)
+        """
+        Save the rectangle with the current user, in one transaction with the
+        change log entry written by the zones_changed receivers
+        """
+        with transaction.atomic():
+            rectangle = serializer.save(user=self.request.user)
         logger.info(f"Rectangle '{rectangle.name}' created by user {self.request.user.email}")
     
     def create(self, request, *args, **kwargs):
@@ -54,16 +175,112 @@ class RectangleDetailView(generics.RetrieveUpdateDestroyAPIView):
         """Return rectangles for the authenticated user"""
         return Rectangle.objects.filter(user=self.request.user)
     
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['geometry_options'] = _geometry_options(self.request)
+        return context
+    
     def perform_update(self, serializer):
         """Log rectangle updates"""
         logger.info(f"Rectangle '{serializer.instance.name}' updated by user {self.request.user.email}")
-        serializer.save()
+        with transaction.atomic():
+            serializer.save()
     
     def perform_destroy(self, instance):
         """Log rectangle deletion"""
         name = instance.name
         logger.info(f"Rectangle '{name}' deleted by user {self.request.user.email}")
-        instance.delete()
+        with transaction.atomic():
+            instance.delete()
+
+
+class AsyncRectangleListView(RectangleListMixin, AsyncAPIView, generics.GenericAPIView):
+    """
+    List all rectangles for the authenticated user without blocking the
+    event loop; creating rectangles is handled by RectangleListCreateView
+    """
+    sync_view = RectangleListCreateView.as_view()
+    
+    async def get(self, request, *args, **kwargs):
+        version, modified_at = await ZoneVersion.acurrent(request.user.id)
+        etag = make_etag(request.user.id, version, request.get_full_path())
+        response = not_modified(request, etag, modified_at)
+        if response is not None:
+            return response
+        
+        selected, options, queryset = self.get_listing()
+        if self.paginator is None:
+            rows = [row async for row in queryset]
+            response = Response(serialize_rectangles(rows, options, selected))
+        else:
+            page = await self.paginator.apaginate_queryset(queryset, request, view=self)
+            response = self.get_paginated_response(serialize_rectangles(page, options, selected))
+        return set_validators(response, etag, modified_at)
+
+
+class AsyncRectangleDetailView(AsyncAPIView):
+    """
+    Retrieve a specific rectangle without blocking the event loop; updates
+    and deletes are handled by RectangleDetailView
+    """
+    permission_classes = [IsAuthenticated]
+    sync_view = RectangleDetailView.as_view()
+    
+    async def get(self, request, pk):
+        options = _geometry_options(request)
+        rows = rectangle_values(Rectangle.objects.filter(user=request.user))
+        row = await aget_object_or_404(rows, pk=pk)
+        return Response(serialize_rectangles([row], options)[0])
+
+
+class RectangleBulkView(APIView):
+    """
+    Create (POST), update (PATCH) or delete (DELETE) many rectangles at once
+    
+    POST and PATCH take a JSON array of rectangles (PATCH items need an 'id'),
+    DELETE takes {"ids": [...]}. Valid items are written in one transaction
+    and every rejected item is reported with its errors.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def _check_batch(self, items, name):
+        max_items = getattr(settings, 'RECTANGLES_BULK_MAX_ITEMS', 10000)
+        if not isinstance(items, list):
+            raise ValidationError({'error': f"Expected a list of {name}"})
+        if len(items) > max_items:
+            raise ValidationError({'error': f"A batch can contain at most {max_items} {name}"})
+        return items
+    
+    def _response(self, key, data, errors, success_status):
+        response_status = success_status if data or not errors else status.HTTP_400_BAD_REQUEST
+        return Response({key: data, 'errors': errors}, status=response_status)
+    
+    def post(self, request):
+        items = self._check_batch(request.data, 'rectangles')
+        created, errors = bulk_create_rectangles(request.user, items)
+        logger.info(f"{len(created)} rectangles bulk created by user {request.user.email}")
+        
+        data = RectangleSerializer(created, many=True).data
+        return self._response('created', data, errors, status.HTTP_201_CREATED)
+    
+    def patch(self, request):
+        items = self._check_batch(request.data, 'rectangles')
+        updated, errors = bulk_update_rectangles(request.user, items)
+        logger.info(f"{len(updated)} rectangles bulk updated by user {request.user.email}")
+        
+        data = RectangleSerializer(updated, many=True).data
+        return self._response('updated', data, errors, status.HTTP_200_OK)
+    
+    def delete(self, request):
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        ids = self._check_batch(ids, 'ids')
+        if not all(isinstance(rectangle_id, int) for rectangle_id in ids):
+            raise ValidationError({'ids': ["Rectangle ids must be integers"]})
+        
+        deleted, errors = bulk_delete_rectangles(request.user, ids)
+        logger.info(f"{len(deleted)} rectangles bulk deleted by user {request.user.email}")
+        
+        return self._response('deleted', deleted, errors, status.HTTP_200_OK)
 
 
 @api_view(['GET'])
@@ -71,12 +288,403 @@ class RectangleDetailView(generics.RetrieveUpdateDestroyAPIView):
 def rectangle_stats(request):
     """
     Get statistics about user's rectangles
+    
+    Includes the number of rectangles created on each of the last ?days=
+    days (30 by default) and in every month.
     """
-    user_rectangles = Rectangle.objects.filter(user=request.user)
+    try:
+        days = int(request.query_params.get('days', DEFAULT_HISTOGRAM_DAYS))
+    except ValueError:
+        days = 0
+    if not 1 <= days <= MAX_HISTOGRAM_DAYS:
+        return Response(
+            {'error': f"days must be an integer between 1 and {MAX_HISTOGRAM_DAYS}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    # The histogram ends today, so the representation changes with the date
+    today = timezone.localdate(timezone=timezone.get_default_timezone())
+    version, modified_at = ZoneVersion.current(request.user.id)
+    etag = make_etag(request.user.id, version, today, request.get_full_path())
+    start_of_today = timezone.make_aware(
+        datetime.combine(today, time.min), timezone.get_default_timezone()
+    )
+    modified_at = max(modified_at, start_of_today) if modified_at else start_of_today
+    response = not_modified(request, etag, modified_at)
+    if response is not None:
+        return response
+    
+    zone_stats = ZoneStats.for_user(request.user.id)
+    created_per_day = []
+    for offset in range(days - 1, -1, -1):
+        day = (today - timedelta(days=offset)).isoformat()
+        created_per_day.append({'date': day, 'count': zone_stats.created_per_day.get(day, 0)})
     
     stats = {
-        'total_rectangles': user_rectangles.count(),
-        'recent_rectangles': user_rectangles.order_by('-created_at')[:5].count(),
+        'total_rectangles': zone_stats.count,
+        'recent_rectangles': min(zone_stats.count, 5),
+        'total_area': zone_stats.total_area,
+        'bounds': zone_stats.bounds,
+        'created_per_day': created_per_day,
+        'created_per_month': [
+            {'month': month, 'count': count}
+            for month, count in sorted(zone_stats.created_per_month.items())
+        ],
     }
     
-    return Response(stats, status=status.HTTP_200_OK) 
\ No newline at end of file
+    return set_validators(Response(stats, status=status.HTTP_200_OK), etag, modified_at)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def rectangle_changes(request):
+    """
+    Get the changes to the user's rectangles since a sequence number (?since=)
+    
+    Returns the current state of changed rectangles and the ids of deleted
+    ones, up to the returned seq. Clients repeat the request with that seq
+    while has_more is set. When resync is set the log doesn't reach back
+    far enough: reload the full list, then continue from seq.
+    """
+    try:
+        since = int(request.query_params.get('since', ''))
+    except ValueError:
+        since = -1
+    if since < 0:
+        return Response(
+            {'error': "since must be a non-negative sequence number"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        change_set = changes_since(request.user.id, since)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response(change_set_data(request.user.id, change_set), status=status.HTTP_200_OK)
+
+
+@async_api_view(['GET'])
+@permission_classes([IsAuthenticated])
+async def rectangle_events(request):
+    """
+    Stream changes to the user's rectangles as server-sent events
+    
+    Each ``changes`` event carries the same data as the changes endpoint,
+    with its seq as the event id. Streams start from now, or after the
+    sequence number in the Last-Event-ID header or ?since=. A ``resync``
+    event means the client should reload the full list.
+    """
+    since = request.headers.get('Last-Event-ID', request.query_params.get('since'))
+    if since is not None:
+        try:
+            since = int(since)
+        except ValueError:
+            since = -1
+        version, _ = await ZoneVersion.acurrent(request.user.id)
+        if not 0 <= since <= version:
+            return Response(
+                {'error': "since must be a sequence number no later than the current one"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    
+    logger.info(f"Rectangle event stream opened by user {request.user.email}")
+    
+    response = StreamingHttpResponse(
+        stream_events(request.user.id, since), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Keep proxies such as nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@async_api_view(['GET'])
+@permission_classes([IsAuthenticated])
+async def rectangle_contains(request):
+    """
+    Get the user's rectangles that contain a point (?lng=&lat=)
+    """
+    try:
+        lng, lat = parse_point(
+            request.query_params.get('lng'),
+            request.query_params.get('lat')
+        )
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    index = await aget_user_index(request.user.id)
+    rectangles = Rectangle.objects.filter(user=request.user, id__in=index.query_point(lng, lat))
+    results = serialize_rectangles([row async for row in rectangle_values(rectangles)])
+    
+    return Response({
+        'lng': lng,
+        'lat': lat,
+        'count': len(results),
+        'results': results,
+    }, status=status.HTTP_200_OK)
+
+
+@async_api_view(['GET'])
+@permission_classes([IsAuthenticated])
+async def rectangle_nearest(request):
+    """
+    Get the user's k rectangles closest to a point (?lng=&lat=&k=)
+    
+    Each result has its geodesic distance in meters to the point, which is 0
+    for rectangles containing it. ?max_distance= (meters) leaves out
+    rectangles further away.
+    """
+    params = request.query_params
+    try:
+        lng, lat = parse_point(params.get('lng'), params.get('lat'))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        k = int(params.get('k', DEFAULT_NEAREST))
+    except ValueError:
+        k = 0
+    if not 1 <= k <= MAX_NEAREST:
+        return Response(
+            {'error': f"k must be an integer between 1 and {MAX_NEAREST}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    max_distance = params.get('max_distance')
+    if max_distance not in (None, ''):
+        try:
+            max_distance = float(max_distance)
+        except ValueError:
+            max_distance = -1
+        if not 0 <= max_distance < float('inf'):
+            return Response(
+                {'error': "max_distance must be a non-negative number of meters"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    else:
+        max_distance = None
+    
+    index = await aget_user_index(request.user.id)
+    distances = dict(index.nearest(lng, lat, k, point_bbox_distance, max_distance=max_distance))
+    rectangles = Rectangle.objects.filter(user=request.user, id__in=distances)
+    results = serialize_rectangles([row async for row in rectangle_values(rectangles)])
+    for item in results:
+        item['distance'] = distances[item['id']]
+    results.sort(key=lambda item: (item['distance'], item['id']))
+    
+    return Response({
+        'lng': lng,
+        'lat': lat,
+        'count': len(results),
+        'results': results,
+    }, status=status.HTTP_200_OK)
+
+
+def _parse_point_array(data):
+    """Turn a JSON body or binary point array into a validated (n, 2) array"""
+    if isinstance(data, np.ndarray):
+        points = data
+    else:
+        raw_points = data.get('points') if isinstance(data, dict) else None
+        if not isinstance(raw_points, list):
+            raise ValueError("points must be an array of [lng, lat] pairs")
+        try:
+            points = np.array(raw_points, dtype=np.float64)
+        except (TypeError, ValueError):
+            raise ValueError("points must be an array of [lng, lat] pairs")
+        if points.size == 0:
+            points = points.reshape(0, 2)
+        elif points.ndim != 2 or points.shape[1] != 2:
+            raise ValueError("points must be an array of [lng, lat] pairs")
+    
+    max_points = getattr(settings, 'RECTANGLES_CLASSIFY_MAX_POINTS', 1000000)
+    if len(points) > max_points:
+        raise ValueError(f"A batch can contain at most {max_points} points")
+    
+    lng, lat = points[:, 0], points[:, 1]
+    if not (np.all(np.abs(lng) <= 180) and np.all(np.abs(lat) <= 90)):
+        raise ValueError("All points must have lng in [-180, 180] and lat in [-90, 90]")
+    
+    return points
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([FastJSONParser, PointArrayParser])
+def rectangle_classify(request):
+    """
+    Classify a batch of points against the user's rectangles
+    
+    Accepts {"points": [[lng, lat], ...]} as JSON, or a binary body of
+    little-endian float64 lng/lat pairs sent as application/octet-stream.
+    Returns the ids of the containing rectangles for every point, in order.
+    """
+    try:
+        points = _parse_point_array(request.data)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    results = classify_user_points(request.user.id, points)
+    
+    return Response({
+        'count': len(results),
+        'results': results,
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def rectangle_geofence(request):
+    """
+    Turn a batch of device locations into geofence enter/exit events
+    
+    Accepts {"updates": [[device_id, lng, lat, timestamp], ...]} with
+    timestamps in seconds since the epoch. Device state is kept between
+    batches, so events describe transitions since each device's last update.
+    """
+    raw_updates = request.data.get('updates') if isinstance(request.data, dict) else None
+    try:
+        updates = parse_updates(raw_updates)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        events, skipped = process_user_updates(request.user.id, updates)
+    except GeofenceBusy as e:
+        logger.warning(f"Geofence batch of user {request.user.id} timed out: {e}")
+        return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    
+    return Response({
+        'count': len(events),
+        'skipped': skipped,
+        'events': [event._asdict() for event in events],
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def rectangle_overlaps(request):
+    """
+    Get every pair of the user's rectangles that overlap, with the
+    overlapping box and its area in square meters
+    """
+    overlaps = find_user_overlaps(request.user.id)
+    
+    return Response({
+        'count': len(overlaps),
+        'results': [
+            {
+                'rectangle_ids': [overlap.first_id, overlap.second_id],
+                'bounds': list(overlap.bounds),
+                'area': overlap.area,
+            }
+            for overlap in overlaps
+        ],
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def rectangle_tile(request, z, x, y):
+    """
+    Get the user's rectangles as a Mapbox Vector Tile
+    """
+    if not is_valid_tile(z, x, y):
+        raise Http404("Tile does not exist")
+    
+    tile = get_user_tile(request.user.id, z, x, y)
+    return HttpResponse(tile, content_type='application/vnd.mapbox-vector-tile')
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def rectangle_clusters(request):
+    """
+    Get clusters of the user's rectangles for a map view (?zoom=&bbox=)
+    
+    Each cluster has the number of rectangles in it, the centroid of their
+    centers and the bounds of the rectangles. Single rectangles also have
+    their zone_id. bbox defaults to the whole world.
+    """
+    try:
+        zoom = float(request.query_params.get('zoom', ''))
+    except ValueError:
+        zoom = -1
+    if not 0 <= zoom <= MAX_ZOOM:
+        return Response(
+            {'error': f"zoom must be a number between 0 and {MAX_ZOOM}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    bbox = (-180, -90, 180, 90)
+    if request.query_params.get('bbox'):
+        try:
+            bbox = parse_bbox(request.query_params['bbox'])
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    clusters = get_user_clusters(request.user.id).clusters(zoom, *bbox)
+    
+    return Response({
+        'zoom': zoom,
+        'count': len(clusters),
+        'clusters': clusters,
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def rectangle_export(request):
+    """
+    Stream all of the user's rectangles as a GeoJSON FeatureCollection
+    (?output=geojson, the default) or as newline-delimited features
+    (?output=ndjson), optionally rounded (?precision=) and simplified
+    (?simplify=)
+    """
+    export_format = request.query_params.get('output', 'geojson')
+    if export_format not in EXPORT_FORMATS:
+        return Response(
+            {'error': f"output must be one of: {', '.join(EXPORT_FORMATS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    options = _geometry_options(request)
+    
+    logger.info(f"Rectangles exported as {export_format} by user {request.user.email}")
+    
+    # ASGI servers buffer synchronous iterators whole, so they get the async export
+    if isinstance(request._request, ASGIRequest):
+        content = aiter_export(request.user.id, export_format, options)
+    else:
+        content = iter_export(request.user.id, export_format, options)
+    response = StreamingHttpResponse(content, content_type=EXPORT_FORMATS[export_format])
+    response['Content-Disposition'] = f'attachment; filename="rectangles.{export_format}"'
+    return response
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def rectangle_import(request):
+    """
+    Import rectangles from a GeoJSON FeatureCollection, or from
+    newline-delimited features sent as application/x-ndjson
+    
+    The body is parsed incrementally instead of through the request parsers,
+    so large files are never loaded into memory at once.
+    """
+    import_format = 'ndjson' if request.content_type.startswith('application/x-ndjson') else 'geojson'
+    # DRF has no stream for bodies without a Content-Length, such as chunked
+    # uploads, so those are read from the underlying request until EOF
+    stream = request.stream if request.stream is not None else request._request
+    
+    result = import_stream(request.user, stream, import_format=import_format)
+    logger.info(
+        f"{result.created} rectangles imported by user {request.user.email} "
+        f"({result.error_count} rejected)"
+    )
+    
+    if result.created or not (result.error_count or result.parse_error):
+        response_status = status.HTTP_201_CREATED
+    else:
+        response_status = status.HTTP_400_BAD_REQUEST
+    return Response(result.as_dict(), status=response_status)